@@ -0,0 +1,107 @@
+"""Commit throughput at each durability level (ENROLLMENT_DURABILITY in system.py).
+
+For each level a fresh process gets a scratch directory holding a synthetic roster
+(see synthetic.py), imported into students.db for the SQLite backend, and commits
+--commits groups of --group edits through commit_writes, the way the service commits
+queued writes (--group 1 is one clerk saving one student). Each edit replaces one
+student's phone number. Journal compaction runs as it would in use; replication to the
+department copies does not. Commits and writes per second, p50/p99 commit latency and
+fsyncs per commit are reported.
+
+fsync costs what the disk under the scratch directory makes it cost: on a tmpfs (often
+/tmp) every level looks alike, so point --dir at the disk the roster lives on.
+
+Usage: python benchmarks/durability.py [--students 10000] [--commits 2000] [--group 1]
+           [--levels commit batch os] [--backend csv|sqlite] [--dir <folder on the roster's disk>]
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_level(level, args, results):
+    """Time the commits at one durability level, in a fresh process and scratch directory."""
+    workdir = tempfile.mkdtemp(prefix="enrollment_durability_", dir=args.dir)
+    os.chdir(workdir)
+    os.environ.update(ENROLLMENT_DURABILITY=level, ENROLLMENT_BACKEND=args.backend)
+    sys.path[:0] = [REPO_DIR, BENCHMARK_DIR]
+    import synthetic
+    import system
+
+    try:
+        synthetic.write_roster(system, system.MAIN_FILE, args.students)
+        # SQLite fsyncs inside its own library, where they are not counted
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+                mock.patch.object(os, "fsync", wraps=os.fsync) as fsync:
+            if args.backend == "sqlite":
+                system.import_csv_to_database(system.MAIN_FILE, replace=True)
+            system.load_roster()
+
+            rng = random.Random(args.students)
+            rows = {}
+            latencies = []
+            fsync.reset_mock()
+            started = time.perf_counter()
+            for _ in range(args.commits):
+                writes = []
+                for _ in range(args.group):
+                    student_number = f"2025-{rng.randint(1, args.students):04d}"
+                    if student_number not in rows:
+                        rows[student_number] = dict(system.find_student(student_number))
+                    rows[student_number]["Phone Number"] = f"0917{rng.randrange(10 ** 7):07d}"
+                    writes.append(([], [{"op": "upsert", "student": student_number,
+                                         "row": dict(rows[student_number])}], None))
+                committed = time.perf_counter()
+                system.commit_writes(writes)
+                latencies.append(time.perf_counter() - committed)
+            # Whatever the batch level still holds is part of the cost of its commits
+            system.sync_pending()
+            elapsed = time.perf_counter() - started
+        latencies.sort()
+        results.put({"level": level, "elapsed": elapsed, "fsyncs": fsync.call_count,
+                     "p50": latencies[len(latencies) // 2], "p99": latencies[min(len(latencies) - 1,
+                                                                                 int(len(latencies) * 0.99))]})
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=10000, help="synthetic roster size")
+    parser.add_argument("--commits", type=int, default=2000, help="commits per level")
+    parser.add_argument("--group", type=int, default=1, help="edits per commit")
+    parser.add_argument("--levels", nargs="+", default=["commit", "batch", "os"], help="durability levels to run")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv", help="roster storage")
+    parser.add_argument("--dir", default=REPO_DIR, help="folder to hold the scratch directories (default: this repository; its disk is measured)")
+    args = parser.parse_args()
+
+    print(f"Students: {args.students}   Backend: {args.backend}   Commits: {args.commits}   "
+          f"Edits per commit: {args.group}   Scratch folder: {os.path.abspath(args.dir)}")
+    print(f"  {'Level':<8} {'commits/s':>10} {'writes/s':>10} {'p50':>10} {'p99':>10} {'fsyncs/commit':>14}")
+    context = multiprocessing.get_context("spawn")
+    for level in args.levels:
+        results = context.Queue()
+        process = context.Process(target=run_level, args=(level, args, results))
+        process.start()
+        result = results.get()
+        process.join()
+        commits = args.commits / result["elapsed"]
+        fsyncs = f"{result['fsyncs'] / args.commits:.2f}" if args.backend == "csv" else "-"
+        print(f"  {level:<8} {commits:>10.1f} {commits * args.group:>10.1f} {result['p50'] * 1000:>7.2f} ms "
+              f"{result['p99'] * 1000:>7.2f} ms {fsyncs:>14}")
+
+
+if __name__ == "__main__":
+    main()
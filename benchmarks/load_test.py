@@ -0,0 +1,184 @@
+"""Load test for the enrollment service (python system.py serve).
+
+Starts the service in a scratch directory on a synthetic roster (see synthetic.py), or
+targets a running one with --url, then runs concurrent clients on kept-alive
+connections for a fixed time. Each client repeatedly looks a student up, edits one
+(reading its version, then sending a PATCH that checks it) or enrolls a new one, in
+the proportions given by --mix. Requests per second and p50/p99 latency are reported
+per operation, along with how many writes the service folded into each group commit.
+
+Usage: python benchmarks/load_test.py [--students 10000] [--clients 32] [--duration 10]
+           [--mix 70,20,10] [--backend csv|sqlite] [--url http://127.0.0.1:8765]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from synthetic import student_row, write_roster
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ["lookup", "edit", "enroll"]
+
+
+async def request(connection, method, path, payload=None):
+    """Send one request on a kept-alive connection; return (status, decoded reply)."""
+    reader, writer = connection
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: load-test\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    data = await reader.readexactly(length)
+    return status, json.loads(data) if data else {}
+
+
+def new_student(system, rng):
+    """Return an enrollment record for a new student, as a clerk would type it in."""
+    year_level = str(rng.randint(1, 4))
+    row = dict(zip(system.STUDENT_HEADER, student_row(system, rng, "", year_level, "", False,
+                                                      ("Manila", "Metro Manila", "1000"))))
+    for field in ("Student Number", "Age", "Section", "Room", "Archived"):
+        del row[field]
+    return row
+
+
+async def client(system, address, args, seed, deadline, results):
+    """Run operations on one connection until the deadline, recording (operation, seconds, outcome)."""
+    rng = random.Random(seed)
+    connection = await asyncio.open_connection(*address)
+    weights = [int(part) for part in args.mix.split(",")]
+    try:
+        while time.perf_counter() < deadline:
+            operation = rng.choices(OPERATIONS, weights)[0]
+            path = f"/students/{args.year}-{rng.randint(1, args.students):04d}"
+            started = time.perf_counter()
+            if operation == "lookup":
+                status, _ = await request(connection, "GET", path)
+                requests = 1
+            elif operation == "edit":
+                status, reply = await request(connection, "GET", path)
+                requests = 1
+                if status == 200:
+                    status, _ = await request(connection, "PATCH", path, {
+                        "fields": {"Phone Number": f"0917{rng.randrange(10 ** 7):07d}"},
+                        "expected_version": reply["version"]})
+                    requests = 2
+            else:
+                status, _ = await request(connection, "POST", "/students", {"students": [new_student(system, rng)]})
+                requests = 1
+            outcome = "ok" if status < 400 else ("conflict" if status == 409 else "error")
+            results.append((operation, time.perf_counter() - started, outcome, requests))
+    finally:
+        connection[1].close()
+
+
+async def run_clients(system, address, args):
+    """Run the clients against the service; return (results, elapsed seconds, group-commit counts before and after)."""
+    connection = await asyncio.open_connection(*address)
+    _, before = await request(connection, "GET", "/health")
+    results = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(client(system, address, args, seed, deadline, results) for seed in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    _, after = await request(connection, "GET", "/health")
+    connection[1].close()
+    return results, elapsed, before, after
+
+
+def start_service(workdir, backend):
+    """Start the service on a free port in workdir; return (process, (host, port))."""
+    env = dict(os.environ, ENROLLMENT_BACKEND=backend)
+    env.pop("ENROLLMENT_SERVER", None)
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "system.py"), "serve", "--port", "0"],
+                               cwd=workdir, env=env, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if "listening on http://" in line:
+            address = urlsplit(line.split()[-1])
+            return process, (address.hostname, address.port)
+    raise RuntimeError("The enrollment service did not start.")
+
+
+def percentile(latencies, fraction):
+    """Return a percentile of sorted latencies."""
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def report(results, elapsed, before, after):
+    """Print throughput and latency per operation."""
+    requests = sum(result[3] for result in results)
+    print(f"Requests: {requests}   Elapsed: {elapsed:.2f}s   Throughput: {requests / elapsed:.1f} requests/s")
+    print(f"  {'Operation':<10} {'Count':>8} {'ops/s':>9} {'p50':>10} {'p99':>10} {'Conflicts':>10} {'Errors':>7}")
+    for operation in OPERATIONS + ["all"]:
+        rows = [result for result in results if operation in ("all", result[0])]
+        if not rows:
+            continue
+        latencies = sorted(result[1] for result in rows)
+        print(f"  {operation:<10} {len(rows):>8} {len(rows) / elapsed:>9.1f} "
+              f"{percentile(latencies, 0.5) * 1000:>7.2f} ms {percentile(latencies, 0.99) * 1000:>7.2f} ms "
+              f"{sum(result[2] == 'conflict' for result in rows):>10} {sum(result[2] == 'error' for result in rows):>7}")
+    commits, writes = after["commits"] - before["commits"], after["writes"] - before["writes"]
+    if commits:
+        print(f"Group commits: {commits} for {writes} writes ({writes / commits:.1f} writes per commit, "
+              f"largest {after['largest_batch']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=10000, help="synthetic roster size")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--mix", default="70,20,10", help="lookup,edit,enroll weights")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv", help="roster storage")
+    parser.add_argument("--url", help="use a running service instead of starting one "
+                                      "(its roster should hold students <year>-0001 to <year>-<students>)")
+    parser.add_argument("--year", default="2025", help="year of the student numbers looked up and edited")
+    args = parser.parse_args()
+
+    # Importing system creates the department folders, so do it in the scratch directory
+    workdir = tempfile.mkdtemp(prefix="enrollment_load_")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import system
+
+    process = None
+    try:
+        if args.url:
+            address = urlsplit(args.url)
+            address = (address.hostname, address.port or 80)
+        else:
+            write_roster(system, system.MAIN_FILE, args.students)
+            if args.backend == "sqlite":
+                subprocess.run([sys.executable, os.path.join(REPO_DIR, "system.py"), "db-import"], cwd=workdir,
+                               env=dict(os.environ, ENROLLMENT_BACKEND="sqlite"), check=True,
+                               stdout=subprocess.DEVNULL)
+            process, address = start_service(workdir, args.backend)
+        print(f"Students: {args.students}   Backend: {args.backend if process else args.url}   "
+              f"Clients: {args.clients}   Mix (lookup,edit,enroll): {args.mix}")
+        report(*asyncio.run(run_clients(system, address, args)))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
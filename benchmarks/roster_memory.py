@@ -0,0 +1,114 @@
+"""Roster representation benchmark: row dicts (before) against Student records (after).
+
+Writes a synthetic students.csv to a scratch directory and reports, for both
+representations, the time to load it, the memory the loaded roster holds, and the
+time of full scans like those behind assign_section (counting active students per
+section) and generate_class_lists (pulling the class-list columns of every student).
+
+Usage: python benchmarks/roster_memory.py [--students 100000]
+"""
+
+import argparse
+import csv
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import write_roster
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_dicts(system):
+    """Load the roster the old way: one dict per row."""
+    with open(system.MAIN_FILE, "r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        fieldnames = next(reader)
+        return [dict(zip(fieldnames, values)) for values in reader]
+
+
+def load_students(system):
+    """Load the roster the new way: one Student per row through the positional codec."""
+    with open(system.MAIN_FILE, "r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        decode = system.row_decoder(next(reader))
+        return [decode(values) for values in reader]
+
+
+def count_sections(rows):
+    """Count active students per (section, room), as assign_section used to on every call."""
+    counts = {}
+    for row in rows:
+        if (row.get("Archived") or "No").upper() != "YES":
+            key = (row.get("Section", ""), row.get("Room", ""))
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def class_list_columns(rows):
+    """Pull the class-list columns of every active student."""
+    return [
+        (row.get("Section", ""), row.get("Room", ""), row.get("Student Number", ""), row.get("Full Name", ""),
+         row.get("Course", ""), row.get("Year Level", ""), row.get("Subjects", ""), row.get("Total Units", ""))
+        for row in rows if (row.get("Archived") or "No").upper() != "YES"
+    ]
+
+
+def measure(system, loader):
+    """Return (load seconds, retained MB, section scan seconds, class-list scan seconds) for a loader."""
+    gc.collect()
+    started = time.perf_counter()
+    rows = loader(system)
+    load_time = time.perf_counter() - started
+
+    # Memory is measured on a second load so the timings above run without tracing
+    del rows
+    gc.collect()
+    tracemalloc.start()
+    rows = loader(system)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    count_sections(rows)
+    section_time = time.perf_counter() - started
+    started = time.perf_counter()
+    class_list_columns(rows)
+    class_list_time = time.perf_counter() - started
+    return load_time, memory, section_time, class_list_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=100000, help="synthetic roster size")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="enrollment_bench_")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import system
+
+    try:
+        write_roster(system, system.MAIN_FILE, args.students)
+        print(f"Students: {args.students}")
+        print(f"{'Representation':<16} {'Load':>9} {'Memory':>10} {'Section scan':>13} {'Class-list scan':>16}")
+        results = {}
+        for name, loader in (("row dicts", load_dicts), ("Student", load_students)):
+            results[name] = measure(system, loader)
+            load_time, memory, section_time, class_list_time = results[name]
+            print(f"{name:<16} {load_time:>8.2f}s {memory:>7.1f} MB {section_time:>12.3f}s {class_list_time:>15.3f}s")
+        before, after = results["row dicts"], results["Student"]
+        print(f"Memory: {before[1] / after[1]:.1f}x smaller   Load time: {after[0] / before[0]:.2f}x   "
+              f"Class-list scan: {before[3] / after[3]:.1f}x faster")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Benchmark the core enrollment operations on synthetic rosters of several sizes.
+
+For each roster size a fresh process gets a scratch directory holding a synthetic
+students.csv (see synthetic.py), imported into students.db for the SQLite backend.
+It then drives each operation the way a clerk would, with the menu screens answered
+from a script and their output discarded. Time (median of --repeat runs) and peak
+memory allocated during the operation are reported. Results are written as JSON, and
+--compare lists the operations that got slower than an earlier results file.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1000 10000 100000] [--repeat 3]
+           [--backend csv|sqlite] [--output results.json] [--compare old.json] [--tolerance 1.25]
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+
+def answers(*replies):
+    """Answer the prompts of an interactive screen, in order."""
+    return mock.patch("builtins.input", side_effect=list(replies))
+
+
+def pick_student(system, state):
+    """Return the next existing student number to work on, cycling through the roster."""
+    state["pick"] = (state["pick"] + 7919) % state["students"]
+    return f"2025-{state['pick'] + 1:04d}"
+
+
+def cold_load(system, state):
+    system._roster_cache.update(source=None, stamp=None, inode=None)
+    system.load_roster()
+
+
+def generate_number(system, state):
+    system.generate_student_number()
+
+
+def assign_section(system, state):
+    system.assign_section(str(state["pick"] % 4 + 1))
+
+
+def save_new(system, state):
+    rng = state["rng"]
+    student_number = system.generate_student_number()
+    year_level = str(rng.randint(1, 4))
+    section = system.reserve_seat(year_level, student_number)
+    system.save_student(state["synthetic"].student_row(system, rng, student_number, year_level, section, False,
+                                                       ("Manila", "Metro Manila", "1000")))
+
+
+def save_update(system, state):
+    student_number = pick_student(system, state)
+    updated = dict(system.find_student(student_number))
+    updated["Phone Number"] = f"0917{state['rng'].randrange(10 ** 7):07d}"
+    system.save_student(updated, True, student_number, expected_version=system.record_version(student_number))
+
+
+def view_students(system, state):
+    # First page, next page, jump to the last page, quit
+    last_page = str(-(-state["students"] // system.VIEW_PAGE_SIZE))
+    with answers("N", "J", last_page, "Q"):
+        system.view_students()
+
+
+def class_lists(system, state):
+    with answers(""):
+        system.generate_class_lists()
+
+
+def edit_student(system, state):
+    # Student number, keep the names, new phone number, keep the barangay
+    phone = f"0917{state['rng'].randrange(10 ** 7):07d}"
+    with answers(pick_student(system, state), "", "", "", "", phone, "", ""):
+        system.edit_student()
+
+
+def archive_student(system, state):
+    with answers(pick_student(system, state), ""):
+        system.archive_student()
+
+
+# (name, function) in the order they run; each sees the changes of the ones before
+OPERATIONS = [
+    ("load_roster (cold)", cold_load),
+    ("generate_student_number", generate_number),
+    ("assign_section", assign_section),
+    ("save_student (new)", save_new),
+    ("save_student (update)", save_update),
+    ("view_students", view_students),
+    ("generate_class_lists", class_lists),
+    ("edit_student", edit_student),
+    ("archive_student", archive_student),
+]
+
+
+def measure(system, function, state, repeat):
+    """Return (median seconds, fastest seconds, peak MB allocated) over repeat runs plus a traced one."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(system, state)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    function(system, state)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return statistics.median(timings), min(timings), peak
+
+
+def run_size(students, backend, repeat, results):
+    """Benchmark every operation on one roster size, in a fresh process and scratch directory."""
+    workdir = tempfile.mkdtemp(prefix="enrollment_bench_")
+    os.chdir(workdir)
+    os.environ["ENROLLMENT_BACKEND"] = backend
+    sys.path[:0] = [REPO_DIR, BENCHMARK_DIR]
+    import synthetic
+    import system
+
+    system.clear_screen = lambda: None
+    try:
+        started = time.perf_counter()
+        synthetic.write_roster(system, system.MAIN_FILE, students)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if backend == "sqlite":
+                system.import_csv_to_database(system.MAIN_FILE, replace=True)
+            generate_seconds = time.perf_counter() - started
+
+            state = {"students": students, "pick": 0, "rng": random.Random(students), "synthetic": synthetic}
+            rows = []
+            for name, function in OPERATIONS:
+                seconds, fastest, peak = measure(system, function, state, repeat)
+                rows.append({"operation": name, "students": students, "seconds": seconds,
+                             "min_seconds": fastest, "peak_memory_mb": round(peak, 3)})
+        results.put({"students": students, "generate_seconds": generate_seconds, "operations": rows,
+                     "process_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_revision():
+    """Return the commit being benchmarked, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path, tolerance):
+    """Print operations slower than in the baseline results by more than tolerance; return how many."""
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    before = {(row["operation"], row["students"]): row["seconds"]
+              for size in baseline["sizes"] for row in size["operations"]}
+    print()
+    print(f"Compared with {baseline_path} ({baseline.get('revision') or 'unknown revision'}):")
+    regressions = 0
+    for size in report["sizes"]:
+        for row in size["operations"]:
+            old = before.get((row["operation"], row["students"]))
+            if not old:
+                continue
+            ratio = row["seconds"] / old
+            flag = "SLOWER" if ratio > tolerance else ("faster" if ratio < 1 / tolerance else "")
+            regressions += flag == "SLOWER"
+            print(f"  {row['operation']:<26} {row['students']:>9}  {old * 1000:>10.2f} ms -> "
+                  f"{row['seconds'] * 1000:>10.2f} ms  {ratio:>6.2f}x  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="roster sizes (1000000 takes a few minutes)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv", help="roster storage")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression by --compare")
+    args = parser.parse_args()
+
+    report = {"generated": datetime.now().isoformat(timespec="seconds"), "revision": git_revision(),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "backend": args.backend, "repeat": args.repeat, "sizes": []}
+    context = multiprocessing.get_context("spawn")
+    for students in args.sizes:
+        results = context.Queue()
+        process = context.Process(target=run_size, args=(students, args.backend, args.repeat, results))
+        process.start()
+        size = results.get()
+        process.join()
+        report["sizes"].append(size)
+
+        print(f"Students: {students}   Roster generated in {size['generate_seconds']:.2f}s   "
+              f"Process peak: {size['process_peak_mb']:.0f} MB")
+        print(f"  {'Operation':<26} {'Median':>12} {'Fastest':>12} {'Peak memory':>12}")
+        for row in size["operations"]:
+            print(f"  {row['operation']:<26} {row['seconds'] * 1000:>9.2f} ms {row['min_seconds'] * 1000:>9.2f} ms "
+                  f"{row['peak_memory_mb']:>9.2f} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        return 1 if compare(report, args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Deterministic synthetic rosters for benchmarks and load tests.
+
+Students get sequential student numbers, a course, year level and semester with the
+matching subjects from SUBJECTS, and a section filled the way reserve_seat fills them:
+sections A to C of a year level up to ROOM_CAPACITY active students, the rest in D.
+About 5% of students are archived. The same size and seed always give the same file.
+
+Usage: python benchmarks/synthetic.py 100000 [--output students.csv] [--seed 1]
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+YEAR_LEVELS = ["1st Year", "2nd Year", "3rd Year", "4th Year"]
+SEMESTERS = ["1st Semester", "2nd Semester"]
+LAST_NAMES = [
+    "Dela Cruz", "Santos", "Reyes", "Garcia", "Mendoza", "Bautista", "Villanueva", "Ramos", "Castillo", "Aquino",
+    "Flores", "Gonzales", "Cruz", "Torres", "Rivera", "Navarro", "Domingo", "Mercado", "Salazar", "Peñaflor",
+    "Del Rosario", "De Guzman", "Pascual", "Soriano", "Manalo", "Lopez", "Aguilar", "Tolentino", "Ocampo", "Dizon",
+]
+FIRST_NAMES = [
+    "Juan", "María", "José", "Ana", "Mark", "Angelica", "Christian", "Jasmine", "John Paul", "Kristine",
+    "Miguel", "Andrea", "Carlo", "Nicole", "Rafael", "Patricia", "Joshua", "Camille", "Gabriel", "Bea",
+]
+SUFFIXES = ["", "", "", "", "", "", "", "", "Jr.", "III"]
+BARANGAYS = ["Poblacion", "San Isidro", "San Roque", "Santo Niño", "Bagong Silang", "Malanday", "Mabini"]
+
+
+def places(system):
+    """Return (city, province, postal code) choices from the bundled postal code dataset."""
+    entries = sorted({(entry[2], entry[3], entry[1]) for candidates in system.postal_index()["places"].values()
+                      for entry in candidates})
+    return entries or [("Manila", "Metro Manila", "1000")]
+
+
+def student_row(system, rng, student_number, year_level, section, archived, place):
+    """Build one student row in STUDENT_HEADER order."""
+    course = rng.choice(list(system.SUBJECTS))
+    year = YEAR_LEVELS[int(year_level) - 1]
+    semester = rng.choice(SEMESTERS)
+    subjects = system.SUBJECTS[course][year][semester]
+    last_name, first_name = rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES)
+    middle_initial, suffix = f"{rng.choice('ABCDEFGLMPRST')}.", rng.choice(SUFFIXES)
+    age = rng.randint(17, 25)
+    city, province, postal = place
+    serial = student_number.replace("-", "")[-7:]
+    return [
+        student_number, last_name, first_name, middle_initial, suffix,
+        system.format_name(last_name, first_name, middle_initial, suffix), age,
+        f"{2025 - age}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice("MF"),
+        f"0917{serial:0>7}", f"{rng.choice(FIRST_NAMES)} {last_name}", f"0918{serial:0>7}",
+        f"{rng.randint(1, 999)} Rizal Street", rng.choice(BARANGAYS), city, province, postal, "Filipino",
+        course, year, semester, section, system.ROOM_ASSIGNMENTS.get(section, "Room Not Assigned"),
+        ", ".join(f"{code} ({name})" for code, name in subjects), len(subjects) * 3,
+        "Yes" if archived else "No",
+    ]
+
+
+def iter_roster(system, students, seed=1, year=2025):
+    """Yield students rows for a roster of the given size."""
+    rng = random.Random(seed)
+    choices = places(system)
+    occupancy = {}
+    for n in range(1, students + 1):
+        year_level = str(rng.randint(1, 4))
+        archived = rng.random() < 0.05
+        counts = {(section, system.ROOM_ASSIGNMENTS[section]): occupancy.get(section, 0)
+                  for section in (f"{year_level}{letter}" for letter in system.SECTION_LETTERS)}
+        section = system.choose_section(year_level, counts) or f"{year_level}D"
+        if not archived:
+            occupancy[section] = occupancy.get(section, 0) + 1
+        yield student_row(system, rng, f"{year}-{n:04d}", year_level, section, archived, rng.choice(choices))
+
+
+def write_roster(system, path, students, seed=1):
+    """Write a synthetic roster to path (a students.csv with STUDENT_HEADER)."""
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(system.STUDENT_HEADER)
+        writer.writerows(iter_roster(system, students, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("students", type=int, help="number of students, e.g. 1000, 10000, 100000 or 1000000")
+    parser.add_argument("--output", default="students.csv", help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+    import system
+
+    write_roster(system, args.output, args.students, args.seed)
+    print(f"Wrote {args.students} students to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Concurrent writer stress test for the enrollment system.
+
+Starts several local processes that enroll and edit students against one shared
+scratch copy of the data files, the way clerk stations share students.csv. When
+they finish, the roster is checked for duplicate student numbers, lost enrollments,
+over-filled sections and drifted department copies, and the throughput is reported.
+
+Usage: python stress_test.py [--writers 4] [--operations 100] [--keep]
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_row(system, student_number, year_level, section):
+    """Build a student row in STUDENT_HEADER order."""
+    year = ["1st Year", "2nd Year", "3rd Year", "4th Year"][int(year_level) - 1]
+    subjects = system.SUBJECTS["BSCS"][year]["1st Semester"][:3]
+    return [
+        student_number, "Stress", f"Writer {student_number}", "", "", f"Stress, Writer {student_number}",
+        20, "2005-01-01", "F", "09171234567", "Contact", "09171234567", "Street", "Barangay",
+        "Manila", "Metro Manila", "1000", "Filipino", "BSCS", year, "1st Semester",
+        section, system.ROOM_ASSIGNMENTS.get(section, "Room Not Assigned"),
+        ", ".join(f"{code} ({name})" for code, name in subjects), len(subjects) * 3, "No",
+    ]
+
+
+def worker(workdir, station, operations, seed, results):
+    """Run a mix of enrollments and edits from one simulated station."""
+    os.chdir(workdir)
+    os.environ["ENROLLMENT_STATION"] = station
+    sys.path.insert(0, REPO_DIR)
+    import system
+
+    rng = random.Random(seed)
+    enrolled = []
+    edits = 0
+    conflicts = 0
+    latencies = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(operations):
+            started = time.perf_counter()
+            roster = system.load_roster()
+            if roster["rows"] and rng.random() < 0.3:
+                # Edit a random student, as another clerk might be doing at the same time
+                student_number = rng.choice(list(roster["index"]))
+                student = system.find_student(student_number)
+                version = system.record_version(student_number)
+                updated = dict(student)
+                updated["Phone Number"] = f"0917{rng.randrange(10 ** 7):07d}"
+                if system.save_student(updated, True, student_number, expected_version=version):
+                    edits += 1
+                else:
+                    conflicts += 1
+            else:
+                year_level = str(rng.randint(1, 4))
+                student_number = system.generate_student_number()
+                section = system.reserve_seat(year_level, student_number)
+                if system.save_student(make_row(system, student_number, year_level, section)):
+                    enrolled.append(student_number)
+            latencies.append(time.perf_counter() - started)
+    results.put({"station": station, "enrolled": enrolled, "edits": edits,
+                 "conflicts": conflicts, "latencies": latencies})
+
+
+def verify(workdir, enrolled):
+    """Check the shared roster after all writers finished; return a list of problems."""
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import system
+
+    problems = []
+    roster = system.load_roster()
+    numbers = [system.normalize_student_number(row.get("Student Number")) for row in roster["rows"]]
+    if len(numbers) != len(set(numbers)):
+        problems.append(f"{len(numbers) - len(set(numbers))} duplicate student numbers")
+    missing = set(enrolled) - set(numbers)
+    if missing:
+        problems.append(f"{len(missing)} enrollments lost, e.g. {sorted(missing)[:3]}")
+    for (section, room), count in sorted(roster["occupancy"].items()):
+        if count > system.ROOM_CAPACITY and not section.endswith("D"):
+            problems.append(f"section {section} ({room}) holds {count} students")
+    for name, path in system.REPLICA_TARGETS.items():
+        drift = system.check_replica_drift(path)
+        if any(drift.values()):
+            problems.append(f"{name} copy drifted: { {k: len(v) for k, v in drift.items()} }")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4, help="number of concurrent station processes")
+    parser.add_argument("--operations", type=int, default=100, help="operations per writer")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="enrollment_stress_")
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(workdir, f"station-{n + 1}", args.operations, n, results))
+        for n in range(args.writers)
+    ]
+
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    enrolled = [number for report in reports for number in report["enrolled"]]
+    latencies = sorted(latency for report in reports for latency in report["latencies"])
+    operations = len(latencies)
+    print(f"Writers: {args.writers}   Operations: {operations}   Elapsed: {elapsed:.2f}s")
+    print(f"Throughput: {operations / elapsed:.1f} ops/s")
+    if latencies:
+        print(f"Latency p50: {latencies[len(latencies) // 2] * 1000:.1f} ms   "
+              f"p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms")
+    print(f"Enrolled: {len(enrolled)}   Edits: {sum(r['edits'] for r in reports)}   "
+          f"Stale-edit rejections: {sum(r['conflicts'] for r in reports)}")
+
+    problems = verify(workdir, enrolled)
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    if not problems:
+        print("OK: no duplicate numbers, lost writes, over-filled sections or replica drift.")
+
+    if args.keep:
+        print(f"Scratch data kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,205 @@
+import argparse
+import array
+import asyncio
+import bisect
 import csv
+import gc
+import hashlib
+import heapq
+import http.client
+import inspect
+import io
+import json
+import mmap
 import os
 import shutil
+import signal
+import socket
+import sqlite3
+import struct
 import sys
-from datetime import datetime
+import tempfile
+import threading
+import time
+import unicodedata
+import atexit
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from itertools import groupby, islice
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import numpy
+except ImportError:  # optional: the enrollment statistics are recounted in pure Python without it
+    numpy = None
 
 # File paths
 MAIN_FILE = "students.csv"
 REGISTRAR_FILE = "Registrar/students_masterlist.csv"
 LIBRARIAN_FILE = "Librarian/students_masterlist.csv"
+JOURNAL_FILE = "students.journal"
+ROSTER_LOCK_FILE = "students.lock"
+
+# Roster storage: "csv" (students.csv plus its journal) or "sqlite" (DATABASE_FILE)
+STORAGE_BACKEND = os.environ.get("ENROLLMENT_BACKEND", "csv").lower()
+DATABASE_FILE = os.environ.get("ENROLLMENT_DATABASE", "students.db")
+
+# Student number sequences and this station's reserved block of numbers
+STATION_ID = os.environ.get("ENROLLMENT_STATION") or socket.gethostname() or "station"
+NUMBER_SEQUENCE_FILE = "student_numbers.json"
+NUMBER_LOCK_FILE = "student_numbers.lock"
+STATION_BLOCK_FILE = f"student_numbers.{STATION_ID}.json"
+STUDENT_NUMBER_BLOCK_SIZE = 50
+
+# Department copies kept in sync with the main file
+REPLICA_TARGETS = {"Registrar": REGISTRAR_FILE, "Librarian": LIBRARIAN_FILE}
+
+# Section capacity and the sidecar holding seats reserved by enrollment stations
+SECTION_LETTERS = ["A", "B", "C", "D"]
+ROOM_CAPACITY = 40
+ROOM_CAPACITIES = {}  # room -> seats, for rooms that do not seat ROOM_CAPACITY
+OCCUPANCY_FILE = "section_occupancy.json"
+OCCUPANCY_LOCK_FILE = "section_occupancy.lock"
+SEAT_RESERVATION_TIMEOUT = 30 * 60  # seconds
+
+# Students validated per write when importing in bulk
+BULK_BATCH_SIZE = 1000
+
+# Students shown per page of the master list
+VIEW_PAGE_SIZE = 20
+
+# Class list output folder, and students sorted in memory before spilling to disk
+CLASS_LIST_DIR = "Class_Lists_Reports"
+SUBJECT_LIST_DIR = "Subject_Lists_Reports"
+CLASS_LIST_SORT_BUFFER = 50000
+
+# Values listed per column on the statistics screen
+STATISTICS_TOP_VALUES = 10
+
+# Distinct Subjects strings kept parsed
+SUBJECT_PARSE_CACHE_SIZE = 10000
+
+# Name search: matches listed, and how alike (0-1) a misspelled name must be to match
+SEARCH_RESULT_LIMIT = 10
+FUZZY_MATCH_THRESHOLD = 0.5
+
+# Number of journal entries replayed over students.csv before it is rewritten
+JOURNAL_COMPACT_THRESHOLD = 500
+
+# How far a committed write is on its way to disk when the commit returns
+# (ENROLLMENT_DURABILITY):
+#   "commit" - fsynced on every commit (the default)
+#   "batch"  - appends are fsynced together once DURABILITY_BATCH_COMMITS commits or
+#              DURABILITY_BATCH_MS milliseconds are waiting, so a power cut can lose
+#              at most that many acknowledged writes
+#   "os"     - never fsynced; the operating system writes the files back in its own time
+# (any other value is read as "commit").
+# Whichever level, rewritten files go through a temporary file and an atomic rename,
+# so a crash leaves the old file or the new one and never a truncated one
+DURABILITY_LEVELS = ("commit", "batch", "os")
+DURABILITY = os.environ.get("ENROLLMENT_DURABILITY", "commit").lower()
+DURABILITY_BATCH_MS = int(os.environ.get("ENROLLMENT_DURABILITY_BATCH_MS", "20"))
+DURABILITY_BATCH_COMMITS = int(os.environ.get("ENROLLMENT_DURABILITY_BATCH_COMMITS", "64"))
+
+# Binary snapshot of the loaded roster, read at startup instead of parsing students.csv.
+# It is rewritten when a fresh load had to parse more than SNAPSHOT_REFRESH_BYTES of
+# students.csv and journal that the snapshot did not cover
+SNAPSHOT_FILE = "students.snapshot"
+SNAPSHOT_REFRESH_BYTES = 2 ** 20
+
+# Sidecar index of students.csv: student number -> byte offset and length of its row,
+# sorted and fixed-width so one student is found by binary search through mmap
+OFFSET_INDEX_FILE = "students.idx"
+OFFSET_INDEX_KEY_WIDTH = 24  # bytes of the student number kept in the index
+
+# Timing and counters of file work and menu actions, written to METRICS_DIR on exit
+# when ENROLLMENT_METRICS is set (e.g. ENROLLMENT_METRICS=1)
+METRICS_ENABLED = os.environ.get("ENROLLMENT_METRICS", "").lower() not in ("", "0", "no", "off", "false")
+METRICS_DIR = os.path.abspath(os.environ.get("ENROLLMENT_METRICS_DIR", "metrics"))
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Enrollment service (`python system.py serve`); with ENROLLMENT_SERVER set, e.g. to
+# http://127.0.0.1:8765, the menu runs as a thin client of it instead of reading the files
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_MAX_BODY = 8 * 2 ** 20  # bytes
+SERVICE_MAX_BATCH = 1000  # writes committed together
+SERVICE_PAGE_SIZE = 200  # students per list request
+REMOTE_SERVER = os.environ.get("ENROLLMENT_SERVER", "").rstrip("/")
 
 # Ensure folders exist
 os.makedirs("Registrar", exist_ok=True)
 os.makedirs("Librarian", exist_ok=True)
 
+# Column layout of the student master file
+STUDENT_HEADER = [
+    "Student Number", "Last Name", "First Name", "Middle Initial", "Suffix",
+    "Full Name", "Age", "Birthdate", "Sex", "Phone Number",
+    "Emergency Contact", "Emergency Number", "Street", "Barangay", "City/Municipality",
+    "Province", "Postal Code", "Nationality", "Course",
+    "Year Level", "Semester", "Section", "Room", "Subjects", "Total Units", "Archived"
+]
+
+# Roster layout version. students.csv files in an older layout are upgraded to
+# STUDENT_HEADER once, by `python system.py migrate` or on first use, and the
+# migration is recorded in SCHEMA_FILE
+SCHEMA_VERSION = 2
+SCHEMA_FILE = "students.schema.json"
+
+# Layouts rows may still arrive in: schema 1 is the first enrollment form's
+# students.csv, "masterlist" the department export format
+ROSTER_LAYOUTS = {
+    SCHEMA_VERSION: STUDENT_HEADER,
+    1: ["Student Number", "Name", "Age", "Birthdate", "Sex", "Phone Number", "Emergency Contact",
+        "Emergency Number", "Street", "City/Municipality", "Province", "Postal Code", "Status", "Nationality",
+        "Course", "Year Level", "Semester", "Section", "Subjects", "Total Units"],
+    "masterlist": ["student_number", "name", "contact_number", "email", "course", "section", "year_level",
+                   "regular_irregular", "subjects"],
+}
+
+# Older column names -> current ones; columns the current layout lacks are kept after it
+LEGACY_COLUMNS = {
+    "Name": "Full Name", "student_number": "Student Number", "name": "Full Name",
+    "contact_number": "Phone Number", "email": "Email", "course": "Course", "section": "Section",
+    "year_level": "Year Level", "regular_irregular": "Regular/Irregular", "subjects": "Subjects",
+}
+LEGACY_YEAR_LEVELS = {"1": "1st Year", "2": "2nd Year", "3": "3rd Year", "4": "4th Year"}
+LEGACY_SEMESTERS = {"1": "1st Semester", "2": "2nd Semester"}
+
+# Fixed positions of the columns read on every row by the roster indexes and scans.
+# Every Student in the current layout has the STUDENT_HEADER columns first, in order.
+(STUDENT_NUMBER_COLUMN, LAST_NAME_COLUMN, FIRST_NAME_COLUMN, FULL_NAME_COLUMN, COURSE_COLUMN, YEAR_LEVEL_COLUMN,
+ SEMESTER_COLUMN, SECTION_COLUMN, ROOM_COLUMN, SUBJECTS_COLUMN, TOTAL_UNITS_COLUMN, ARCHIVED_COLUMN) = (STUDENT_HEADER.index(name) for name in (
+    "Student Number", "Last Name", "First Name", "Full Name", "Course", "Year Level", "Semester",
+    "Section", "Room", "Subjects", "Total Units", "Archived"))
+
+# Columns the read paths filter on; the roster keeps a posting list of row positions per
+# value of each, so a query reads only the rows in the intersection of its filters
+INDEXED_COLUMNS = ("Archived", "Course", "Year Level", "Semester", "Section", "Room")
+INDEXED_POSITIONS = tuple(STUDENT_HEADER.index(name) for name in INDEXED_COLUMNS)
+
+# Columns the enrollment statistics count active students by (Total Units gives the
+# unit-load distribution); the counts are kept up to date with every change
+STATISTICS_COLUMNS = ("Course", "Year Level", "Semester", "Section", "Sex", "Province", "City/Municipality",
+                      "Nationality", "Total Units")
+STATISTICS_POSITIONS = tuple(STUDENT_HEADER.index(name) for name in STATISTICS_COLUMNS)
+
+# Columns with few distinct values; each distinct value is stored once for the whole roster
+CATEGORICAL_COLUMNS = {
+    "Age", "Sex", "Barangay", "City/Municipality", "Province", "Postal Code", "Nationality",
+    "Course", "Year Level", "Semester", "Section", "Room", "Subjects", "Total Units", "Archived",
+}
+
 # Room Assignments based on Section
 ROOM_ASSIGNMENTS = {
     "1A": "PC-201", "1B": "PC-301", "1C": "PC-302", "1D": "PC-303",
@@ -21,74 +208,126 @@ ROOM_ASSIGNMENTS = {
     "4A": "PC-601", "4B": "PC-602", "4C": "PC-603", "4D": "PC-604",
 }
 
-# Postal Code Mapping for Philippine Cities/Municipalities
-POSTAL_CODES = {
-    # Metro Manila
-    "Manila": "1000", "Quezon City": "1100", "Caloocan": "1400", "Las Piñas": "1740",
-    "Makati": "1200", "Malabon": "1470", "Mandaluyong": "1550", "Marikina": "1800",
-    "Muntinlupa": "1770", "Navotas": "1485", "Parañaque": "1700", "Pasay": "1300",
-    "Pasig": "1600", "Pateros": "1620", "San Juan": "1500", "Taguig": "1630",
-    "Valenzuela": "1440",
-    
-    
-    # Bulacan
-    "Malolos": "3000", "Meycauayan": "3020", "San Jose del Monte": "3023",
-    "Marilao": "3019", "Bocaue": "3018", "Santa Maria": "3022", "Norzagaray": "3013",
-    
-    # Cavite
-    "Bacoor": "4102", "Imus": "4103", "Dasmariñas": "4114", "Tagaytay": "4120",
-    "Cavite City": "4100", "General Trias": "4107", "Trece Martires": "4109",
-    
-    # Laguna
-    "Calamba": "4027", "San Pedro": "4023", "Santa Rosa": "4026", "Biñan": "4024",
-    "Los Baños": "4030", "San Pablo": "4000", "Cabuyao": "4025",
-    
-    # Rizal
-    "Antipolo": "1870", "Cainta": "1900", "Taytay": "1920", "Angono": "1930",
-    "Binangonan": "1940", "San Mateo": "1850",
-    
-    # Pampanga
-    "Angeles": "2009", "San Fernando": "2000", "Mabalacat": "2010", "Mexico": "2021",
-    
-    # Batangas
-    "Batangas City": "4200", "Lipa": "4217", "Tanauan": "4232", "Calaca": "4212",
-    
-    # Cebu
-    "Cebu City": "6000", "Lapu-Lapu": "6015", "Mandaue": "6014", "Talisay": "6045",
-    
-    # Davao
-    "Davao City": "8000", "Tagum": "8100", "Digos": "8002",
-    
-    # Iloilo
-    "Iloilo City": "5000", "Passi": "5037",
-    
-    # Baguio
-    "Baguio": "2600",
-    
-    # Cagayan de Oro
-    "Cagayan de Oro": "9000",
-    
-    # Zamboanga
-    "Zamboanga City": "7000",
-}
+# Philippine postal codes (PHLPost layout: Postal Code, City/Municipality, Province),
+# indexed on first use. The bundled file holds the national ZIP directory for every
+# city and municipality (see data/NOTICE); ENROLLMENT_POSTAL_DATA points at another
+# file in the same layout, e.g. a newer directory.
+POSTAL_DATA_FILE = os.environ.get("ENROLLMENT_POSTAL_DATA") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "postal_codes.csv")
+
+# Abbreviations expanded when place names are compared ("Sta. Rosa" is "Santa Rosa")
+PLACE_ABBREVIATIONS = {"sta": "santa", "sto": "santo", "gen": "general", "mt": "mount"}
+
+# Other names clerks use for a province
+PROVINCE_ALIASES = {"ncr": "metro manila", "national capital region": "metro manila"}
+
+_postal_index = {}
+
+
+def fold_text(text):
+    """Fold text for comparison: no accents, case or punctuation ("Las Piñas" is "las pinas")."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return " ".join("".join(char if char.isalnum() else " " for char in text).split())
+
+
+def normalize_place(name):
+    """Fold a place name for lookups, expanding abbreviations like "Sta." and "Sto."."""
+    return " ".join(PLACE_ABBREVIATIONS.get(word, word) for word in fold_text(name).split())
+
+
+def city_aliases(name):
+    """Return the other forms of a normalized city name ("batangas city" is also "batangas")."""
+    if name.startswith("city of "):
+        return [name[len("city of "):]]
+    if name.endswith(" city"):
+        return [name[:-len(" city")]]
+    return []
+
+
+def postal_index():
+    """Load the postal code dataset into its lookup indexes the first time it is needed.
+
+    places maps a normalized city to its (province, postal code, city, province name)
+    entries; aliases holds the same entries under names without "City" or without
+    spaces; trie is a character trie of the normalized city names for prefix suggestions.
+    """
+    if _postal_index:
+        return _postal_index
+    places, aliases, trie = {}, {}, {}
+    try:
+        with open(POSTAL_DATA_FILE, "r", newline="", encoding="utf-8") as file:
+            for record in csv.DictReader(file):
+                city = record.get("City/Municipality", "").strip()
+                province = record.get("Province", "").strip()
+                key = normalize_place(city)
+                if not key:
+                    continue
+                province_key = normalize_place(province)
+                entry = (PROVINCE_ALIASES.get(province_key, province_key), record.get("Postal Code", "").strip(),
+                         city, province)
+                places.setdefault(key, []).append(entry)
+                for alias in city_aliases(key) + ([key.replace(" ", "")] if " " in key else []):
+                    aliases.setdefault(alias, []).append(entry)
+                node = trie
+                for char in key:
+                    node = node.setdefault(char, {})
+                node.setdefault("", []).append(entry)
+    except FileNotFoundError:
+        print_warning(f"Postal code data '{POSTAL_DATA_FILE}' not found; postal codes must be entered manually.")
+    _postal_index.update(places=places, aliases=aliases, trie=trie)
+    return _postal_index
+
+
+def postal_candidates(city):
+    """Return the (province, postal code, city, province name) entries for a city or municipality."""
+    index = postal_index()
+    key = normalize_place(city)
+    found = index["places"].get(key) or index["aliases"].get(key)
+    if not found:
+        for alias in city_aliases(key):
+            found = index["places"].get(alias) or index["aliases"].get(alias)
+            if found:
+                break
+    if not found:
+        # Spellings differ in spacing ("Margo Sa Tubig" is "Margosatubig")
+        compact = key.replace(" ", "")
+        found = index["places"].get(compact) or index["aliases"].get(compact)
+    return found or []
+
 
 def get_postal_code(city, province=""):
-    """Get postal code based on city/municipality and province."""
-    # Normalize input (remove extra spaces, convert to title case)
-    city_normalized = city.strip().title() if city else ""
-    province_normalized = province.strip().title() if province else ""
-    
-    # Try exact city match first
-    if city_normalized in POSTAL_CODES:
-        return POSTAL_CODES[city_normalized]
-    
-    # Try case-insensitive match
-    for city_key, postal in POSTAL_CODES.items():
-        if city_key.lower() == city_normalized.lower():
-            return postal
-    
-    # If not found, return empty string (will be handled as optional)
-    return ""
+    """Get postal code based on city/municipality and province.
+
+    Province decides between places that share a name, like San Fernando in Pampanga and
+    in La Union; when it cannot and they differ, no postal code is returned.
+    """
+    candidates = postal_candidates(city)
+    province_key = normalize_place(province)
+    province_key = PROVINCE_ALIASES.get(province_key, province_key)
+    matches = [entry for entry in candidates if entry[0] == province_key] or candidates
+    codes = {entry[1] for entry in matches}
+    # If not found or still ambiguous, return empty string (will be handled as optional)
+    return codes.pop() if len(codes) == 1 else ""
+
+
+def suggest_places(prefix, province="", limit=8):
+    """Return up to limit "City, Province" names starting with prefix, in alphabetical order."""
+    node = postal_index()["trie"]
+    for char in normalize_place(prefix):
+        node = node.get(char)
+        if node is None:
+            return []
+    province_key = normalize_place(province)
+    province_key = PROVINCE_ALIASES.get(province_key, province_key)
+    suggestions = []
+    stack = [node]
+    while stack and len(suggestions) < limit:
+        node = stack.pop()
+        suggestions += [f"{entry[2]}, {entry[3]}" for entry in node.get("", [])
+                        if not province_key or entry[0] == province_key]
+        stack.extend(node[char] for char in sorted(node, reverse=True) if char)
+    return suggestions[:limit]
 
 # Subject Database (using codes and names as tuples)
 SUBJECTS = {
@@ -561,6 +800,13 @@ def validate_date(date_string):
         return False
 
 
+def parse_date(date_string):
+    """Parse a YYYY-MM-DD date quickly; raise ValueError for any other format."""
+    if len(date_string) != 10 or date_string[4] != "-" or date_string[7] != "-":
+        raise ValueError(f"Invalid date: {date_string}")
+    return date.fromisoformat(date_string)
+
+
 def validate_phone_philippines(phone):
     """Validate Philippine phone number. Must start with 63 (country code) or 09 (local format)."""
     if not phone.isdigit():
@@ -594,6 +840,54 @@ def validate_age(age_str):
         return False
 
 
+def validate_name(name):
+    """Validate a last or first name (letters, spaces, hyphens, apostrophes, periods)."""
+    return len(name.strip()) > 0 and all(c.isalpha() or c in " -'." for c in name)
+
+
+def validate_middle_name(name):
+    """Validate an optional middle initial or middle name."""
+    return len(name) == 0 or validate_name(name)
+
+
+def validate_suffix(suffix):
+    """Validate an optional name suffix such as Jr., Sr. or III."""
+    return len(suffix) == 0 or (len(suffix) <= 10 and all(c.isalpha() or c in " .," for c in suffix))
+
+
+def validate_sex(sex):
+    """Validate sex is M or F."""
+    return sex.upper() in ["M", "F"]
+
+
+def validate_emergency_number(number):
+    """Validate an emergency number (Philippine format or at least 7 digits)."""
+    return validate_phone_philippines(number) or (number.isdigit() and len(number) >= 7)
+
+
+def validate_postal_code(postal):
+    """Validate a 4-digit Philippine postal code."""
+    return postal.isdigit() and len(postal) == 4
+
+
+def year_level_number(year):
+    """Return the digit of a year level such as "2nd Year"."""
+    return year.replace("st Year", "").replace("nd Year", "").replace("rd Year", "").replace("th Year", "")
+
+
+def calculate_age(birthdate):
+    """Calculate age in years from a birthdate."""
+    today = datetime.now()
+    age = today.year - birthdate.year
+    
+    # Adjust for birthday this year
+    if today.month < birthdate.month or (
+        today.month == birthdate.month and today.day < birthdate.day
+    ):
+        age -= 1
+    return age
+
+
 def format_name(last_name, first_name, middle_initial="", suffix=""):
     """Format name components into full name string (Last Name, First Name M./Middle Suffix)."""
     # Capitalize first letter of each word in last and first names
@@ -619,67 +913,3050 @@ def format_name(last_name, first_name, middle_initial="", suffix=""):
     return ", ".join(name_parts)
 
 
-# ==================== CORE FUNCTIONS ====================
+# ==================== METRICS ====================
 
-def generate_student_number():
-    """Generate unique student number in format YYYY-####."""
+# Counters and latency histograms live in this process and are only touched when
+# METRICS_ENABLED, so instrumented code costs a flag check otherwise. They are written
+# as Prometheus text (for the node exporter's textfile collector) and as a JSON summary.
+
+METRIC_HELP = {
+    "enrollment_operation_seconds": "Time spent in menu actions and file, database and report work.",
+    "enrollment_rows_scanned_total": "Student rows and journal entries parsed.",
+    "enrollment_bytes_read_total": "Bytes read from data files.",
+    "enrollment_bytes_written_total": "Bytes written to data files.",
+    "enrollment_rows_shipped_total": "Rows shipped to department copies.",
+    "enrollment_group_commits_total": "Group commits made by the enrollment service.",
+    "enrollment_group_commit_writes_total": "Service writes committed, summed over group commits.",
+    "enrollment_fsyncs_total": "Files and folders flushed to disk with fsync.",
+}
+
+NO_SPAN = nullcontext()
+
+_metrics = {"started": datetime.now().isoformat(timespec="seconds"), "counters": {}, "histograms": {}}
+
+
+def count_metric(name, amount=1, **labels):
+    """Add to a counter, e.g. count_metric("enrollment_bytes_written_total", 120, file="students.csv")."""
+    if METRICS_ENABLED:
+        key = (name, tuple(sorted(labels.items())))
+        _metrics["counters"][key] = _metrics["counters"].get(key, 0) + amount
+
+
+def observe_latency(name, seconds, **labels):
+    """Record one latency in a histogram."""
+    if not METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    histogram = _metrics["histograms"].get(key)
+    if histogram is None:
+        # Per bucket counts (the last one past every bound), sum, count and maximum
+        histogram = _metrics["histograms"][key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0, 0.0]
+    histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    histogram[1] += seconds
+    histogram[2] += 1
+    histogram[3] = max(histogram[3], seconds)
+
+
+@contextmanager
+def timed_span(operation, labels):
+    """Record the duration of a with-block in the operation latency histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_latency("enrollment_operation_seconds", time.perf_counter() - started, operation=operation, **labels)
+
+
+def span(operation, **labels):
+    """Time a with-block as an operation, e.g. with span("file_write", file="students.csv")."""
+    return timed_span(operation, labels) if METRICS_ENABLED else NO_SPAN
+
+
+def format_labels(labels, extra=()):
+    """Format label pairs the Prometheus way: {name="value",...}."""
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def prometheus_metrics():
+    """Return the metrics in the Prometheus text exposition format."""
+    lines = []
+    station = (("station", STATION_ID),)
+    described = set()
+    for (name, labels), value in sorted(_metrics["counters"].items()):
+        if name not in described:
+            described.add(name)
+            lines += [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} counter"]
+        lines.append(f"{name}{format_labels(station + labels)} {value}")
+    for (name, labels), (buckets, total, observed, _) in sorted(_metrics["histograms"].items()):
+        if name not in described:
+            described.add(name)
+            lines += [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{format_labels(station + labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(station + labels)} {total:.6f}")
+        lines.append(f"{name}_count{format_labels(station + labels)} {observed}")
+    return "\n".join(lines) + "\n"
+
+
+def histogram_quantile(buckets, observed, quantile, largest):
+    """Estimate a quantile from histogram buckets, interpolating within the bucket it falls in."""
+    rank = quantile * observed
+    cumulative = 0
+    lower = 0.0
+    for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+        if bucket and cumulative + bucket >= rank:
+            return min(lower + (bound - lower) * (rank - cumulative) / bucket, largest)
+        cumulative += bucket
+        lower = bound
+    return largest
+
+
+def metrics_summary():
+    """Return the metrics as a JSON-ready summary with per-operation latency statistics."""
+    operations = []
+    for (name, labels), (buckets, total, observed, largest) in sorted(_metrics["histograms"].items()):
+        operations.append(dict(labels, count=observed, total_seconds=round(total, 6),
+                               mean_ms=round(total / observed * 1000, 3),
+                               p50_ms=round(histogram_quantile(buckets, observed, 0.5, largest) * 1000, 3),
+                               p95_ms=round(histogram_quantile(buckets, observed, 0.95, largest) * 1000, 3),
+                               p99_ms=round(histogram_quantile(buckets, observed, 0.99, largest) * 1000, 3),
+                               max_ms=round(largest * 1000, 3)))
+    counters = [dict(labels, name=name, value=value) for (name, labels), value in sorted(_metrics["counters"].items())]
+    return {"station": STATION_ID, "backend": STORAGE_BACKEND, "started": _metrics["started"],
+            "written": datetime.now().isoformat(timespec="seconds"), "operations": operations, "counters": counters}
+
+
+def write_metrics(directory=None):
+    """Write this station's metrics as metrics/enrollment_<station>.prom and .json."""
+    if not METRICS_ENABLED or not (_metrics["counters"] or _metrics["histograms"]):
+        return
+    directory = directory or METRICS_DIR
+    base = os.path.join(directory, f"enrollment_{STATION_ID}")
+    # Both are rendered before writing so the writes are not counted in them
+    text, summary = prometheus_metrics(), metrics_summary()
     try:
-        if not os.path.exists(MAIN_FILE):
-            return "2025-0001"
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{base}.prom.tmp", "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(f"{base}.prom.tmp", f"{base}.prom")
+        with open(f"{base}.json.tmp", "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+        os.replace(f"{base}.json.tmp", f"{base}.json")
+    except OSError as e:
+        print_warning(f"Metrics could not be written to '{directory}': {str(e)}")
+
+
+if METRICS_ENABLED:
+    atexit.register(write_metrics)
+
+
+# ==================== SERVICE CLIENT ====================
+
+# With ENROLLMENT_SERVER set, the roster primitives hand their work to the enrollment
+# service (see HTTP SERVICE) over one kept-alive connection instead of touching the
+# data files, so the menu screens run unchanged as a thin client.
+
+class ServiceError(Exception):
+    """A request the enrollment service refused, with its HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+_service_connection = {}
+
+
+def remote_request(method, path, payload=None):
+    """Send a JSON request to the enrollment service; return its decoded reply, or None on 404.
+
+    A 409 reply raises StaleRecordError and any other error reply raises ServiceError.
+    """
+    body = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {} if body is None else {"Content-Type": "application/json"}
+    for attempt in range(2):
+        connection = _service_connection.get("connection")
+        if connection is None:
+            address = urlsplit(REMOTE_SERVER)
+            connection = http.client.HTTPConnection(address.hostname, address.port or 80, timeout=120)
+            _service_connection["connection"] = connection
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            data = response.read()
+            break
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            del _service_connection["connection"]
+            # Only reads are retried: a write may have been applied before the connection dropped
+            if attempt or method != "GET":
+                raise
+
+    reply = json.loads(data) if data else {}
+    if response.status == HTTPStatus.NOT_FOUND:
+        return None
+    if response.status == HTTPStatus.CONFLICT:
+        raise StaleRecordError(reply.get("error", "The record was changed at another station."))
+    if response.status >= 400:
+        raise ServiceError(response.status, reply.get("error") or f"Enrollment service replied {response.status}.")
+    return reply
+
+
+def student_path(student_number, *rest):
+    """Return the service path of a student, e.g. /students/2025-0001/archive."""
+    return "/".join(["/students", quote(str(student_number).strip(), safe="")] + list(rest))
+
+
+def remote_student(student_number):
+    """Return (student, version stamp) from the service, or (None, None)."""
+    reply = remote_request("GET", student_path(student_number)) if str(student_number).strip() else None
+    if reply is None:
+        return None, None
+    return as_student(reply["student"]), tuple(reply["version"])
+
+
+def remote_journal(entries, expected=None):
+    """Send journal mutations to the service as edits and archive toggles."""
+    expected = expected or {}
+    for entry in entries:
+        student_number = entry.get("student")
+        version = expected.get(student_number)
+        if entry.get("op") == "archive":
+            remote_request("POST", student_path(student_number, "archive"),
+                           {"archived": entry["value"].upper() == "YES", "expected_version": version})
+        elif entry.get("op") in ("upsert", "patch"):
+            fields = entry["row"] if entry["op"] == "upsert" else entry["fields"]
+            remote_request("PATCH", student_path(student_number),
+                           {"fields": dict(fields), "expected_version": version})
+
+
+def remote_students(filters, start=0):
+    """Yield the active students matching filters from the service, a page at a time."""
+    query = {column_name(name): value for name, value in filters.items()}
+    while True:
+        reply = remote_request("GET", "/students?" + urlencode(dict(query, offset=start, limit=SERVICE_PAGE_SIZE)))
+        for row in reply["students"]:
+            yield as_student(row)
+        if reply["next_offset"] is None:
+            return
+        start = reply["next_offset"]
+
+
+# ==================== DURABLE WRITES ====================
+
+# The files the roster is recovered from change in two ways only. Appends (new rows in
+# students.csv, entries in the journal) are handed to sync_append before their commit
+# returns. Whole files are replaced with atomic_write: written to a temporary file,
+# fsynced, renamed over the old one, and the rename flushed with its folder. DURABILITY
+# decides which of those fsyncs happen and when. Files rebuilt from the roster whenever
+# they disagree with it (department copies, seat reservations, the snapshot and the
+# offset index) are renamed into place without fsync.
+
+_pending_syncs = {"paths": {}, "commits": 0, "timer": None}
+_pending_lock = threading.Lock()
 
-        with open(MAIN_FILE, "r", encoding="utf-8") as file:
+
+def fsync_handle(handle, path):
+    """fsync an open file descriptor, counting it in the metrics."""
+    with span("fsync", file=path):
+        os.fsync(handle)
+    count_metric("enrollment_fsyncs_total", file=path)
+
+
+def sync_directory(path):
+    """Flush the folder entry of path (after a rename or a new file) to disk."""
+    if not hasattr(os, "O_DIRECTORY"):
+        # Windows journals folder changes itself and cannot open a folder to fsync it
+        return
+    folder = os.path.dirname(os.path.abspath(path))
+    handle = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        fsync_handle(handle, folder)
+    finally:
+        os.close(handle)
+
+
+@contextmanager
+def atomic_write(path, mode="w", durable=True, **kwargs):
+    """Open a temporary file that replaces path in one rename when the with-block ends.
+
+    Unless durable is False or DURABILITY is "os", the new contents are fsynced before
+    the rename and the rename after it. If the block raises, path is left as it was.
+    """
+    temp_path = f"{path}.tmp"
+    durable = durable and DURABILITY != "os"
+    try:
+        with open(temp_path, mode, **kwargs) as file:
+            yield file
+            if durable:
+                file.flush()
+                fsync_handle(file.fileno(), path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if durable:
+        sync_directory(path)
+
+
+def sync_append(file, new_file=False):
+    """Make rows just appended to an open file durable as DURABILITY says; new_file if the append created it."""
+    if DURABILITY == "os":
+        return
+    file.flush()
+    if DURABILITY == "batch":
+        path = os.path.abspath(file.name)
+        with _pending_lock:
+            _pending_syncs["paths"][path] = _pending_syncs["paths"].get(path, False) or new_file
+        return
+    fsync_handle(file.fileno(), file.name)
+    if new_file:
+        sync_directory(file.name)
+
+
+def finish_commit():
+    """Count a commit toward the "batch" durability level, syncing its appends when the batch is due."""
+    if DURABILITY != "batch":
+        return
+    with _pending_lock:
+        _pending_syncs["commits"] += 1
+        due = _pending_syncs["commits"] >= DURABILITY_BATCH_COMMITS
+        if not due and _pending_syncs["timer"] is None:
+            # The first commit of a batch starts the clock for the whole batch
+            timer = threading.Timer(DURABILITY_BATCH_MS / 1000, sync_pending)
+            timer.daemon = True
+            _pending_syncs["timer"] = timer
+            timer.start()
+    if due:
+        sync_pending()
+
+
+def sync_pending():
+    """fsync every append the "batch" durability level is still holding back."""
+    with _pending_lock:
+        paths, timer = _pending_syncs["paths"], _pending_syncs["timer"]
+        _pending_syncs.update(paths={}, commits=0, timer=None)
+    if timer is not None and timer is not threading.current_thread():
+        timer.cancel()
+    for path, new_file in paths.items():
+        try:
+            handle = os.open(path, os.O_WRONLY)
+        except FileNotFoundError:
+            # Replaced since by a rewrite, which synced its own contents
+            continue
+        try:
+            fsync_handle(handle, path)
+        finally:
+            os.close(handle)
+        if new_file:
+            sync_directory(path)
+
+
+atexit.register(sync_pending)
+
+
+# ==================== ROSTER STORE ====================
+
+class StaleRecordError(Exception):
+    """Raised when a record changed at another station after it was read for editing."""
+
+
+class Student(Mapping):
+    """One roster row: its values in file order and the column layout shared by its file.
+
+    Reads like the row dicts it replaces (get, [], in, keys, items, dict(student)) but
+    costs one tuple per student instead of a dict. Students are never modified; build a
+    changed copy from dict(student).
+    """
+
+    __slots__ = ("values", "layout")
+
+    def __init__(self, values, layout):
+        self.values = values
+        self.layout = layout
+
+    def get(self, name, default=None):
+        position = self.layout.get(name)
+        if position is None or position >= len(self.values):
+            return default
+        return self.values[position]
+
+    def __getitem__(self, name):
+        position = self.layout.get(name)
+        if position is None or position >= len(self.values):
+            raise KeyError(name)
+        return self.values[position]
+
+    def __contains__(self, name):
+        position = self.layout.get(name)
+        return position is not None and position < len(self.values)
+
+    def __iter__(self):
+        # Short rows lack their trailing columns, as they would in a csv.DictReader row
+        return (name for name, position in self.layout.items() if position < len(self.values))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Student({dict(self)!r})"
+
+
+# Roster loaded once per session and kept in sync with students.csv and its journal.
+# New students are appended to students.csv; changes to existing students are
+# appended to the journal and replayed over the file until the next compaction.
+_roster_cache = {
+    "source": None,           # store the roster was read from, see roster_source()
+    "stamp": None,            # file_stamp of MAIN_FILE when last read
+    "inode": None,            # inode of MAIN_FILE, changes when the file is replaced
+    "offset": 0,              # bytes of MAIN_FILE already parsed
+    "journal_stamp": None,    # file_stamp of JOURNAL_FILE when last read
+    "journal_inode": None,    # inode of JOURNAL_FILE, changes when a checkpoint replaces it
+    "journal_offset": 0,      # bytes of JOURNAL_FILE already replayed
+    "journal_entries": 0,     # changes to existing rows replayed since the last compaction
+    "seq": 0,                 # sequence number of the last journal entry
+    "base_seq": 0,            # sequence number folded into students.csv by compaction
+    "changes": {},            # normalized student number -> seq of its last change
+    "change_log": [],         # (seq, normalized student number) in journal order
+    "inserted": {},           # normalized student number -> seq of its enrollment
+    "fieldnames": [],
+    "rows": [],
+    "index": {},              # normalized student number -> position in rows
+    "occupancy": {},          # (section, room) -> number of active students
+    "enrollments": {},        # normalized student number -> (course, year level, semester, subject codes)
+    "subject_index": {},      # subject code -> normalized student numbers enrolled in it
+    "offering_index": {},     # (course, year level, semester, subject code) -> active students taking it
+    "postings": {},           # indexed column -> value -> positions in rows, see query_students()
+    "statistics": {},         # headcounts of active students, see enrollment_statistics()
+    "name_index": None,       # name search index, built on the first search, see name_index()
+}
+
+# Held while load_roster brings the cache up to date, and by the service's reads while
+# they use it, so a read never sees the cache half updated by the writer thread
+_roster_lock = threading.RLock()
+
+# (thread, lock file) held -> nesting depth
+_held_locks = {}
+
+# Column order -> layout shared by every Student read with those columns
+_row_layouts = {}
+
+
+def normalize_student_number(student_number):
+    """Normalize a student number for lookups (strip spaces, upper case)."""
+    return (student_number or "").strip().upper()
+
+
+def file_stamp(path):
+    """Return (mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def row_layout(fieldnames):
+    """Return the (column -> position layout, categorical positions) shared by rows with these columns."""
+    key = tuple(fieldnames)
+    entry = _row_layouts.get(key)
+    if entry is None:
+        # A repeated column name resolves to its last position, as dict(zip(...)) did
+        layout = {name: position for position, name in enumerate(key)}
+        categorical = [position for name, position in layout.items() if name in CATEGORICAL_COLUMNS]
+        entry = _row_layouts[key] = (layout, categorical)
+    return entry
+
+
+def decode_values(layout, categorical, values):
+    """Build a Student from a list of values in a resolved layout (the list is reused).
+
+    Repeated categorical values are interned so every student shares one copy.
+    """
+    if len(values) > len(layout):
+        del values[len(layout):]
+    count = len(values)
+    for position in categorical:
+        if position < count and type(values[position]) is str:
+            values[position] = sys.intern(values[position])
+    return Student(tuple(values), layout)
+
+
+def decode_row(fieldnames, values):
+    """Build a Student from a list of values laid out as fieldnames."""
+    layout, categorical = row_layout(fieldnames)
+    return decode_values(layout, categorical, values)
+
+
+def as_student(row):
+    """Return a row dict (or Student) as a Student in the current layout."""
+    if isinstance(row, Student):
+        return row
+    names = list(row)
+    if names[:len(STUDENT_HEADER)] == STUDENT_HEADER:
+        return decode_row(names, list(row.values()))
+    extras = [name for name in names if LEGACY_COLUMNS.get(name, name) not in STUDENT_HEADER]
+    return decode_row(STUDENT_HEADER + extras, upgrade_row(row, extras))
+
+
+def row_decoder(fieldnames):
+    """Return a function building Students from the CSV value lists of a file with this header.
+
+    The layout is resolved once here rather than per row. A file in the current layout
+    has its short rows padded, so every column sits at its fixed position.
+    """
+    layout, categorical = row_layout(fieldnames)
+    width = len(fieldnames)
+    if list(fieldnames[:len(STUDENT_HEADER)]) == STUDENT_HEADER:
+        def decode_current(values):
+            if len(values) < width:
+                values.extend([""] * (width - len(values)))
+            return decode_values(layout, categorical, values)
+        return decode_current
+
+    # Under an older header, a row of another known layout is recognized by its width,
+    # e.g. one written by the current enrollment form
+    layouts = {len(header): row_layout(header) for header in ROSTER_LAYOUTS.values()}
+    layouts[width] = (layout, categorical)
+    return lambda values: decode_values(*layouts.get(len(values), (layout, categorical)), values)
+
+
+def row_schema(row):
+    """Return the ROSTER_LAYOUTS key of the layout a decoded row came in, or None."""
+    for schema in (SCHEMA_VERSION, 1, "masterlist"):
+        if ROSTER_LAYOUTS[schema][1] in row:
+            return schema
+    return None
+
+
+def upgrade_row(row, extras=()):
+    """Return the values of a row in any known layout in STUDENT_HEADER order, followed by extras.
+
+    Older rows get their columns renamed, a Full Name split into Last and First Name,
+    numeric year levels and semesters spelled out, and the room of their section.
+    """
+    fields = {LEGACY_COLUMNS.get(name, name): "" if value is None else value for name, value in row.items()}
+    if row_schema(row) != SCHEMA_VERSION:
+        full_name = str(fields.get("Full Name", "")).strip()
+        last_name, _, first_name = full_name.partition(",")
+        # A name without a comma cannot be split reliably, so it is kept whole as the first name
+        fields["Last Name"], fields["First Name"] = (last_name.strip(), first_name.strip()) if first_name else ("", full_name)
+        year_level = str(fields.get("Year Level", "")).strip()
+        fields["Year Level"] = LEGACY_YEAR_LEVELS.get(year_level, year_level)
+        semester = str(fields.get("Semester", "")).strip()
+        fields["Semester"] = LEGACY_SEMESTERS.get(semester, semester)
+        fields["Sex"] = str(fields.get("Sex", "")).upper()
+        fields["Room"] = ROOM_ASSIGNMENTS.get(str(fields.get("Section", "")), "Room Not Assigned")
+        fields["Archived"] = "No"
+    return [fields.get(name, "") for name in STUDENT_HEADER + list(extras)]
+
+
+def roster_fieldnames(fieldnames):
+    """Return the file's columns followed by any current-format columns it lacks."""
+    if not fieldnames:
+        return list(STUDENT_HEADER)
+    return list(fieldnames) + [name for name in STUDENT_HEADER if name not in fieldnames]
+
+
+def read_complete_lines(path, offset):
+    """Read the newline-terminated bytes of a file from offset; return (text, new offset)."""
+    with span("file_read", file=path):
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+    # Leave a partially written last line for the next read
+    end = data.rfind(b"\n") + 1
+    count_metric("enrollment_bytes_read_total", end, file=path)
+    return data[:end].decode("utf-8"), offset + end
+
+
+def update_row_indexes(roster, row, sign, position):
+    """Add (sign=1) or remove (sign=-1) the contribution of the row at a position to the roster's derived indexes."""
+    # Section occupancy counts active students with an assigned room
+    values = row.values
+    room = values[ROOM_COLUMN] or ""
+    if room and (values[ARCHIVED_COLUMN] or "No").upper() != "YES":
+        key = (values[SECTION_COLUMN] or "", room)
+        roster["occupancy"][key] = roster["occupancy"].get(key, 0) + sign
+    # Posting lists of the filtered columns
+    for column, value in zip(INDEXED_COLUMNS, indexed_values(values)):
+        postings = roster["postings"][column]
+        if sign > 0:
+            postings.setdefault(value, set()).add(position)
+        else:
+            postings[value].discard(position)
+            if not postings[value]:
+                del postings[value]
+    # Headcounts for the enrollment statistics
+    count_statistics(roster["statistics"], values, sign)
+    # Subject enrollments, indexed by subject code
+    index_enrollments(roster, row, sign)
+    # Names, once a search has built the index
+    if roster["name_index"] is not None:
+        index_names(roster["name_index"], row, sign)
+
+
+def add_row(roster, key, row):
+    """Append a row to the roster and its indexes."""
+    row = as_student(row)
+    # Keep the first row for a student number, matching the old linear scans
+    if key not in roster["index"]:
+        roster["index"][key] = len(roster["rows"])
+    roster["rows"].append(row)
+    update_row_indexes(roster, row, 1, len(roster["rows"]) - 1)
+
+
+def replace_row(roster, position, row):
+    """Replace the row at a position, keeping the derived indexes in step."""
+    row = as_student(row)
+    update_row_indexes(roster, roster["rows"][position], -1, position)
+    roster["rows"][position] = row
+    update_row_indexes(roster, row, 1, position)
+
+
+def empty_postings():
+    """Return posting lists with no rows, one per indexed column."""
+    return {column: {} for column in INDEXED_COLUMNS}
+
+
+def indexed_values(values):
+    """Return a row's values of INDEXED_COLUMNS, with Archived read as "Yes" or "No"."""
+    indexed = [values[position] for position in INDEXED_POSITIONS]
+    indexed[0] = "Yes" if (indexed[0] or "No").upper() == "YES" else "No"
+    return indexed
+
+
+def index_rows(roster, keys, encoded=None):
+    """Build the indexes of a roster whose rows were all read at once (keys are their student numbers).
+
+    The result is what add_row gives row by row, but students who share a course, year
+    level, semester, subjects, section and room are indexed together. encoded passes
+    the snapshot's dictionary-coded columns on to compute_statistics.
+    """
+    roster["statistics"] = compute_statistics(roster["rows"], encoded)
+    # Keep the first row for a student number, as add_row does
+    roster["index"].update(zip(reversed(keys), range(len(keys) - 1, -1, -1)))
+    groups = {}
+    for position, row in enumerate(roster["rows"]):
+        values = row.values
+        group = (values[SUBJECTS_COLUMN], values[COURSE_COLUMN], values[YEAR_LEVEL_COLUMN], values[SEMESTER_COLUMN],
+                 values[SECTION_COLUMN], values[ROOM_COLUMN], values[ARCHIVED_COLUMN])
+        positions = groups.get(group)
+        if positions is None:
+            groups[group] = [position]
+        else:
+            positions.append(position)
+
+    for (subjects, course, year_level, semester, section, room, archived), positions in groups.items():
+        members = list(map(keys.__getitem__, positions))
+        archived = "Yes" if (archived or "No").upper() == "YES" else "No"
+        for column, value in zip(INDEXED_COLUMNS, (archived, course, year_level, semester, section, room)):
+            roster["postings"][column].setdefault(value, set()).update(positions)
+        active = archived == "No"
+        if room and active:
+            key = (section or "", room)
+            roster["occupancy"][key] = roster["occupancy"].get(key, 0) + len(members)
+        offering = (course, year_level, semester)
+        codes = subject_codes(subjects, *offering)
+        roster["enrollments"].update(dict.fromkeys(members, offering + (codes,)))
+        for code in codes:
+            roster["subject_index"].setdefault(code, set()).update(members)
+            if active:
+                roster["offering_index"].setdefault(offering + (code,), set()).update(members)
+    if roster["name_index"] is not None:
+        for row in roster["rows"]:
+            index_names(roster["name_index"], row, 1)
+
+
+def read_roster_rows(roster):
+    """Parse rows appended to students.csv since the last read into the roster."""
+    text, roster["offset"] = read_complete_lines(MAIN_FILE, roster["offset"])
+    with span("csv_parse"):
+        reader = csv.reader(io.StringIO(text))
+        if not roster["fieldnames"]:
+            roster["fieldnames"] = next(reader, [])
+        decode = row_decoder(roster["fieldnames"])
+        rows = len(roster["rows"])
+        if not rows:
+            # A first read is indexed in bulk rather than row by row
+            roster["rows"] = [decode(values) for values in reader if values]
+            index_rows(roster, [normalize_student_number(row.values[STUDENT_NUMBER_COLUMN]) for row in roster["rows"]])
+        else:
+            for values in reader:
+                if not values:
+                    continue
+                row = decode(values)
+                add_row(roster, normalize_student_number(row.values[STUDENT_NUMBER_COLUMN]), row)
+    count_metric("enrollment_rows_scanned_total", len(roster["rows"]) - rows, source="students.csv")
+
+
+def journaled_row(row, entry):
+    """Return a copy of row with one upsert, archive or patch journal entry applied."""
+    if entry.get("op") == "upsert":
+        return as_student(entry["row"])
+    if row is None:
+        return None
+    row = dict(row)
+    if entry.get("op") == "archive":
+        row["Archived"] = entry["value"]
+    elif entry.get("op") == "patch":
+        row.update(entry["fields"])
+    return as_student(row)
+
+
+def apply_journal_entry(roster, entry):
+    """Apply one journal mutation (insert, upsert, archive or patch) to the roster."""
+    op = entry.get("op")
+    seq = entry.get("seq", 0)
+    roster["seq"] = max(roster["seq"], seq)
+    if op == "checkpoint":
+        roster["base_seq"] = seq
+        return
+
+    key = normalize_student_number(entry.get("student"))
+    roster["changes"][key] = seq
+    roster["change_log"].append((seq, key))
+    if op == "insert":
+        # The row itself was appended to students.csv; only its sequence is journaled
+        roster["inserted"][key] = seq
+        return
+    roster["journal_entries"] += 1
+    position = roster["index"].get(key)
+    if position is None and op != "upsert" and os.path.exists(MAIN_FILE):
+        # The student may have been appended after students.csv was last read
+        read_roster_rows(roster)
+        position = roster["index"].get(key)
+
+    # Rows are replaced rather than modified so callers holding a row keep a stable copy
+    if position is None:
+        if op == "upsert":
+            add_row(roster, key, journaled_row(None, entry))
+    else:
+        replace_row(roster, position, journaled_row(roster["rows"][position], entry))
+
+
+def replay_journal(roster):
+    """Apply journal entries written since the last replay."""
+    text, roster["journal_offset"] = read_complete_lines(JOURNAL_FILE, roster["journal_offset"])
+    replayed = 0
+    with span("journal_replay"):
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print_warning("Skipping unreadable journal entry.")
+                continue
+            apply_journal_entry(roster, entry)
+            replayed += 1
+    count_metric("enrollment_rows_scanned_total", replayed, source="students.journal")
+
+
+def load_roster():
+    """Return the cached roster, reading only what changed on disk since the last call."""
+    with _roster_lock:
+        return refresh_roster()
+
+
+def refresh_roster():
+    """Bring the roster cache up to date with the files on disk and return it (caller holds _roster_lock)."""
+    roster = _roster_cache
+    if STORAGE_BACKEND == "sqlite":
+        return db_load_roster(roster)
+    stamp = file_stamp(MAIN_FILE)
+    journal_stamp = file_stamp(JOURNAL_FILE)
+    if stamp == roster["stamp"] and journal_stamp == roster["journal_stamp"]:
+        return roster
+
+    inode = os.stat(MAIN_FILE).st_ino if stamp else None
+    journal_inode = os.stat(JOURNAL_FILE).st_ino if journal_stamp else None
+    base_appended = stamp is not None and inode == roster["inode"] and stamp[1] >= roster["offset"]
+    # Compaction replaces students.csv before the journal, so a reload in between has read
+    # part of the old journal: the new one, however long, must be read from the start
+    journal_appended = journal_stamp is None or (
+        (journal_inode == roster["journal_inode"] or not roster["journal_offset"])
+        and journal_stamp[1] >= roster["journal_offset"])
+    if not (base_appended and journal_appended):
+        # First load, or a file was replaced by compaction: start over
+        if stamp is not None and ensure_roster_schema():
+            return load_roster()
+        roster.update(source="csv", stamp=None, inode=inode, offset=0, journal_offset=0, journal_entries=0,
+                      seq=0, base_seq=0, changes={}, change_log=[], inserted={}, fieldnames=[], rows=[], index={},
+                      occupancy={}, enrollments={}, subject_index={},
+                      offering_index={}, postings=empty_postings(), statistics=empty_statistics(),
+                      name_index=None)
+        # Start from the snapshot, then read whatever was written after it
+        snapshot = read_roster_snapshot(roster) if stamp is not None else None
+        covered = roster["offset"] + roster["journal_offset"]
+    else:
+        snapshot = covered = None
+
+    if stamp is not None:
+        read_roster_rows(roster)
+    if journal_stamp is not None:
+        replay_journal(roster)
+    roster["stamp"] = stamp
+    roster["journal_stamp"] = journal_stamp
+    roster["journal_inode"] = journal_inode
+    if snapshot is False or (snapshot and roster["offset"] + roster["journal_offset"] - covered > SNAPSHOT_REFRESH_BYTES):
+        write_roster_snapshot(roster)
+    return roster
+
+
+def iter_roster_rows():
+    """Stream roster rows from disk with changes applied, one row at a time.
+
+    Unlike load_roster this never holds the whole roster in memory.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return db_iter_rows()
+    ensure_roster_schema()
+    return stream_csv_roster()
+
+
+def stream_csv_roster(path=MAIN_FILE, journal_path=JOURNAL_FILE):
+    """Stream the rows of a roster CSV with its journal (if any) applied."""
+    # Only the journal, which compaction keeps short, is read up front
+    pending = read_journal_state(journal_path)["pending"]
+    applied = set()
+    if os.path.exists(path):
+        with open(path, "r", newline="", encoding="utf-8") as file:
             reader = csv.reader(file)
-            next(reader, None)  # Skip header
-            rows = list(reader)
+            decode = row_decoder(next(reader, []))
+            for values in reader:
+                if not values:
+                    continue
+                row = decode(values)
+                key = normalize_student_number(row.get("Student Number", ""))
+                if key in pending and key not in applied:
+                    applied.add(key)
+                    for entry in pending[key]:
+                        row = journaled_row(row, entry)
+                yield row
+
+    # Students that exist only in the journal
+    for key, entries in pending.items():
+        if key in applied:
+            continue
+        row = None
+        for entry in entries:
+            row = journaled_row(row, entry)
+        if row is not None:
+            yield row
+
+
+def read_journal_state(journal_path=JOURNAL_FILE):
+    """Read a whole journal into what the roster cache keeps of it, without any rows.
+
+    Returns {"pending": row mutations per student number} plus the roster's "seq",
+    "base_seq", "changes", "change_log", "inserted", "journal_entries" and "source",
+    so sequence numbers and version stamps can be had without loading the roster.
+    """
+    state = {"pending": {}, "seq": 0, "base_seq": 0, "changes": {}, "change_log": [], "inserted": {},
+             "journal_entries": 0, "source": "csv"}
+    if journal_path and os.path.exists(journal_path):
+        text, _ = read_complete_lines(journal_path, 0)
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            # As apply_journal_entry keeps them
+            op = entry.get("op")
+            seq = entry.get("seq", 0)
+            state["seq"] = max(state["seq"], seq)
+            if op == "checkpoint":
+                state["base_seq"] = seq
+                continue
+            key = normalize_student_number(entry.get("student"))
+            state["changes"][key] = seq
+            state["change_log"].append((seq, key))
+            if op == "insert":
+                state["inserted"][key] = seq
+                continue
+            state["journal_entries"] += 1
+            if op in ("upsert", "archive", "patch"):
+                state["pending"].setdefault(key, []).append(entry)
+    return state
+
+
+def find_student(student_number):
+    """Look up a student row by student number in O(1), or return None."""
+    if REMOTE_SERVER:
+        return remote_student(student_number)[0]
+    if STORAGE_BACKEND == "sqlite":
+        return db_find_student(student_number)
+    if not roster_loaded():
+        # Nothing loaded in this process yet: read just this student's row
+        return seek_student(student_number)
+    roster = load_roster()
+    position = roster["index"].get(normalize_student_number(student_number))
+    return None if position is None else roster["rows"][position]
+
+
+def find_record(student_number):
+    """Return (row, version stamp) of a student from one read of the roster, or (None, None)."""
+    if REMOTE_SERVER:
+        return remote_student(student_number)
+    if STORAGE_BACKEND == "sqlite":
+        return db_find_record(student_number)
+    if not roster_loaded():
+        # As find_student: read just this student's row and its journal entries
+        return seek_record(student_number)
+    roster = load_roster()
+    key = normalize_student_number(student_number)
+    position = roster["index"].get(key)
+    if position is None:
+        return None, None
+    return roster["rows"][position], roster_version(roster, key)
+
+
+def record_version(student_number):
+    """Return a student's version stamp: (sequence of its last change, content hash), or None."""
+    return find_record(student_number)[1]
+
+
+def roster_version(roster, key):
+    """Return the version stamp of a student as of a loaded roster, or None."""
+    position = roster["index"].get(key)
+    if position is None:
+        return None
+    return (record_seq(roster, key), row_hash(roster["rows"][position], roster_fieldnames(roster["fieldnames"])))
+
+
+def check_record_versions(expected):
+    """Raise StaleRecordError if any record changed since its version stamp was read."""
+    for student_number, version in expected.items():
+        current = record_version(student_number)
+        # Compaction renumbers untouched records, so an unchanged hash also counts as current
+        if current is None or (current[0] != version[0] and current[1] != version[1]):
+            raise StaleRecordError(
+                f"Student {student_number} was changed at another station after it was opened. "
+                "Please reload the record and try again."
+            )
+
+
+def append_journal(entries, expected=None):
+    """Append mutations to the journal in one write and apply them to the roster.
+
+    expected maps student numbers to the version stamps read before editing; if any of
+    those records changed since, nothing is written and StaleRecordError is raised.
+    """
+    if REMOTE_SERVER:
+        return remote_journal(entries, expected)
+    if STORAGE_BACKEND == "sqlite":
+        return db_apply_changes(entries, expected)
+    with file_lock(ROSTER_LOCK_FILE):
+        # A station that never loaded the roster numbers its entries from the journal alone
+        loaded = roster_loaded()
+        roster = load_roster() if loaded else read_journal_state()
+        if expected:
+            check_record_versions(expected)
+        lines = []
+        for entry in entries:
+            roster["seq"] += 1
+            lines.append(json.dumps(dict(entry, seq=roster["seq"]), ensure_ascii=False))
+        text = "\n".join(lines) + "\n"
+        new_file = not os.path.exists(JOURNAL_FILE)
+        with span("file_write", file=JOURNAL_FILE), open(JOURNAL_FILE, "a", encoding="utf-8") as file:
+            file.write(text)
+            sync_append(file, new_file)
+        count_metric("enrollment_bytes_written_total", len(text.encode("utf-8")), file=JOURNAL_FILE)
+        finish_commit()
+
+        if loaded:
+            roster = load_roster()
+        else:
+            roster["journal_entries"] += sum(entry.get("op") != "insert" for entry in entries)
+        if roster["journal_entries"] >= JOURNAL_COMPACT_THRESHOLD:
+            compact_roster()
+    return roster
+
+
+def append_students(rows):
+    """Append new student rows (lists in STUDENT_HEADER order) to students.csv."""
+    if REMOTE_SERVER:
+        return remote_request("POST", "/students", {"rows": [list(row) for row in rows]})
+    if STORAGE_BACKEND == "sqlite":
+        return db_insert_students(rows)
+    with file_lock(ROSTER_LOCK_FILE):
+        write_csv_rows(rows)
+        # Journal an insert marker so the new rows get change sequence numbers
+        return append_journal([{"op": "insert", "student": row[0]} for row in rows])
+
+
+def write_csv_rows(rows):
+    """Append rows to students.csv, writing the header first if the file is new (caller holds the lock)."""
+    new_file = not os.path.exists(MAIN_FILE)
+    with span("file_write", file=MAIN_FILE), open(MAIN_FILE, "a", newline="", encoding="utf-8") as file:
+        start = file.tell()
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(STUDENT_HEADER)
+        writer.writerows(rows)
+        sync_append(file, new_file)
+        count_metric("enrollment_bytes_written_total", file.tell() - start, file=MAIN_FILE)
+
+
+def check_writes(writes):
+    """Split writes into those that can be applied and those that cannot; see commit_writes."""
+    results, rows, entries, touched = [], [], [], set()
+    for new_rows, write_entries, expected in writes:
+        new_keys = [normalize_student_number(row[0]) for row in new_rows]
+        keys = set(new_keys) | {normalize_student_number(entry.get("student")) for entry in write_entries}
+        try:
+            for key in new_keys:
+                if key in touched or find_student(key) is not None:
+                    raise StaleRecordError(f"Student number {key} is already enrolled.")
+            for student_number in expected or {}:
+                # An earlier write in the group changed this record after it was read
+                if normalize_student_number(student_number) in touched:
+                    raise StaleRecordError(
+                        f"Student {student_number} was changed at another station after it was opened. "
+                        "Please reload the record and try again."
+                    )
+            if expected:
+                check_record_versions(expected)
+        except StaleRecordError as e:
+            results.append(e)
+            continue
+        touched |= keys
+        rows += new_rows
+        entries += write_entries
+        results.append(None)
+    return results, rows, entries
+
+
+def commit_writes(writes):
+    """Commit a group of independent writes together; return each one's StaleRecordError, or None.
+
+    A write is (new rows, journal entries, expected versions). Each is checked against the
+    records as the writes before it leave them; a stale one is left out, and the rest
+    share one students.csv append and one journal write (one transaction on SQLite).
+    """
+    if STORAGE_BACKEND == "sqlite":
+        with db_transaction() as connection:
+            results, rows, entries = check_writes(writes)
+            seq = db_insert_rows(connection, rows, db_meta(connection, "seq"))
+            seq = db_apply_entries(connection, entries, seq)
+            connection.execute("UPDATE roster_meta SET value = ? WHERE name = 'seq'", (seq,))
+        load_roster()
+        return results
+    with file_lock(ROSTER_LOCK_FILE):
+        load_roster()
+        results, rows, entries = check_writes(writes)
+        if rows:
+            write_csv_rows(rows)
+        entries = [{"op": "insert", "student": row[0]} for row in rows] + entries
+        if entries:
+            append_journal(entries)
+    return results
+
+
+def write_students_csv(path, rows, fieldnames, durable=True):
+    """Write roster rows to a CSV file through a temporary file and rename (see atomic_write)."""
+    with span("file_write", file=path):
+        with atomic_write(path, durable=durable, newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+            count_metric("enrollment_bytes_written_total", file.tell(), file=path)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on a lock file for the duration of a with-block."""
+    # Nested use in the same thread shares the lock already held
+    key = (threading.get_ident(), path)
+    if _held_locks.get(key):
+        _held_locks[key] += 1
+        try:
+            yield
+        finally:
+            _held_locks[key] -= 1
+        return
+
+    with open(path, "a+b") as handle:
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        _held_locks[key] = 1
+        try:
+            yield
+        finally:
+            _held_locks[key] = 0
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def paused_gc():
+    """Suspend cyclic garbage collection while a with-block builds many objects at once."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_json_file(path, default=None):
+    """Read a small JSON sidecar file, returning default if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def write_json_file(path, data, durable=True):
+    """Replace a small JSON sidecar file through a temporary file and rename (see atomic_write)."""
+    with atomic_write(path, durable=durable, encoding="utf-8") as file:
+        json.dump(data, file)
+
 
-            if not rows:
-                return "2025-0001"
+def compact_roster():
+    """Fold the journal into a fresh students.csv and reset the journal."""
+    if REMOTE_SERVER:
+        # The service compacts its own files
+        return None
+    if STORAGE_BACKEND == "sqlite":
+        return db_compact()
+    with file_lock(ROSTER_LOCK_FILE):
+        return fold_journal()
+
+
+def fold_journal():
+    """Rewrite students.csv with the journal applied (caller holds the roster lock)."""
+    roster = load_roster()
+    if roster["seq"] <= roster["base_seq"]:
+        return roster
+
+    fieldnames = roster_fieldnames(roster["fieldnames"])
+    write_students_csv(MAIN_FILE, roster["rows"], fieldnames)
+    # Replaying the old journal over the new file is harmless (every mutation sets
+    # values), so a crash between the two replacements loses nothing
+    write_checkpoint(roster["seq"])
+
+    # The department copies fold their pending changes at the same time
+    rebuild_replicas()
+    return load_roster()
+
+
+def write_checkpoint(seq):
+    """Replace the journal with a checkpoint at seq once its entries are in students.csv."""
+    with atomic_write(JOURNAL_FILE, encoding="utf-8") as file:
+        file.write(json.dumps({"op": "checkpoint", "seq": seq}) + "\n")
+
+
+def rebuild_replicas():
+    """Rebuild every department copy from students.csv, warning about any that fail."""
+    for path in REPLICA_TARGETS.values():
+        try:
+            rebuild_replica(path, MAIN_FILE)
+        except OSError as e:
+            print_warning(f"Could not rebuild {path}: {str(e)}")
+
+
+def record_seq(roster, key):
+    """Return the change sequence of a student (compacted rows share the checkpoint's)."""
+    return roster["changes"].get(key, roster["base_seq"])
+
+
+def roster_exists():
+    """Return True if the configured store holds a roster."""
+    if REMOTE_SERVER:
+        return remote_request("GET", "/health")["roster"]
+    if STORAGE_BACKEND == "sqlite":
+        return os.path.exists(DATABASE_FILE)
+    return os.path.exists(MAIN_FILE)
+
+
+# ==================== ROSTER SNAPSHOT ====================
+
+# SNAPSHOT_FILE holds the roster as it stood once some prefix of students.csv and its
+# journal had been read, so a station starts without parsing the CSV. It is laid out
+# column by column and read through mmap:
+#   SNAPSHOT_MAGIC | meta length (4 bytes, little endian) | meta (JSON) | one section per column
+# Categorical columns are stored as 32-bit codes into a dictionary kept in the meta;
+# the others as their values joined by NUL bytes. The meta records the inode, size,
+# mtime and checksum of the file bytes the snapshot covers, so a snapshot that no
+# longer matches students.csv or the journal is ignored and rebuilt.
+
+SNAPSHOT_MAGIC = b"ENRSNAP1"
+SNAPSHOT_FORMAT = 1
+
+
+def file_checksum(path, length):
+    """Return the BLAKE2 checksum of the first length bytes of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while length > 0:
+            chunk = file.read(min(length, 2 ** 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            length -= len(chunk)
+    return digest.hexdigest()
+
+
+def covered_file(path, length):
+    """Describe the first length bytes of a file for a snapshot (None if there are none)."""
+    if not length:
+        return None
+    stat = os.stat(path)
+    return {"inode": stat.st_ino, "size": length, "mtime_ns": stat.st_mtime_ns if stat.st_size == length else None,
+            "checksum": file_checksum(path, length)}
+
+
+def snapshot_covers(covered, path):
+    """Return True if a file still starts with the bytes a snapshot covered."""
+    if covered is None:
+        return True
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if stat.st_ino != covered["inode"] or stat.st_size < covered["size"]:
+        return False
+    if stat.st_size == covered["size"] and stat.st_mtime_ns == covered["mtime_ns"]:
+        # Untouched since the snapshot was written
+        return True
+    # Appended to since: the bytes the snapshot covers must be the same
+    return file_checksum(path, covered["size"]) == covered["checksum"]
+
+
+def write_roster_snapshot(roster):
+    """Write the loaded CSV roster to SNAPSHOT_FILE; return True if it was written."""
+    fieldnames = roster_fieldnames(roster["fieldnames"])
+    layout = row_layout(fieldnames)[0]
+    with span("snapshot_write"):
+        # Values are stored as compaction would write them to students.csv
+        columns = list(zip(*(row.values if row.layout is layout else [row.get(name) for name in fieldnames]
+                             for row in roster["rows"]))) or [()] * len(fieldnames)
+        sections = []
+        meta_columns = []
+        for name, column in zip(fieldnames, columns):
+            if set(map(type, column)) - {str}:
+                column = ["" if value is None else str(value) for value in column]
+            if name in CATEGORICAL_COLUMNS:
+                dictionary = list(dict.fromkeys(column))
+                codes = dict(zip(dictionary, range(len(dictionary))))
+                sections.append(array.array("I", map(codes.__getitem__, column)).tobytes())
+                meta_columns.append({"name": name, "values": dictionary})
+            else:
+                sections.append("\0".join(column).encode("utf-8"))
+                if sections[-1].count(b"\0") != max(len(column) - 1, 0):
+                    # A value holding a NUL byte cannot be stored this way
+                    return False
+                meta_columns.append({"name": name})
+        keys = [normalize_student_number(key) for key in columns[layout["Student Number"]]]
+        sections.append("\0".join(keys).encode("utf-8"))
 
-            # Find the highest student number
-            last_number = max([row[0] for row in rows if row])
-            num = int(last_number.split("-")[1]) + 1
-            return f"2025-{num:04d}"
+        try:
+            meta = {
+                "format": SNAPSHOT_FORMAT, "byteorder": sys.byteorder, "itemsize": array.array("I").itemsize,
+                "rows": len(roster["rows"]), "fieldnames": roster["fieldnames"], "columns": meta_columns,
+                "csv": covered_file(MAIN_FILE, roster["offset"]),
+                "journal": covered_file(JOURNAL_FILE, roster["journal_offset"]),
+                "state": {name: roster[name] for name in ("seq", "base_seq", "journal_entries", "changes",
+                                                           "inserted", "change_log")},
+            }
+            # Compaction replaces students.csv before the journal, so an unchanged
+            # students.csv means the journal checked above was the one replayed
+            if os.stat(MAIN_FILE).st_ino != roster["inode"]:
+                return False
+            position = 0
+            meta["sections"] = []
+            for data in sections:
+                meta["sections"].append([position, len(data)])
+                # Sections start on 4-byte boundaries, like the codes in them
+                position += len(data) + -len(data) % 4
+            encoded = json.dumps(meta).encode("utf-8")
+            encoded += b" " * (-(len(SNAPSHOT_MAGIC) + 4 + len(encoded)) % 4)
+
+            directory = os.path.dirname(os.path.abspath(SNAPSHOT_FILE))
+            handle, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(SNAPSHOT_FILE)}.", dir=directory)
+            try:
+                with os.fdopen(handle, "wb") as file:
+                    file.write(SNAPSHOT_MAGIC + len(encoded).to_bytes(4, "little") + encoded)
+                    for data in sections:
+                        file.write(data + b"\0" * (-len(data) % 4))
+                    count_metric("enrollment_bytes_written_total", file.tell(), file=SNAPSHOT_FILE)
+                os.replace(temp_path, SNAPSHOT_FILE)
+            except BaseException:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            # The snapshot only speeds up startup; the roster is read from students.csv without it
+            return False
+    return True
+
+
+def read_roster_snapshot(roster):
+    """Restore a freshly reset roster from SNAPSHOT_FILE if it still matches the files; return True if it did."""
+    try:
+        with span("snapshot_load"), paused_gc(), open(SNAPSHOT_FILE, "rb") as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                return False
+            start = len(SNAPSHOT_MAGIC) + 4
+            start += int.from_bytes(data[len(SNAPSHOT_MAGIC):start], "little")
+            meta = json.loads(data[len(SNAPSHOT_MAGIC) + 4:start])
+            if (meta["format"], meta["byteorder"], meta["itemsize"]) != (SNAPSHOT_FORMAT, sys.byteorder,
+                                                                          array.array("I").itemsize):
+                return False
+            if not (snapshot_covers(meta["csv"], MAIN_FILE) and snapshot_covers(meta["journal"], JOURNAL_FILE)):
+                return False
+
+            count = meta["rows"]
+            columns = []
+            encoded = {}
+            for column, (offset, length) in zip(meta["columns"] + [{}], meta["sections"]):
+                section = data[start + offset:start + offset + length]
+                if "values" in column:
+                    dictionary = [sys.intern(value) for value in column["values"]]
+                    codes = array.array("I")
+                    codes.frombytes(section)
+                    columns.append(list(map(dictionary.__getitem__, codes)))
+                    encoded[column["name"]] = (dictionary, codes)
+                else:
+                    columns.append(section.decode("utf-8").split("\0") if count else [])
+                if len(columns[-1]) != count:
+                    return False
+            count_metric("enrollment_bytes_read_total", len(data), file=SNAPSHOT_FILE)
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        # Missing, empty or damaged: the roster is read from students.csv instead
+        return False
+
+    keys = columns.pop()
+    layout = row_layout([column["name"] for column in meta["columns"]])[0]
+    state = meta["state"]
+    with paused_gc():
+        rows = [Student(values, layout) for values in zip(*columns)]
+    roster.update(fieldnames=meta["fieldnames"], rows=rows,
+                  offset=meta["csv"]["size"] if meta["csv"] else 0,
+                  journal_offset=meta["journal"]["size"] if meta["journal"] else 0,
+                  seq=state["seq"], base_seq=state["base_seq"], journal_entries=state["journal_entries"],
+                  changes=state["changes"], inserted=state["inserted"],
+                  change_log=[tuple(change) for change in state["change_log"]])
+    index_rows(roster, keys, encoded)
+    count_metric("enrollment_rows_scanned_total", count, source="students.snapshot")
+    return True
+
+
+# ==================== OFFSET INDEX ====================
+
+# OFFSET_INDEX_FILE lets a station read one student from students.csv without parsing
+# the rest. After a header recording the inode, the bytes of students.csv covered and
+# their mtime, it holds one fixed-width record per row, sorted by student number:
+#   student number (UTF-8, NUL padded) | byte offset | length
+# Rows appended since are indexed from the covered offset on and merged in; a
+# students.csv that was replaced or rewritten gets its index rebuilt.
+
+OFFSET_INDEX_MAGIC = b"ENRIDX01"
+OFFSET_INDEX_HEADER = struct.Struct("<8sQQqQ")   # magic, inode, bytes covered, mtime_ns, records
+OFFSET_INDEX_RECORD = struct.Struct(f"<{OFFSET_INDEX_KEY_WIDTH}sQI")
+
+
+def offset_index_key(student_number):
+    """Return the fixed-width index key of a student number (longer ones are cut short)."""
+    key = normalize_student_number(student_number).encode("utf-8")[:OFFSET_INDEX_KEY_WIDTH]
+    return key.ljust(OFFSET_INDEX_KEY_WIDTH, b"\0")
+
+
+def scan_row_offsets(file, offset):
+    """Return ([(index key, offset, length)] of the complete rows of a CSV from offset, end offset)."""
+    file.seek(offset)
+    entries = []
+    record = b""
+    for line in file:
+        if not line.endswith(b"\n"):
+            # Leave a partially written last row for the next scan
+            break
+        record = record + line if record else line
+        if record.count(b'"') % 2:
+            # A quoted value continues on the next line
+            continue
+        if record.strip():
+            if record.startswith(b'"'):
+                number = next(csv.reader([record.decode("utf-8")]))[0]
+            else:
+                number = record.split(b",", 1)[0].rstrip(b"\r\n").decode("utf-8")
+            entries.append((offset_index_key(number), offset, len(record)))
+        offset += len(record)
+        record = b""
+    return entries, offset
+
+
+def refresh_offset_index(file):
+    """Bring OFFSET_INDEX_FILE up to date with an open students.csv."""
+    stat = os.fstat(file.fileno())
+    merged = None
+    try:
+        with open(OFFSET_INDEX_FILE, "rb") as index_file:
+            magic, inode, covered, mtime_ns, count = OFFSET_INDEX_HEADER.unpack(
+                index_file.read(OFFSET_INDEX_HEADER.size))
+            size = os.fstat(index_file.fileno()).st_size
+            if magic == OFFSET_INDEX_MAGIC and inode == stat.st_ino and covered <= stat.st_size and \
+                    size == OFFSET_INDEX_HEADER.size + count * OFFSET_INDEX_RECORD.size:
+                if covered == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                    return
+                if covered < stat.st_size:
+                    # Rows were appended: index only those and splice them in
+                    with span("offset_index_update"), \
+                            mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        entries, end = scan_row_offsets(file, covered)
+                        entries.sort()
+                        merged = []
+                        previous = OFFSET_INDEX_HEADER.size
+                        for entry in entries:
+                            # After the rows already filed under the same student number
+                            position = OFFSET_INDEX_HEADER.size + OFFSET_INDEX_RECORD.size * \
+                                search_offset_index(data, count, entry[0], after=True)
+                            merged += [data[previous:position], OFFSET_INDEX_RECORD.pack(*entry)]
+                            previous = position
+                        merged.append(data[previous:])
+    except (OSError, struct.error):
+        pass
+    if merged is not None:
+        write_offset_index(merged, count + len(entries), stat.st_ino, end, os.fstat(file.fileno()))
+        return
+
+    with span("offset_index_build"):
+        file.seek(0)
+        entries, end = scan_row_offsets(file, len(file.readline()))
+        entries.sort()
+        write_offset_index([OFFSET_INDEX_RECORD.pack(*entry) for entry in entries], len(entries), stat.st_ino,
+                           end, os.fstat(file.fileno()))
+
+
+def write_offset_index(records, count, inode, covered, stat):
+    """Replace OFFSET_INDEX_FILE with packed, sorted records covering students.csv up to covered."""
+    mtime_ns = stat.st_mtime_ns if stat.st_size == covered else -1
+    handle, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(OFFSET_INDEX_FILE)}.",
+                                         dir=os.path.dirname(os.path.abspath(OFFSET_INDEX_FILE)))
+    try:
+        with os.fdopen(handle, "wb") as index_file:
+            index_file.write(OFFSET_INDEX_HEADER.pack(OFFSET_INDEX_MAGIC, inode, covered, mtime_ns, count))
+            index_file.write(b"".join(records))
+            count_metric("enrollment_bytes_written_total", index_file.tell(), file=OFFSET_INDEX_FILE)
+        os.replace(temp_path, OFFSET_INDEX_FILE)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def search_offset_index(data, count, key, after=False):
+    """Binary-search a mapped offset index; return the position of the first record filed
+    under key (or, with after, of the first one past it)."""
+    size = OFFSET_INDEX_RECORD.size
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        start = OFFSET_INDEX_HEADER.size + middle * size
+        found = data[start:start + OFFSET_INDEX_KEY_WIDTH]
+        if found < key or (after and found == key):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def indexed_rows(data, student_number):
+    """Yield (offset, length) of the rows filed under a student number in a mapped offset index."""
+    key = offset_index_key(student_number)
+    count = OFFSET_INDEX_HEADER.unpack_from(data)[4]
+    for position in range(search_offset_index(data, count, key), count):
+        found, offset, length = OFFSET_INDEX_RECORD.unpack_from(
+            data, OFFSET_INDEX_HEADER.size + position * OFFSET_INDEX_RECORD.size)
+        if found != key:
+            return
+        yield offset, length
+
+
+def seek_student(student_number):
+    """Read one student's row from students.csv through the offset index, with the journal applied."""
+    return seek_record(student_number)[0]
+
+
+def seek_record(student_number, state=None):
+    """Return (row, version stamp) of one student as seek_student reads it, or (None, None).
+
+    state is a read_journal_state() to use instead of reading the journal again.
+    """
+    ensure_roster_schema()
+    key = normalize_student_number(student_number)
+    # The journal is read first: a compaction in between then only replays changes already folded in
+    state = state or read_journal_state(JOURNAL_FILE)
+    pending = state["pending"].get(key, [])
+    row = None
+    fieldnames = []
+    try:
+        with span("offset_index_lookup"), open(MAIN_FILE, "rb") as file:
+            refresh_offset_index(file)
+            with open(OFFSET_INDEX_FILE, "rb") as index_file, \
+                    mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if OFFSET_INDEX_HEADER.unpack_from(data)[1] != os.fstat(file.fileno()).st_ino:
+                    raise ValueError("students.csv was replaced during the lookup")
+                fieldnames = file_header(MAIN_FILE)
+                decode = row_decoder(fieldnames)
+                for offset, length in indexed_rows(data, key):
+                    file.seek(offset)
+                    candidate = decode(next(csv.reader(io.StringIO(file.read(length).decode("utf-8")))))
+                    # Student numbers longer than the index key share one; keep the first that matches
+                    if normalize_student_number(candidate.values[STUDENT_NUMBER_COLUMN]) == key:
+                        row = candidate
+                        break
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, struct.error):
+        # Fall back to the loaded roster when the index cannot be used
+        roster = load_roster()
+        position = roster["index"].get(key)
+        return (None, None) if position is None else (roster["rows"][position], roster_version(roster, key))
+
+    for entry in pending:
+        row = journaled_row(row, entry)
+    if row is None:
+        return None, None
+    # The stamp record_version would give with the roster loaded
+    return row, (state["changes"].get(key, state["base_seq"]), row_hash(row, roster_fieldnames(fieldnames)))
+
+
+# ==================== SCHEMA MIGRATION ====================
+
+# Rosters written before SCHEMA_VERSION are rewritten once in the current layout by a
+# single streaming pass, so a roster of any size migrates in constant memory. After
+# that every roster row has its columns at fixed positions and is read without fallbacks.
+
+_schema_checked = {}   # roster file -> inode whose header is known to be current
+
+
+def file_header(path):
+    """Return the header row of a CSV file ([] if it is empty)."""
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        return next(csv.reader(file), [])
+
+
+def migrate_roster(path=MAIN_FILE, output=None):
+    """Rewrite a roster CSV in the current layout; return the number of rows found in each layout.
+
+    Each row's layout is detected on its own (see row_decoder) and upgraded with
+    upgrade_row. Columns only the old header had are kept after STUDENT_HEADER. The file
+    is replaced in place, keeping the original as <path>.bak, unless output names
+    another file to write. students.csv has its journal folded in, its department
+    copies rebuilt and the schema version recorded in SCHEMA_FILE.
+    """
+    roster_file = output is None and os.path.abspath(path) == os.path.abspath(MAIN_FILE)
+    with file_lock(ROSTER_LOCK_FILE) if roster_file else nullcontext():
+        header = [LEGACY_COLUMNS.get(name, name) for name in file_header(path)]
+        extras = [name for name in dict.fromkeys(header) if name not in STUDENT_HEADER]
+        counts = {}
+        if not output:
+            shutil.copyfile(path, f"{path}.bak")
+        with span("migrate", file=path), atomic_write(output or path, newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(STUDENT_HEADER + extras)
+            for row in stream_csv_roster(path, JOURNAL_FILE if roster_file else None):
+                schema = row_schema(row)
+                counts[schema] = counts.get(schema, 0) + 1
+                writer.writerow(upgrade_row(row, extras))
+        if output:
+            return counts
+
+        if roster_file:
+            # The journal is now part of students.csv; its last sequence number stays the checkpoint
+            seq = read_journal_state(JOURNAL_FILE)["seq"]
+            if os.path.exists(JOURNAL_FILE):
+                shutil.copyfile(JOURNAL_FILE, f"{JOURNAL_FILE}.bak")
+            write_checkpoint(seq)
+            write_json_file(SCHEMA_FILE, {"version": SCHEMA_VERSION, "migrated": datetime.now().isoformat(timespec="seconds"),
+                                          "rows": {str(schema): count for schema, count in counts.items()},
+                                          "backup": f"{path}.bak"})
+            rebuild_replicas()
+    return counts
+
+
+def ensure_roster_schema():
+    """Migrate students.csv if it is still in an older layout; return True if it was migrated."""
+    try:
+        inode = os.stat(MAIN_FILE).st_ino
+    except FileNotFoundError:
+        return False
+    if _schema_checked.get(MAIN_FILE) == inode:
+        return False
+
+    migrated = False
+    if file_header(MAIN_FILE)[:len(STUDENT_HEADER)] != STUDENT_HEADER:
+        with file_lock(ROSTER_LOCK_FILE):
+            # Another station may have migrated it while this one waited for the lock
+            if file_header(MAIN_FILE)[:len(STUDENT_HEADER)] != STUDENT_HEADER:
+                print_info(f"Upgrading {MAIN_FILE} to the current layout (a copy is kept as {MAIN_FILE}.bak)...")
+                migrate_roster()
+                migrated = True
+            inode = os.stat(MAIN_FILE).st_ino
+    _schema_checked[MAIN_FILE] = inode
+    return migrated
+
+
+# ==================== SQLITE BACKEND ====================
+
+# With ENROLLMENT_BACKEND=sqlite the roster lives in one table of DATABASE_FILE instead
+# of students.csv and its journal. Each row records the sequence of its last change and
+# of its enrollment, so the roster cache, replication and version checks work exactly
+# as they do over the CSV files. The Registrar and Librarian copies stay CSV.
+
+def column_name(header):
+    """Return the SQL column name for a STUDENT_HEADER column, e.g. "City/Municipality"."""
+    return header.lower().replace("/", "_").replace(" ", "_")
+
+
+STUDENT_COLUMNS = [column_name(name) for name in STUDENT_HEADER]
+STUDENT_COLUMN_LIST = ", ".join(STUDENT_COLUMNS)
+DATABASE_ROW_LAYOUT = row_layout(STUDENT_HEADER)
+
+DATABASE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS students (
+    student_key TEXT PRIMARY KEY,  -- normalized student number, the lookup index
+    {", ".join(f"{column} TEXT NOT NULL DEFAULT ''" for column in STUDENT_COLUMNS)},
+    seq INTEGER NOT NULL,          -- sequence of the row's last change
+    inserted_seq INTEGER NOT NULL  -- sequence of the student's enrollment
+);
+CREATE INDEX IF NOT EXISTS students_section_room ON students (section, room);
+CREATE INDEX IF NOT EXISTS students_course_year_semester ON students (course, year_level, semester);
+CREATE INDEX IF NOT EXISTS students_archived ON students (archived);
+CREATE INDEX IF NOT EXISTS students_seq ON students (seq);
+CREATE TABLE IF NOT EXISTS enrollments (
+    student_key TEXT NOT NULL,
+    course TEXT NOT NULL,
+    year_level TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    subject_code TEXT NOT NULL,
+    PRIMARY KEY (student_key, subject_code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS enrollments_subject ON enrollments (subject_code, course, year_level, semester);
+CREATE TABLE IF NOT EXISTS roster_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO roster_meta (name, value) VALUES ('seq', 0), ('generation', 1), ('enrollments', 0),
+    ('schema', {SCHEMA_VERSION});
+"""
+
+DATABASE_INSERT = (
+    f"INSERT INTO students (student_key, {STUDENT_COLUMN_LIST}, seq, inserted_seq) "
+    f"VALUES ({', '.join('?' * (len(STUDENT_COLUMNS) + 3))})"
+)
+# Upsert keeping the enrollment sequence of a student already in the table
+DATABASE_UPSERT = (
+    f"{DATABASE_INSERT} ON CONFLICT (student_key) DO UPDATE SET "
+    f"{', '.join(f'{column} = excluded.{column}' for column in STUDENT_COLUMNS)}, seq = excluded.seq"
+)
+# Import keeping the first row for a repeated student number
+DATABASE_IMPORT = f"{DATABASE_INSERT} ON CONFLICT (student_key) DO NOTHING"
+DATABASE_ENROLLMENT_INSERT = (
+    "INSERT OR IGNORE INTO enrollments (student_key, course, year_level, semester, subject_code) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# SQLite's own fsync setting for each DURABILITY level. In WAL mode NORMAL fsyncs at
+# checkpoints rather than on every commit, which is SQLite's form of batching
+SQLITE_SYNCHRONOUS = {"commit": "FULL", "batch": "NORMAL", "os": "OFF"}
+
+# Open connection per thread and database path (sqlite3 connections stay on their thread)
+_db_connections = {}
+
+
+def db_connect():
+    """Return this thread's connection to DATABASE_FILE, creating the schema on first use."""
+    path = os.path.abspath(DATABASE_FILE)
+    key = (threading.get_ident(), path)
+    connection = _db_connections.get(key)
+    if connection is None:
+        # Autocommit mode: writes run in explicit BEGIN IMMEDIATE transactions
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS.get(DURABILITY, 'FULL')}")
+        connection.executescript(DATABASE_SCHEMA)
+        _db_connections[key] = connection
+        if not db_meta(connection, "enrollments"):
+            # Databases created before the enrollments table get it filled once
+            with db_transaction() as connection:
+                db_rebuild_enrollments(connection)
+    return connection
+
+
+@contextmanager
+def db_transaction():
+    """Run a with-block as one write transaction; other stations wait for it to commit."""
+    connection = db_connect()
+    with span("db_transaction"):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+def db_meta(connection, name):
+    """Return a counter from the roster_meta table."""
+    return connection.execute("SELECT value FROM roster_meta WHERE name = ?", (name,)).fetchone()[0]
+
+
+def db_values(row):
+    """Return a row's STUDENT_HEADER values as strings for the students table."""
+    return ["" if row.get(name) is None else str(row.get(name)) for name in STUDENT_HEADER]
+
+
+def db_row(values):
+    """Build a Student from students table values in STUDENT_HEADER order."""
+    return decode_values(*DATABASE_ROW_LAYOUT, list(values))
+
+
+def db_write_enrollments(connection, row, replace=True):
+    """Write a student's subject enrollment records, replacing any it had."""
+    key = normalize_student_number(row.get("Student Number", ""))
+    if replace:
+        connection.execute("DELETE FROM enrollments WHERE student_key = ?", (key,))
+    offering = ["" if row.get(name) is None else str(row.get(name)) for name in ("Course", "Year Level", "Semester")]
+    connection.executemany(DATABASE_ENROLLMENT_INSERT,
+                           [[key] + offering + [code] for code in student_subject_codes(row)])
+
+
+def db_rebuild_enrollments(connection):
+    """Refill the enrollments table from every student's Subjects column."""
+    connection.execute("DELETE FROM enrollments")
+    for values in connection.execute(f"SELECT {STUDENT_COLUMN_LIST} FROM students").fetchall():
+        db_write_enrollments(connection, db_row(values), replace=False)
+    connection.execute("UPDATE roster_meta SET value = 1 WHERE name = 'enrollments'")
+
+
+def db_source(generation):
+    """Return the roster source name for a database generation (bumped by a replacing import)."""
+    return f"sqlite:{generation}"
+
+
+def db_load_roster(roster):
+    """Bring the roster cache up to date with rows changed in the database since the last call."""
+    connection = db_connect()
+    source = db_source(db_meta(connection, "generation"))
+    seq = db_meta(connection, "seq")
+    if roster["source"] != source or seq < roster["seq"]:
+        roster.update(source=source, stamp=None, inode=None, offset=0, journal_stamp=None, journal_inode=None,
+                      journal_offset=0, journal_entries=0, seq=0, base_seq=0, changes={}, change_log=[], inserted={},
+                      fieldnames=list(STUDENT_HEADER), rows=[], index={}, occupancy={},
+                      enrollments={}, subject_index={}, offering_index={}, postings=empty_postings(),
+                      statistics=empty_statistics(), name_index=None)
+    if seq == roster["seq"]:
+        return roster
+
+    cursor = connection.execute(
+        f"SELECT student_key, {STUDENT_COLUMN_LIST}, seq, inserted_seq FROM students WHERE seq > ? ORDER BY seq",
+        (roster["seq"],))
+    scanned = len(roster["change_log"])
+    for values in cursor:
+        key, row_seq, inserted_seq = values[0], values[-2], values[-1]
+        row = db_row(values[1:-2])
+        roster["changes"][key] = row_seq
+        roster["change_log"].append((row_seq, key))
+        roster["inserted"][key] = inserted_seq
+        position = roster["index"].get(key)
+        if position is None:
+            add_row(roster, key, row)
+        else:
+            replace_row(roster, position, row)
+    roster["seq"] = seq
+    count_metric("enrollment_rows_scanned_total", len(roster["change_log"]) - scanned, source=DATABASE_FILE)
+    return roster
+
+
+def db_iter_rows(where="", parameters=(), offset=0):
+    """Stream student rows in enrollment order, optionally filtered by a WHERE clause and skipping offset rows."""
+    # rowid follows enrollment order (updates keep it), so no sort is needed
+    cursor = db_connect().execute(
+        f"SELECT {STUDENT_COLUMN_LIST} FROM students {'WHERE ' + where if where else ''} "
+        f"ORDER BY rowid LIMIT -1 OFFSET ?", list(parameters) + [offset])
+    for values in cursor:
+        yield db_row(values)
+
+
+def db_find_student(student_number):
+    """Look up a student row through the primary key, or return None."""
+    values = db_connect().execute(
+        f"SELECT {STUDENT_COLUMN_LIST} FROM students WHERE student_key = ?",
+        (normalize_student_number(student_number),)).fetchone()
+    return None if values is None else db_row(values)
+
+
+def db_find_record(student_number):
+    """Return (row, version stamp) of a student from one query, or (None, None)."""
+    values = db_connect().execute(
+        f"SELECT {STUDENT_COLUMN_LIST}, seq FROM students WHERE student_key = ?",
+        (normalize_student_number(student_number),)).fetchone()
+    if values is None:
+        return None, None
+    row = db_row(values[:-1])
+    return row, (values[-1], row_hash(row, STUDENT_HEADER))
+
+
+def db_insert_students(rows):
+    """Insert new student rows (lists in STUDENT_HEADER order) in one transaction."""
+    with db_transaction() as connection:
+        seq = db_insert_rows(connection, rows, db_meta(connection, "seq"))
+        connection.execute("UPDATE roster_meta SET value = ? WHERE name = 'seq'", (seq,))
+    return load_roster()
+
+
+def db_insert_rows(connection, rows, seq):
+    """Insert student rows numbered after seq inside the caller's transaction; return the last seq."""
+    records = []
+    for values in rows:
+        seq += 1
+        row = dict(zip(STUDENT_HEADER, values))
+        records.append([normalize_student_number(values[0])] + db_values(row) + [seq, seq])
+        db_write_enrollments(connection, row, replace=False)
+    connection.executemany(DATABASE_INSERT, records)
+    return seq
+
+
+def db_apply_changes(entries, expected=None):
+    """Apply upsert, archive and patch entries in one transaction, checking version stamps first."""
+    with db_transaction() as connection:
+        # The transaction holds the write lock, so the stamps cannot change before the update
+        if expected:
+            check_record_versions(expected)
+        seq = db_apply_entries(connection, entries, db_meta(connection, "seq"))
+        connection.execute("UPDATE roster_meta SET value = ? WHERE name = 'seq'", (seq,))
+    return load_roster()
+
+
+def db_apply_entries(connection, entries, seq):
+    """Apply journal entries numbered after seq inside the caller's transaction; return the last seq."""
+    for entry in entries:
+        if entry.get("op") == "insert":
+            continue
+        key = normalize_student_number(entry.get("student"))
+        row = journaled_row(db_find_student(key), entry)
+        if row is None:
+            continue
+        seq += 1
+        connection.execute(DATABASE_UPSERT, [key] + db_values(row) + [seq, seq])
+        if entry.get("op") != "archive":
+            db_write_enrollments(connection, row)
+    return seq
+
+
+def db_compact():
+    """Checkpoint the write-ahead log and fold the department copies' pending changes."""
+    db_connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    for path in REPLICA_TARGETS.values():
+        if not os.path.exists(replica_paths(path)[0]):
+            continue
+        try:
+            with file_lock(ROSTER_LOCK_FILE):
+                rebuild_replica(path)
+        except OSError as e:
+            print_warning(f"Could not rebuild {path}: {str(e)}")
+    return load_roster()
+
+
+def import_csv_to_database(csv_path=MAIN_FILE, replace=False):
+    """Copy a roster CSV (with its journal, for students.csv) into DATABASE_FILE; return rows imported.
+
+    Refuses to import over existing students unless replace is set. Older-format rows are
+    mapped onto the current columns; for a repeated student number the first row is kept,
+    as the CSV roster does.
+    """
+    journal_path = JOURNAL_FILE if os.path.abspath(csv_path) == os.path.abspath(MAIN_FILE) else None
+    imported = 0
+    with db_transaction() as connection:
+        existing = connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        if existing and not replace:
+            raise ValueError(f"{DATABASE_FILE} already holds {existing} students; use --replace to overwrite them.")
+        if existing:
+            connection.execute("DELETE FROM students")
+            # Caches and department copies built from the old rows must start over
+            connection.execute("UPDATE roster_meta SET value = value + 1 WHERE name = 'generation'")
+
+        seq = db_meta(connection, "seq")
+        batch = []
+        for row in stream_csv_roster(csv_path, journal_path):
+            # Rows of an older layout are upgraded on the way in, as migrate_roster does
+            row = dict(zip(STUDENT_HEADER, upgrade_row(row)))
+            seq += 1
+            batch.append([normalize_student_number(row.get("Student Number", ""))] + db_values(row) + [seq, seq])
+            if len(batch) >= BULK_BATCH_SIZE:
+                imported += connection.executemany(DATABASE_IMPORT, batch).rowcount
+                batch = []
+        if batch:
+            imported += connection.executemany(DATABASE_IMPORT, batch).rowcount
+        connection.execute("UPDATE roster_meta SET value = ? WHERE name = 'seq'", (seq,))
+        db_rebuild_enrollments(connection)
+    return imported
+
+
+def export_database_to_csv(path=MAIN_FILE):
+    """Write every student in DATABASE_FILE to a CSV file in STUDENT_HEADER order; return rows written."""
+    written = 0
+    with file_lock(ROSTER_LOCK_FILE):
+        with atomic_write(path, newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(STUDENT_HEADER)
+            for values in db_connect().execute(f"SELECT {STUDENT_COLUMN_LIST} FROM students ORDER BY rowid"):
+                writer.writerow(values)
+                written += 1
+        # The journal described the replaced students.csv
+        if os.path.abspath(path) == os.path.abspath(MAIN_FILE) and os.path.exists(JOURNAL_FILE):
+            os.remove(JOURNAL_FILE)
+    return written
+
+
+# ==================== SUBJECT ENROLLMENTS ====================
+
+# The Subjects column holds display strings such as
+# "FOP (Fundamentals of Programming), STS (Science, Technology, and Society)".
+# Each distinct string is parsed once, against the catalog, into subject codes. A
+# student's subjects are kept as normalized enrollment records (student number,
+# course, year level, semester, subject code) indexed by subject code: in the roster
+# cache, and in the enrollments table of the SQLite backend. Display names are looked
+# up in SUBJECTS when read.
+
+# (course, year level, semester) -> {code: name} offered
+_offerings = {}
+
+# (Subjects string, course, year level, semester) -> (((code, name in string), ...), codes)
+_subject_parses = {}
+
+
+def offered_subjects(course, year_level, semester):
+    """Return {code: name} of the subjects SUBJECTS offers for a course, year level and semester."""
+    key = (course, year_level, semester)
+    offered = _offerings.get(key)
+    if offered is None:
+        offered = _offerings[key] = dict(SUBJECTS.get(course, {}).get(year_level, {}).get(semester, []))
+    return offered
+
+
+def split_subject(subject):
+    """Split a "CODE (Name)" subject entry into its code and name."""
+    if ' (' in subject and ')' in subject:
+        code_end = subject.find(' (')
+        subject_name = subject[code_end+2:-1] if subject.endswith(')') else subject[code_end+2:]
+        return subject[:code_end], subject_name
+    return subject, ""
+
+
+def split_subject_list(text, offered):
+    """Split a Subjects string into its entries, keeping catalog names that contain commas whole."""
+    # Longest first, so "PE1 (Physical Education 1)" is not cut short by a shorter match
+    known = sorted([f"{code} ({name})" for code, name in offered.items()] + list(offered.values()),
+                   key=len, reverse=True)
+    entries = []
+    position = 0
+    while position < len(text):
+        end = next((position + len(entry) for entry in known
+                    if text.startswith(entry, position) and text[position + len(entry):position + len(entry) + 1] in ("", ",")),
+                   None)
+        if end is None:
+            # Not in the catalog: the entry runs to the next comma outside parentheses
+            depth = 0
+            end = position
+            while end < len(text) and not (text[end] == "," and depth <= 0):
+                depth += {"(": 1, ")": -1}.get(text[end], 0)
+                end += 1
+        entries.append(text[position:end].strip())
+        position = end + 1
+        while position < len(text) and text[position] == " ":
+            position += 1
+    return [entry for entry in entries if entry]
+
+
+def parse_subjects(text, course="", year_level="", semester=""):
+    """Return ((code, name), ...) for a Subjects string, parsed once per distinct string."""
+    key = (text, course, year_level, semester)
+    parsed = _subject_parses.get(key)
+    if parsed is None:
+        if len(_subject_parses) >= SUBJECT_PARSE_CACHE_SIZE:
+            _subject_parses.clear()
+        offered = offered_subjects(course, year_level, semester)
+        codes_by_name = {name: code for code, name in offered.items()}
+        entries = []
+        text_value = "" if text is None else str(text).strip()
+        if text_value and text_value != "N/A":
+            for entry in split_subject_list(text_value, offered):
+                # Older rows list bare catalog names without their codes
+                entries.append((codes_by_name[entry], entry) if entry in codes_by_name else split_subject(entry))
+        entries = tuple(entries)
+        parsed = _subject_parses[key] = (entries, tuple(code for code, _ in entries))
+    return parsed[0]
+
+
+def student_subject_codes(row):
+    """Return the subject codes a student row is enrolled in."""
+    return subject_codes(row.get("Subjects"), row.get("Course"), row.get("Year Level"), row.get("Semester"))
+
+
+def subject_codes(*key):
+    """Return the subject codes of a (Subjects, Course, Year Level, Semester) key."""
+    parsed = _subject_parses.get(key)
+    if parsed is None:
+        parse_subjects(*key)
+        parsed = _subject_parses[key]
+    return parsed[1]
+
+
+def subject_entries(text, course, year_level, semester):
+    """Return [(code, name)] for a Subjects string, with names resolved from SUBJECTS."""
+    offered = offered_subjects(course, year_level, semester)
+    return [(code, offered.get(code, name)) for code, name in parse_subjects(text, course, year_level, semester)]
+
+
+def student_subjects(row):
+    """Return [(code, name)] for the subjects of a student row."""
+    return subject_entries(row.get("Subjects"), row.get("Course"), row.get("Year Level"), row.get("Semester"))
+
+
+def index_enrollments(roster, row, sign):
+    """Add (sign=1) or remove (sign=-1) a row's enrollment records in the roster cache."""
+    values = row.values
+    key = normalize_student_number(values[STUDENT_NUMBER_COLUMN])
+    offering = (values[COURSE_COLUMN], values[YEAR_LEVEL_COLUMN], values[SEMESTER_COLUMN])
+    codes = subject_codes(values[SUBJECTS_COLUMN], *offering)
+    # Only active students are listed under their subject offerings
+    indexes = [(roster["subject_index"], code) for code in codes]
+    if (values[ARCHIVED_COLUMN] or "No").upper() != "YES":
+        indexes += [(roster["offering_index"], offering + (code,)) for code in codes]
+
+    if sign > 0:
+        roster["enrollments"][key] = offering + (codes,)
+        for index, index_key in indexes:
+            index.setdefault(index_key, set()).add(key)
+        return
+    roster["enrollments"].pop(key, None)
+    for index, index_key in indexes:
+        students = index.get(index_key)
+        if students is not None:
+            students.discard(key)
+            if not students:
+                del index[index_key]
+
+
+def subject_enrollments(code, course=None, year_level=None, semester=None):
+    """Return the (normalized) student numbers enrolled in a subject, optionally in one offering."""
+    offering = {"course": course, "year_level": year_level, "semester": semester}
+    if STORAGE_BACKEND == "sqlite":
+        clauses = ["subject_code = ?"] + [f"{column} = ?" for column, value in offering.items() if value]
+        parameters = [code] + [value for value in offering.values() if value]
+        return [key for (key,) in db_connect().execute(
+            f"SELECT student_key FROM enrollments WHERE {' AND '.join(clauses)} ORDER BY student_key", parameters)]
+
+    roster = load_roster()
+    wanted = (course, year_level, semester)
+    students = []
+    for key in roster["subject_index"].get(code, ()):
+        record = roster["enrollments"][key]
+        if all(value is None or value == record[n] for n, value in enumerate(wanted)):
+            students.append(key)
+    return sorted(students)
+
+
+def iter_offering_students(subject=None):
+    """Yield (offering, student row) for active students, grouped by subject offering.
+
+    An offering is (course, year level, semester, subject code); within one, students
+    come in section and student number order. Everything is read in a single pass over
+    the subject index, optionally limited to one subject code.
+    """
+    if REMOTE_SERVER:
+        reply = remote_request("GET", "/subject-lists?" + urlencode({"subject": subject or ""}))
+        for offering in reply["offerings"]:
+            key = (offering["course"], offering["year_level"], offering["semester"], offering["subject"])
+            for row in offering["students"]:
+                yield key, as_student(row)
+        return
+    if STORAGE_BACKEND == "sqlite":
+        where = "UPPER(s.archived) != 'YES'" + (" AND e.subject_code = ?" if subject else "")
+        cursor = db_connect().execute(
+            f"SELECT e.course, e.year_level, e.semester, e.subject_code, "
+            f"{', '.join('s.' + column for column in STUDENT_COLUMNS)} "
+            f"FROM enrollments e JOIN students s ON s.student_key = e.student_key WHERE {where} "
+            f"ORDER BY e.course, e.year_level, e.semester, e.subject_code, s.section, s.student_key",
+            [subject] if subject else [])
+        for values in cursor:
+            yield tuple(values[:4]), db_row(values[4:])
+        return
+
+    roster = load_roster()
+    rows = roster["rows"]
+    for offering in sorted(roster["offering_index"], key=lambda key: tuple(str(part) for part in key)):
+        if subject and offering[3] != subject:
+            continue
+        students = [rows[roster["index"][key]] for key in roster["offering_index"][offering]]
+        students.sort(key=lambda row: (row.get("Section", ""), normalize_student_number(row.get("Student Number", ""))))
+        for row in students:
+            yield offering, row
+
+
+# ==================== NAME SEARCH ====================
+
+def name_words(row):
+    """Return the folded words of a student's last, first and full name."""
+    values = row.values
+    names = (values[LAST_NAME_COLUMN], values[FIRST_NAME_COLUMN], values[FULL_NAME_COLUMN])
+    return tuple(sorted(set(fold_text(" ".join(name or "" for name in names)).split())))
+
+
+def name_grams(word, whole=True):
+    """Return the trigrams of a word, anchored at its start (and, if whole, at its end)."""
+    padded = f"  {word} " if whole else f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def index_names(index, row, sign):
+    """Add (sign=1) or remove (sign=-1) a row's name words in the name search index."""
+    key = normalize_student_number(row.get("Student Number", ""))
+    words = name_words(row)
+    if sign > 0:
+        index["names"][key] = words
+        for word in words:
+            students = index["words"].get(word)
+            if students is None:
+                students = index["words"][word] = set()
+                for gram in name_grams(word):
+                    index["grams"].setdefault(gram, set()).add(word)
+            students.add(key)
+        return
+    index["names"].pop(key, None)
+    for word in words:
+        students = index["words"].get(word)
+        if students is None:
+            continue
+        students.discard(key)
+        if not students:
+            # Last student with this word: drop the word from the trigram lists too
+            del index["words"][word]
+            for gram in name_grams(word):
+                index["grams"][gram].discard(word)
+                if not index["grams"][gram]:
+                    del index["grams"][gram]
+
+
+def name_index(roster):
+    """Return the roster's name search index, building it on first use.
+
+    grams maps each name trigram to the distinct name words containing it, words maps a
+    name word to the (normalized) student numbers with it, and names holds each student's
+    words. Once built, it is kept up to date with every enrollment and edit through
+    update_row_indexes.
+    """
+    if roster["name_index"] is None:
+        roster["name_index"] = {"grams": {}, "words": {}, "names": {}}
+        for row in roster["rows"]:
+            index_names(roster["name_index"], row, 1)
+    return roster["name_index"]
+
+
+def edit_distance(a, b, limit):
+    """Return the edit distance between two words, counting a swap of neighbours as one; limit+1 if over limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def word_score(token, word, shared):
+    """Score how well a name word matches a query word: 3 exact, 2 prefix, below 2 when misspelled, else 0.
+
+    shared is the number of trigrams the two have in common.
+    """
+    if word == token:
+        return 3.0
+    if word.startswith(token):
+        return 2.0
+    similarity = 2 * shared / (len(token) + len(word) + 2)
+    if similarity < FUZZY_MATCH_THRESHOLD and len(token) >= 4:
+        # Trigrams miss swapped letters in short names ("Zamroa"); one or two edits still match
+        limit = 1 if len(token) < 8 else 2
+        distance = edit_distance(token, word, limit)
+        if distance <= limit:
+            similarity = max(similarity, 1 - distance / max(len(token), len(word)))
+    return 2 * similarity if similarity >= FUZZY_MATCH_THRESHOLD else 0.0
+
+
+def token_matches(index, token):
+    """Return {student key: best word score} for the students with a name word matching token."""
+    grams = name_grams(token)
+    counts = {}
+    for gram in grams:
+        for word in index["grams"].get(gram, ()):
+            counts[word] = counts.get(word, 0) + 1
+    # Every word that could score shares at least a third of the query word's trigrams
+    needed = max(1, len(grams) // 3)
+    scores = {}
+    for word, shared in counts.items():
+        score = word_score(token, word, shared) if shared >= needed else 0.0
+        if score:
+            for key in index["words"][word]:
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+    return scores
+
+
+def search_students(query, limit=SEARCH_RESULT_LIMIT):
+    """Find students by name; return up to limit (score, row) pairs, best match first.
+
+    Every word of the query must match a word of the student's name, exactly, as its
+    beginning ("Dela Cr") or despite a typo ("Santso"). Case and accents are ignored.
+    """
+    tokens = fold_text(query).split()
+    if not tokens:
+        return []
+    if REMOTE_SERVER:
+        reply = remote_request("GET", "/students?" + urlencode({"q": query, "limit": limit}))
+        return [(match["score"], as_student(match["student"])) for match in reply["matches"]]
+    roster = load_roster()
+    index = name_index(roster)
+    scores = None
+    for token in sorted(tokens, key=len, reverse=True):
+        matches = token_matches(index, token)
+        scores = matches if scores is None else {key: score + matches[key] for key, score in scores.items()
+                                                 if key in matches}
+        if not scores:
+            return []
+    # Equal scores keep student number order
+    best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(score, roster["rows"][roster["index"][key]]) for key, score in best]
+
+
+def prompt_student(prompt):
+    """Ask for a student by number or by name; return (student number, row, version stamp).
+
+    The row and its stamp come from one read, so a save checked against the stamp
+    refuses changes made after the row was shown. If no student is chosen, return
+    (entry, None, None). A name lists the matching students to choose from. Errors
+    are reported here.
+    """
+    print_prompt(prompt)
+    entry = input().strip()
+    student, version = find_record(entry)
+    if student is not None or not any(char.isalpha() for char in entry):
+        if student is None:
+            print_error(f"Student number {entry} not found.")
+        return entry, student, version
+
+    matches = search_students(entry)
+    if not matches:
+        print_error(f"No student number or name matches '{entry}'.")
+        return entry, None, None
+    print()
+    for number, (_, row) in enumerate(matches, 1):
+        archived = "  [Archived]" if (row.get("Archived") or "No").upper() == "YES" else ""
+        print(f"  {number:>2}. {row.get('Student Number', ''):<14} {row.get('Full Name', ''):<35} "
+              f"{row.get('Course', '')} {row.get('Section', '')}{archived}")
+    print()
+    print_prompt(f"Select a student (1-{len(matches)}, Enter to cancel): ")
+    choice = input().strip()
+    if not choice.isdigit() or not 1 <= int(choice) <= len(matches):
+        print_info("No student selected.")
+        return entry, None, None
+    # Read the chosen row again with its stamp: the list above only summarizes it
+    student_number = matches[int(choice) - 1][1].get("Student Number", "")
+    student, version = find_record(student_number)
+    if student is None:
+        print_error(f"Student number {student_number} not found.")
+    return student_number, student, version
+
+
+# ==================== ROSTER QUERIES ====================
+
+# Filters on INDEXED_COLUMNS are answered from the posting lists of the loaded roster:
+# the lists of the filtered values are intersected, smallest first, and only the rows
+# left in the intersection are read. The lists are not stored on their own: the
+# snapshot already holds every indexed column dictionary-coded, and index_rows
+# rebuilds the lists from it at load.
+
+def roster_loaded():
+    """Return True if this process already holds the roster in memory."""
+    return _roster_cache["source"] is not None and not REMOTE_SERVER
+
+
+def query_students(filters=None, include_archived=False, plan=None, roster=None):
+    """Return the students matching filters (column -> value), in roster order.
+
+    Archived students are left out unless include_archived is set or Archived is
+    filtered on. Columns without posting lists are compared on the rows the indexed
+    filters leave. Pass a dict as plan to have it filled in (see format_query_plan),
+    and a roster already loaded to query it as it stands rather than reload it.
+    """
+    roster = roster or load_roster()
+    rows = roster["rows"]
+    filters = dict(filters or {})
+    if "Archived" in filters:
+        filters["Archived"] = "Yes" if str(filters["Archived"]).upper() == "YES" else "No"
+    elif not include_archived:
+        filters["Archived"] = "No"
+    indexed = sorted(((column, value, roster["postings"][column].get(value, frozenset()))
+                      for column, value in filters.items() if column in roster["postings"]),
+                     key=lambda item: len(item[2]))
+    checked = [(column, value) for column, value in filters.items() if column not in roster["postings"]]
+
+    with span("query"):
+        if indexed:
+            positions = sorted(indexed[0][2].intersection(*(postings for _, _, postings in indexed[1:])))
+        else:
+            positions = range(len(rows))
+        matches = list(map(rows.__getitem__, positions))
+        if checked:
+            matches = [row for row in matches if all(row.get(column) == value for column, value in checked)]
+    count_metric("enrollment_rows_scanned_total", len(positions), source="query")
+    if plan is not None:
+        plan.update(rows=len(rows), indexes=[[column, value, len(postings)] for column, value, postings in indexed],
+                    checked=[column for column, _ in checked], touched=len(positions), matched=len(matches))
+    return matches
+
+
+def format_query_plan(plan):
+    """Describe a plan filled in by query_students as lines of text."""
+    if plan["indexes"]:
+        lines = [f"Posting lists intersected, smallest first ({len(plan['indexes'])}):"]
+        lines += [f"  {column} = {value}: {count} rows" for column, value, count in plan["indexes"]]
+    else:
+        lines = ["No posting list used: every row is read."]
+    if plan["checked"]:
+        lines.append(f"Compared on each row touched: {', '.join(plan['checked'])}")
+    lines.append(f"Rows touched: {plan['touched']} of {plan['rows']}   Matched: {plan['matched']}")
+    return lines
+
+
+# ==================== ENROLLMENT STATISTICS ====================
+
+# The roster cache keeps headcounts of active students per value of each of
+# STATISTICS_COLUMNS, adjusted by update_row_indexes on every enrollment, edit and
+# archive toggle. A dashboard reads those counts, so it costs the same for ten students
+# as for a million. They are counted from scratch only when the roster is read whole:
+# from the snapshot's dictionary codes with NumPy when it is installed, otherwise by a
+# pass over the rows. Cities are counted with their province ("San Jose, Batangas").
+
+def empty_statistics():
+    """Return enrollment statistics with no students counted."""
+    return {"active": 0, "archived": 0, "counts": {column: {} for column in STATISTICS_COLUMNS}}
+
+
+def city_label(city, province):
+    """Return how a city is named in the statistics: with its province, when there is one."""
+    city = "" if city is None else str(city)
+    return f"{city}, {province}" if city and province else city
+
+
+def statistics_values(values):
+    """Return what a row counts as in each of STATISTICS_COLUMNS."""
+    counted = ["" if values[position] is None else str(values[position]) for position in STATISTICS_POSITIONS]
+    city = STATISTICS_COLUMNS.index("City/Municipality")
+    counted[city] = city_label(counted[city], counted[STATISTICS_COLUMNS.index("Province")])
+    return counted
+
+
+def count_statistics(statistics, values, sign):
+    """Add (sign=1) or remove (sign=-1) a row's contribution to the enrollment statistics."""
+    if (values[ARCHIVED_COLUMN] or "No").upper() == "YES":
+        statistics["archived"] += sign
+        return
+    statistics["active"] += sign
+    for column, value in zip(STATISTICS_COLUMNS, statistics_values(values)):
+        counts = statistics["counts"][column]
+        counts[value] = counts.get(value, 0) + sign
+        if not counts[value]:
+            del counts[value]
+
+
+def compute_statistics(rows, encoded=None):
+    """Count the enrollment statistics of rows from scratch.
+
+    encoded maps column names to (dictionary, codes) as read from the snapshot; with
+    NumPy installed the codes are counted with bincount instead of reading every row.
+    """
+    if numpy is not None and encoded and all(name in encoded for name in STATISTICS_COLUMNS + ("Archived",)):
+        return compute_encoded_statistics(encoded)
+    statistics = empty_statistics()
+    active = [row.values for row in rows if (row.values[ARCHIVED_COLUMN] or "No").upper() != "YES"]
+    statistics["active"], statistics["archived"] = len(active), len(rows) - len(active)
+    city, province = STUDENT_HEADER.index("City/Municipality"), STUDENT_HEADER.index("Province")
+    for column, position in zip(STATISTICS_COLUMNS, STATISTICS_POSITIONS):
+        if position == city:
+            found = Counter((values[city], values[province]) for values in active)
+            labels = (city_label(*pair) for pair in found)
+        else:
+            found = Counter(values[position] for values in active)
+            labels = ("" if value is None else str(value) for value in found)
+        # Values that read the same (24 and "24") share one count
+        counts = statistics["counts"][column]
+        for label, count in zip(labels, found.values()):
+            counts[label] = counts.get(label, 0) + count
+    return statistics
+
+
+def compute_encoded_statistics(encoded):
+    """Count the enrollment statistics from dictionary-coded columns with NumPy."""
+    dictionary, codes = encoded["Archived"]
+    archived = numpy.array([(value or "No").upper() == "YES" for value in dictionary] or [False])
+    active = ~archived[numpy.frombuffer(codes, dtype=numpy.uintc)]
+    statistics = empty_statistics()
+    statistics["active"] = int(active.sum())
+    statistics["archived"] = len(active) - statistics["active"]
+    provinces, province_codes = encoded["Province"]
+    for column in STATISTICS_COLUMNS:
+        dictionary, codes = encoded[column]
+        codes = numpy.frombuffer(codes, dtype=numpy.uintc)[active]
+        if column == "City/Municipality":
+            # Each (city, province) pair as one number
+            pairs = codes.astype(numpy.int64) * len(provinces)
+            pairs += numpy.frombuffer(province_codes, dtype=numpy.uintc)[active]
+            found, found_counts = numpy.unique(pairs, return_counts=True)
+            labels = [city_label(dictionary[pair // len(provinces)], provinces[pair % len(provinces)])
+                      for pair in found.tolist()]
+        else:
+            found_counts = numpy.bincount(codes, minlength=len(dictionary))
+            found = numpy.flatnonzero(found_counts)
+            labels = [dictionary[code] for code in found.tolist()]
+            found_counts = found_counts[found]
+        counts = statistics["counts"][column]
+        for label, count in zip(labels, found_counts.tolist()):
+            counts[label] = counts.get(label, 0) + count
+    return statistics
+
+
+def unit_load_summary(distribution):
+    """Summarize a Total Units distribution: students per load, and the mean, median, lowest and highest load."""
+    loads = sorted((float(units), units, count) for units, count in distribution.items()
+                   if units.replace(".", "", 1).isdigit())
+    students = sum(count for _, _, count in loads)
+    summary = {"distribution": {units: count for _, units, count in loads}, "students": students,
+               "mean": None, "median": None, "lowest": None, "highest": None}
+    if students:
+        summary.update(mean=round(sum(load * count for load, _, count in loads) / students, 2),
+                       lowest=loads[0][0], highest=loads[-1][0])
+        middle, seen = (students - 1) // 2, 0
+        for load, _, count in loads:
+            seen += count
+            if seen > middle:
+                summary["median"] = load
+                break
+    return summary
+
+
+def enrollment_statistics():
+    """Return headcounts of active students by each of STATISTICS_COLUMNS, and their unit loads.
+
+    Read from the counts kept in the roster cache, so the cost depends on the number of
+    distinct values, not on the number of students.
+    """
+    if REMOTE_SERVER:
+        return remote_request("GET", "/statistics")
+    statistics = load_roster()["statistics"]
+    headcounts = {column: dict(sorted(statistics["counts"][column].items(), key=lambda item: (-item[1], item[0])))
+                  for column in STATISTICS_COLUMNS if column != "Total Units"}
+    return {"active": statistics["active"], "archived": statistics["archived"], "headcounts": headcounts,
+            "unit_loads": unit_load_summary(statistics["counts"]["Total Units"])}
+
+
+def format_statistics(statistics, limit=STATISTICS_TOP_VALUES):
+    """Describe enrollment statistics as lines of text, listing at most limit values per column."""
+    active = statistics["active"]
+    lines = [f"Active students: {active}   Archived: {statistics['archived']}"]
+    for column, counts in statistics["headcounts"].items():
+        items = list(counts.items())
+        if column in ("Year Level", "Semester", "Section"):
+            items.sort()
+        lines += ["", column.upper()]
+        for value, count in items[:limit]:
+            lines.append(f"  {value or '(blank)':<40} {count:>8}  {count / active:>6.1%}")
+        if len(items) > limit:
+            lines.append(f"  ... and {len(items) - limit} more")
+    loads = statistics["unit_loads"]
+    lines += ["", "UNIT LOADS"]
+    for units, count in loads["distribution"].items():
+        lines.append(f"  {units + ' units':<40} {count:>8}  {count / active:>6.1%}")
+    if loads["students"]:
+        lines.append(f"  Mean: {loads['mean']:g}   Median: {loads['median']:g}   "
+                     f"Lowest: {loads['lowest']:g}   Highest: {loads['highest']:g}")
+    return lines
+
+
+# ==================== REPLICATION ====================
+
+# Each department copy is two files. The copy itself (students_masterlist.csv) holds
+# every student as of the last compaction, and new students are appended to it. Its
+# changes file (students_masterlist_changes.csv) holds newer versions of rows the copy
+# already had, each after the "Change Seq" it was shipped at; a student's last row
+# there supersedes the one in the copy. The changes are folded back into the copy
+# whenever the journal is compacted. read_replica returns the merged rows, and the
+# replica-export command writes them to one CSV for a department to open. A checkpoint
+# file next to the copy records the last change sequence it received.
+# Copies are never fsynced: the checkpoint records the sizes of both files, and a copy
+# that lost writes in a crash no longer matches them and is rebuilt from the roster.
+
+def replica_paths(path):
+    """Return the (changes file, checkpoint file) kept next to a department copy."""
+    base = os.path.splitext(path)[0]
+    return f"{base}_changes.csv", f"{base}.checkpoint"
+
+
+def read_replica_checkpoint(path, source="csv"):
+    """Return the last change sequence shipped to a department copy from a store, or None."""
+    checkpoint = read_json_file(replica_paths(path)[1], {})
+    # Sequences from a different store (or an earlier import) mean nothing here
+    if checkpoint.get("source", "csv") != source:
+        return None
+    # Checkpoints written before sizes were recorded are taken at their word
+    if "sizes" in checkpoint and checkpoint["sizes"] != replica_sizes(path):
+        return None
+    try:
+        return int(checkpoint["seq"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def replica_sizes(path):
+    """Return the sizes in bytes of a department copy and its changes file (0 if missing)."""
+    return [os.path.getsize(name) if os.path.exists(name) else 0 for name in (path, replica_paths(path)[0])]
+
+
+def write_replica_checkpoint(path, seq, source="csv"):
+    """Record the last change sequence shipped to a department copy, and the sizes it left the files at."""
+    write_json_file(replica_paths(path)[1], {"seq": seq, "source": source, "sizes": replica_sizes(path),
+                                            "updated": datetime.now().isoformat(timespec="seconds")},
+                    durable=False)
+
+
+def rebuild_replica(path, copy_from=None):
+    """Rewrite a department copy from the full roster and clear its pending changes; return its row count.
+
+    copy_from names a CSV just written from the same roster, copied instead of encoding
+    every row again.
+    """
+    roster = load_roster()
+    changes_path = replica_paths(path)[0]
+    if copy_from:
+        with span("file_write", file=path):
+            shutil.copyfile(copy_from, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+    else:
+        write_students_csv(path, roster["rows"], roster_fieldnames(roster["fieldnames"]), durable=False)
+    if os.path.exists(changes_path):
+        os.remove(changes_path)
+    write_replica_checkpoint(path, roster["seq"], roster["source"])
+    return len(roster["rows"])
+
+
+def encode_replica_delta(roster, checkpoint, fieldnames):
+    """Serialize rows changed since a checkpoint; return (new rows CSV, changed rows CSV, count).
+
+    roster is the roster cache, or a read_journal_state() whose rows are read through
+    the offset index.
+    """
+    new_rows = []
+    changed_rows = []
+    # The change log is in sequence order, so skip straight past the checkpoint
+    start = bisect.bisect_right(roster["change_log"], (checkpoint, "\uffff"))
+    for seq, key in roster["change_log"][start:]:
+        # Ship each record once, at its latest change
+        if seq != roster["changes"][key]:
+            continue
+        if "rows" in roster:
+            position = roster["index"].get(key)
+            row = None if position is None else roster["rows"][position]
+        else:
+            row = seek_record(key, roster)[0]
+        if row is None:
+            continue
+        values = [row.get(name, "") for name in fieldnames]
+        if roster["inserted"].get(key, 0) > checkpoint:
+            new_rows.append(values)
+        else:
+            changed_rows.append([seq] + values)
+
+    new_text = io.StringIO()
+    csv.writer(new_text).writerows(new_rows)
+    changed_text = io.StringIO()
+    csv.writer(changed_text).writerows(changed_rows)
+    return new_text.getvalue(), changed_text.getvalue(), len(new_rows) + len(changed_rows)
+
+
+def replicate_to(path, encoded=None):
+    """Ship rows changed since a copy's checkpoint to it; return the number of rows shipped.
+
+    encoded is an optional dict shared between copies so a delta is serialized only once.
+    """
+    # A station that never loaded the roster ships from the journal and the offset index
+    roster = load_roster() if roster_loaded() or STORAGE_BACKEND == "sqlite" else read_journal_state()
+    checkpoint = read_replica_checkpoint(path, roster["source"])
+    if checkpoint is None or not roster["base_seq"] <= checkpoint <= roster["seq"] or not os.path.exists(path):
+        # The journal no longer holds everything this copy is missing, or the roster was replaced
+        return rebuild_replica(path)
+    if checkpoint >= roster["seq"]:
+        return 0
+
+    with open(path, "r", encoding="utf-8") as file:
+        fieldnames = next(csv.reader(file), [])
+    encoded = {} if encoded is None else encoded
+    delta_key = (checkpoint, roster["seq"], tuple(fieldnames))
+    if delta_key not in encoded:
+        encoded[delta_key] = encode_replica_delta(roster, checkpoint, fieldnames)
+    new_text, changed_text, shipped = encoded[delta_key]
+
+    # Rows are written before the checkpoint, so a failure ships them again rather than losing them
+    if new_text:
+        with span("file_write", file=path), open(path, "a", newline="", encoding="utf-8") as file:
+            file.write(new_text)
+        count_metric("enrollment_bytes_written_total", len(new_text.encode("utf-8")), file=path)
+    if changed_text:
+        changes_path = replica_paths(path)[0]
+        new_file = not os.path.exists(changes_path)
+        with span("file_write", file=changes_path), open(changes_path, "a", newline="", encoding="utf-8") as file:
+            if new_file:
+                csv.writer(file).writerow(["Change Seq"] + fieldnames)
+            file.write(changed_text)
+        count_metric("enrollment_bytes_written_total", len(changed_text.encode("utf-8")), file=changes_path)
+
+    write_replica_checkpoint(path, roster["seq"], roster["source"])
+    return shipped
+
+
+def replicate_to_departments():
+    """Ship changed rows to the Registrar and Librarian copies."""
+    if REMOTE_SERVER:
+        # The service ships its changes with every commit
+        return
+    # Locked so two stations never ship the same rows to a copy
+    with file_lock(ROSTER_LOCK_FILE):
+        encoded = {}
+        for name, path in REPLICA_TARGETS.items():
+            try:
+                with span("replica_copy", copy=name):
+                    shipped = replicate_to(path, encoded)
+                count_metric("enrollment_rows_shipped_total", shipped, copy=name)
+            except OSError as e:
+                # The checkpoint is untouched, so the copy catches up on a later save
+                print_warning(f"{name} copy could not be updated: {str(e)}")
+
+
+def read_replica(path):
+    """Return a department copy as {normalized student number: row}, with its changes applied."""
+    rows = {}
+    changes_path = replica_paths(path)[0]
+    for source in (path, changes_path):
+        if not os.path.exists(source):
+            continue
+        with open(source, "r", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            decode = row_decoder(next(reader, []))
+            for values in reader:
+                if values:
+                    # The changes file's "Change Seq" column is outside the hashed columns
+                    row = decode(values)
+                    rows[normalize_student_number(row.get("Student Number", ""))] = row
+    return rows
+
+
+def export_replica(path, output):
+    """Write a department copy with its changes applied to one CSV file; return the rows written."""
+    rows = read_replica(path)
+    write_students_csv(output, rows.values(), roster_fieldnames(file_header(path)), durable=False)
+    return len(rows)
+
+
+def row_hash(row, fieldnames):
+    """Return a short content hash of a row over the given columns."""
+    content = "\x1f".join("" if row.get(name) is None else str(row.get(name)) for name in fieldnames)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def check_replica_drift(path):
+    """Compare a department copy with the roster using per-row hashes."""
+    roster = load_roster()
+    fieldnames = roster_fieldnames(roster["fieldnames"])
+    replica = read_replica(path)
+    drift = {"missing": [], "extra": [], "changed": []}
+    for key, position in roster["index"].items():
+        replica_row = replica.pop(key, None)
+        if replica_row is None:
+            drift["missing"].append(key)
+        elif row_hash(replica_row, fieldnames) != row_hash(roster["rows"][position], fieldnames):
+            drift["changed"].append(key)
+    drift["extra"] = sorted(replica)
+    return drift
+
+
+# ==================== STUDENT NUMBER ALLOCATION ====================
+
+# student_numbers.json holds the next unreserved number per intake year. Each station
+# reserves a block of numbers from it and hands them out from its own block file, so
+# stations never rescan the roster and never collide. A reserved block is never handed
+# out again, even if the station restarts or loses its block file.
+
+def seed_number_sequence(year):
+    """Return the first free number for an intake year from the roster (one-time scan)."""
+    prefix = f"{year}-"
+    highest = 0
+    for key in load_roster()["index"]:
+        if key.startswith(prefix) and key[len(prefix):].isdigit():
+            highest = max(highest, int(key[len(prefix):]))
+    return highest + 1
+
+
+def reserve_number_block(year, size=None):
+    """Reserve the next block of student numbers for this station; return the station's blocks."""
+    size = size or STUDENT_NUMBER_BLOCK_SIZE
+    sequences = read_json_file(NUMBER_SEQUENCE_FILE, {})
+    if year not in sequences:
+        sequences[year] = {"next": seed_number_sequence(year), "blocks": {}}
+    entry = sequences[year]
+    start = entry["next"]
+    entry["next"] = start + size
+    entry["blocks"][STATION_ID] = [start, start + size - 1]
+    write_json_file(NUMBER_SEQUENCE_FILE, sequences)
+
+    blocks = read_json_file(STATION_BLOCK_FILE, {})
+    blocks[year] = {"next": start, "end": start + size - 1}
+    write_json_file(STATION_BLOCK_FILE, blocks)
+    return blocks
+
+
+def allocate_student_numbers(count, year=None):
+    """Hand out count student numbers from this station's blocks without scanning the roster."""
+    if REMOTE_SERVER:
+        return remote_request("POST", "/student-numbers", {"count": count, "year": year})["student_numbers"]
+    year = str(year or datetime.now().year)
+    numbers = []
+    with file_lock(NUMBER_LOCK_FILE):
+        blocks = read_json_file(STATION_BLOCK_FILE, {})
+        while len(numbers) < count:
+            block = blocks.get(year)
+            if not block or block["next"] > block["end"]:
+                blocks = reserve_number_block(year, max(STUDENT_NUMBER_BLOCK_SIZE, count - len(numbers)))
+                block = blocks[year]
+            taken = min(count - len(numbers), block["end"] - block["next"] + 1)
+            numbers.extend(range(block["next"], block["next"] + taken))
+            block["next"] += taken
+
+        # Persist before handing the numbers out so a restart never reissues them
+        write_json_file(STATION_BLOCK_FILE, blocks)
+    return [f"{year}-{number:04d}" for number in numbers]
+
+
+def allocate_student_number(year=None):
+    """Hand out the next student number from this station's block without scanning the roster."""
+    return allocate_student_numbers(1, year)[0]
+
+
+# ==================== SECTION OCCUPANCY ====================
+
+# Active students per (section, room) are counted in the roster cache and adjusted on
+# every enrollment, archive toggle or section change. section_occupancy.json holds
+# seats reserved by stations that are finishing an enrollment, plus a snapshot of the
+# counts for other tools.
+
+def room_capacity(room):
+    """Return the number of students a room seats."""
+    return ROOM_CAPACITIES.get(room, ROOM_CAPACITY)
+
+
+def choose_section(year_level, counts):
+    """Return the first section of a year level with a free seat, or None if all are full."""
+    for section in [f"{year_level}{letter}" for letter in SECTION_LETTERS]:
+        room = ROOM_ASSIGNMENTS.get(section, "Room Not Assigned")
+        if counts.get((section, room), 0) < room_capacity(room):
+            return section
+    return None
+
+
+def read_seat_reservations(roster):
+    """Return pending seat reservations, dropping expired ones and students already saved."""
+    state = read_json_file(OCCUPANCY_FILE, {})
+    now = time.time()
+    return {
+        student_number: seat for student_number, seat in state.get("reservations", {}).items()
+        if now - seat[2] < SEAT_RESERVATION_TIMEOUT
+        and normalize_student_number(student_number) not in roster["index"]
+    }
+
+
+def write_seat_reservations(roster, reservations):
+    """Write the reservations and a snapshot of the occupancy counts to the sidecar file."""
+    counts = {f"{section}|{room}": count for (section, room), count in sorted(roster["occupancy"].items()) if count}
+    # Reservations expire on their own and the counts are rebuilt from the roster, so no fsync
+    write_json_file(OCCUPANCY_FILE, {"seq": roster["seq"], "counts": counts, "reservations": reservations},
+                    durable=False)
+
+
+def section_occupancy():
+    """Return {(section, room): seats taken}, counting pending reservations."""
+    roster = load_roster()
+    counts = dict(roster["occupancy"])
+    for section, room, _ in read_seat_reservations(roster).values():
+        counts[(section, room)] = counts.get((section, room), 0) + 1
+    return counts
+
+
+def reserve_seat(year_level, student_number):
+    """Atomically pick a section with a free seat and hold it for a student being enrolled."""
+    if REMOTE_SERVER:
+        reply = remote_request("POST", "/seats", {"year_level": str(year_level), "student_number": student_number})
+        if reply["overflow"]:
+            print_warning(f"All rooms for Year {year_level} are at capacity ({ROOM_CAPACITY} students each).")
+            print_warning(f"Assigning to {year_level}D (may exceed capacity).")
+        return reply["section"]
+    with file_lock(OCCUPANCY_LOCK_FILE):
+        roster = load_roster()
+        reservations = read_seat_reservations(roster)
+        reservations.pop(student_number, None)
+        counts = dict(roster["occupancy"])
+        for section, room, _ in reservations.values():
+            counts[(section, room)] = counts.get((section, room), 0) + 1
+
+        section = choose_section(year_level, counts)
+        if section is None:
+            print_warning(f"All rooms for Year {year_level} are at capacity ({ROOM_CAPACITY} students each).")
+            print_warning(f"Assigning to {year_level}D (may exceed capacity).")
+            section = f"{year_level}D"
+
+        # The seat counts as taken until the student is saved or the reservation expires
+        reservations[student_number] = [section, ROOM_ASSIGNMENTS.get(section, "Room Not Assigned"), time.time()]
+        write_seat_reservations(roster, reservations)
+    return section
+
+
+def release_seat(student_number):
+    """Give back a seat reserved for an enrollment that was not saved."""
+    if REMOTE_SERVER:
+        remote_request("DELETE", f"/seats/{quote(str(student_number), safe='')}")
+        return
+    with file_lock(OCCUPANCY_LOCK_FILE):
+        roster = load_roster()
+        reservations = read_seat_reservations(roster)
+        if reservations.pop(student_number, None):
+            write_seat_reservations(roster, reservations)
+
+
+# ==================== SECTION REBALANCING ====================
+
+# Seats are handed out greedily (the first section with room, overflow to the last), and
+# drops and archives leave gaps behind, so a year level's sections drift apart.
+# plan_rebalance works out the fewest moves that leave them as evenly filled as their
+# rooms allow: every section gets a target, never more than its room seats, and the
+# extra seats of an uneven split go to the sections already fullest. Only students
+# above a target move, latest enrolled first, into the sections below theirs. Students
+# in a section of another year level, or in the wrong room for their section, move
+# too. Seats held by pending reservations count as taken and stay put. When the year
+# level has more students than its rooms seat, full rooms take no one and whoever has
+# no seat to move to stays where they are, counted in the plan's overflow.
+
+def year_level_sections(year_level):
+    """Return {section: room} for the sections of a year level that have a room."""
+    sections = (f"{year_level}{letter}" for letter in SECTION_LETTERS)
+    return {section: ROOM_ASSIGNMENTS[section] for section in sections if section in ROOM_ASSIGNMENTS}
+
+
+def section_targets(counts, capacities, total):
+    """Return {section: seats} spreading total students as evenly as capacities allow.
+
+    counts (students now in each section) decides which sections take the odd seats
+    of an uneven split, so as few students as possible have to move.
+    """
+    sections = list(capacities)
+    if total >= sum(capacities.values()):
+        # No room may go past its seats: the students left over have no target
+        return dict(capacities)
+    # The highest common level every section can be filled to without going past it
+    low, high = 0, max(capacities.values())
+    while low < high:
+        middle = (low + high + 1) // 2
+        if sum(min(capacity, middle) for capacity in capacities.values()) <= total:
+            low = middle
+        else:
+            high = middle - 1
+    targets = {section: min(capacities[section], low) for section in sections}
+    extra = total - sum(targets.values())
+    open_sections = [section for section in sections if capacities[section] > low]
+    for section in sorted(open_sections, key=lambda section: -counts.get(section, 0))[:extra]:
+        targets[section] += 1
+    return targets
+
+
+def plan_rebalance(year_level):
+    """Work out the moves that rebalance the sections of a year level ("1" or "1st Year").
+
+    Returns {"year_level", "students", "overflow", "unplaced", "sections": [{section, room,
+    capacity, before, after}], "moves": [{student, name, from: [section, room], to: [section,
+    room], version}]}. Each move carries the version stamp of the row it was planned from;
+    "unplaced" counts students who should move but have no seat left to move to, and
+    "overflow" how many of the year level's students are more than its rooms seat.
+    Raises ValueError if the year level has no rooms.
+    """
+    year_level = year_level_number(str(year_level).strip())
+    sections = year_level_sections(year_level)
+    if not sections:
+        raise ValueError(f"Year level {year_level} has no sections in ROOM_ASSIGNMENTS.")
+    roster = load_roster()
+
+    # Active students of the year level in roster (enrollment) order
+    placed = {section: [] for section in sections}
+    misplaced = []
+    for row in query_students({"Year Level": LEGACY_YEAR_LEVELS.get(year_level, year_level)}, roster=roster):
+        section = row.values[SECTION_COLUMN]
+        if section in sections and row.values[ROOM_COLUMN] == sections[section]:
+            placed[section].append(row)
+        else:
+            misplaced.append(row)
+    counts = {section: len(rows) for section, rows in placed.items()}
+    for section, room, _ in read_seat_reservations(roster).values():
+        if sections.get(section) == room:
+            counts[section] += 1
+
+    capacities = {section: room_capacity(room) for section, room in sections.items()}
+    total = sum(counts.values()) + len(misplaced)
+    # Reserved seats cannot move: a section holding more of them than its target keeps
+    # just those, and the rest are shared out again among the other sections
+    pinned = {}
+    while True:
+        targets = section_targets(counts, {section: capacity for section, capacity in capacities.items()
+                                           if section not in pinned}, total - sum(pinned.values()))
+        held = {section: counts[section] - len(placed[section]) for section in targets
+                if counts[section] - len(placed[section]) > targets[section]}
+        if not held:
+            break
+        pinned.update(held)
+    targets.update(pinned)
+    movers = list(misplaced)
+    for section, rows in placed.items():
+        surplus = min(counts[section] - targets[section], len(rows))
+        if surplus > 0:
+            movers += rows[-surplus:]
+    openings = [section for section in sections for _ in range(max(targets[section] - counts[section], 0))]
+
+    moves = []
+    after = dict(counts)
+    fieldnames = roster_fieldnames(roster["fieldnames"])
+    for row, section in zip(movers, openings):
+        values = row.values
+        if values[SECTION_COLUMN] in after and values[ROOM_COLUMN] == sections[values[SECTION_COLUMN]]:
+            after[values[SECTION_COLUMN]] -= 1
+        after[section] += 1
+        key = normalize_student_number(values[STUDENT_NUMBER_COLUMN])
+        moves.append({"student": values[STUDENT_NUMBER_COLUMN], "name": values[FULL_NAME_COLUMN] or "",
+                      "from": [values[SECTION_COLUMN], values[ROOM_COLUMN]], "to": [section, sections[section]],
+                      "version": [record_seq(roster, key), row_hash(row, fieldnames)]})
+    return {"year_level": year_level, "students": total, "overflow": max(total - sum(capacities.values()), 0),
+            "unplaced": len(movers) - len(moves),
+            "sections": [{"section": section, "room": room, "capacity": capacities[section],
+                          "before": counts[section], "after": after[section]} for section, room in sections.items()],
+            "moves": moves}
+
+
+def rebalance_sections(year_level, apply=False):
+    """Plan a rebalance of a year level's sections and, with apply, commit every move in one write; return the plan."""
+    if REMOTE_SERVER:
+        return remote_request("POST", "/rebalance", {"year_level": str(year_level), "apply": apply})
+    # Seat picks wait until the moves are in, so none lands on a plan already out of date
+    with file_lock(OCCUPANCY_LOCK_FILE):
+        plan = plan_rebalance(year_level)
+        if apply and plan["moves"]:
+            entries, expected = rebalance_writes(plan)
+            append_journal(entries, expected)
+    if apply and plan["moves"]:
+        replicate_to_departments()
+    return plan
+
+
+def rebalance_writes(plan):
+    """Return the journal entries and version checks that carry out a rebalance plan."""
+    entries = [{"op": "patch", "student": move["student"], "fields": {"Section": move["to"][0], "Room": move["to"][1]}}
+               for move in plan["moves"]]
+    # A student edited at another station since the plan was made stops the whole batch
+    return entries, {move["student"]: tuple(move["version"]) for move in plan["moves"]}
+
+
+def format_rebalance_plan(plan, limit=None):
+    """Describe a rebalance plan as lines of text: seats per section before and after, then the moves."""
+    lines = [f"Year {plan['year_level']}: {plan['students']} active students, {len(plan['moves'])} to move",
+             f"  {'Section':<8} {'Room':<18} {'Seats':>6} {'Before':>7} {'After':>7}"]
+    for section in plan["sections"]:
+        lines.append(f"  {section['section']:<8} {section['room']:<18} {section['capacity']:>6} "
+                     f"{section['before']:>7} {section['after']:>7}")
+    moves = plan["moves"] if limit is None else plan["moves"][:limit]
+    if plan["moves"]:
+        lines.append("")
+    for move in moves:
+        lines.append(f"  {move['student']:<14} {move['name']:<35} {move['from'][0] or '-'} ({move['from'][1] or '-'})"
+                     f" -> {move['to'][0]} ({move['to'][1]})")
+    if len(moves) < len(plan["moves"]):
+        lines.append(f"  ... and {len(plan['moves']) - len(moves)} more")
+    overflow = plan.get("overflow", 0)
+    if overflow:
+        lines.append(f"  {overflow} students more than the rooms seat: they stay in their sections until a room opens")
+    if plan["unplaced"] > overflow:
+        lines.append(f"  {plan['unplaced'] - overflow} students cannot move: every seat they could take is reserved")
+    return lines
+
+
+# ==================== CORE FUNCTIONS ====================
+
+def generate_student_number():
+    """Generate unique student number in format YYYY-####, or report the error and return None."""
+    try:
+        return allocate_student_number()
     except Exception as e:
+        # No guessing from the roster: that could reissue a number another station has reserved
         print_error(f"Error generating student number: {str(e)}")
-        return "2025-0001"
+        print_error("Enrollment cannot continue until the student number store can be used again.")
+        return None
 
 
 def assign_section(year_level):
     """Assign section and room automatically based on capacity (40 students per room)."""
-    sections = ["A", "B", "C", "D"]
-    MAX_CAPACITY = 40
-    
-    # Track counts by (section, room) combination
-    section_room_counts = {}
-    
     try:
-        if os.path.exists(MAIN_FILE):
-            with open(MAIN_FILE, "r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    # Skip archived students
-                    if row.get("Archived", "No").upper() == "YES":
-                        continue
-                    
-                    section = row.get("Section", "")
-                    room = row.get("Room", "")
-                    
-                    if section.startswith(str(year_level)) and room:
-                        key = (section, room)
-                        section_room_counts[key] = section_room_counts.get(key, 0) + 1
-
-        # Find first section/room combination with available capacity
-        for sec in [f"{year_level}{s}" for s in sections]:
-            room = ROOM_ASSIGNMENTS.get(sec, "Room Not Assigned")
-            key = (sec, room)
-            current_count = section_room_counts.get(key, 0)
-            
-            if current_count < MAX_CAPACITY:
-                return sec
+        # Counts are kept up to date as students are enrolled, archived or moved
+        section = choose_section(year_level, section_occupancy())
+        if section:
+            return section
 
         # If all sections/rooms are full, try to assign to next available section
         # This handles overflow - assign to next section even if it means going beyond normal capacity
-        print_warning(f"All rooms for Year {year_level} are at capacity (40 students each).")
+        print_warning(f"All rooms for Year {year_level} are at capacity ({ROOM_CAPACITY} students each).")
         print_warning(f"Assigning to {year_level}D (may exceed capacity).")
         return f"{year_level}D"
     except Exception as e:
@@ -687,55 +3964,39 @@ def assign_section(year_level):
         return f"{year_level}A"
 
 
-def save_student(data, update_mode=False, student_number=None):
-    """Save student data to main file and copy to Registrar and Librarian directories."""
+def save_student(data, update_mode=False, student_number=None, expected_version=None):
+    """Save student data to main file and copy to Registrar and Librarian directories.
+
+    In update mode, pass the record_version() read before editing as expected_version to
+    refuse the save if another station changed the student in the meantime.
+    """
     try:
-        header = [
-            "Student Number", "Last Name", "First Name", "Middle Initial", "Suffix",
-            "Full Name", "Age", "Birthdate", "Sex", "Phone Number",
-            "Emergency Contact", "Emergency Number", "Street", "Barangay", "City/Municipality",
-            "Province", "Postal Code", "Nationality", "Course",
-            "Year Level", "Semester", "Section", "Room", "Subjects", "Total Units", "Archived"
-        ]
-        
-        if update_mode:
-            # Update existing student
-            if not os.path.exists(MAIN_FILE):
-                print_error("No students file found.")
-                return False
+        with span("save_student", mode="update" if update_mode else "new"):
+            if update_mode:
+                # Update existing student
+                if not roster_exists():
+                    print_error("No students file found.")
+                    return False
             
-            # Read all students
-            students = []
-            with open(MAIN_FILE, "r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                fieldnames = reader.fieldnames
-                for row in reader:
-                    if row.get("Student Number", "") == student_number:
-                        # Update this student's data
-                        students.append(data)
-                    else:
-                        students.append(row)
+                if find_student(student_number) is None:
+                    print_error(f"Student number {student_number} not found.")
+                    return False
             
-            # Write back to file
-            with open(MAIN_FILE, "w", newline="", encoding="utf-8") as file:
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(students)
-        else:
-            # Add new student
-            new_file = not os.path.exists(MAIN_FILE)
-            with open(MAIN_FILE, "a", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file)
-                if new_file:
-                    writer.writerow(header)
-                writer.writerow(data)
-
-        # Copy to Registrar and Librarian directories
-        shutil.copy(MAIN_FILE, REGISTRAR_FILE)
-        shutil.copy(MAIN_FILE, LIBRARIAN_FILE)
-
-        print_success("Student data saved and copied to Registrar and Librarian directories.")
-        return True
+                # Record the replacement row in the journal
+                expected = None if expected_version is None else {student_number: expected_version}
+                append_journal([{"op": "upsert", "student": student_number, "row": dict(data)}], expected)
+            else:
+                # Add new student
+                append_students([data])
+
+            # Copy to Registrar and Librarian directories
+            replicate_to_departments()
+
+            print_success("Student data saved and copied to Registrar and Librarian directories.")
+            return True
+    except StaleRecordError as e:
+        print_error(str(e))
+        return False
     except Exception as e:
         print_error(f"Error saving student data: {str(e)}")
         return False
@@ -751,17 +4012,17 @@ def enroll_student():
     
     # Field definitions with their prompts and validation
     fields = [
-        ("last_name", "Last Name: ", lambda x: len(x.strip()) > 0 and all(c.isalpha() or c in " -'." for c in x), 
+        ("last_name", "Last Name: ", validate_name,
          "Last name must contain only letters, spaces, hyphens, apostrophes, or periods.", False, False),
-        ("first_name", "First Name: ", lambda x: len(x.strip()) > 0 and all(c.isalpha() or c in " -'." for c in x),
+        ("first_name", "First Name: ", validate_name,
          "First name must contain only letters, spaces, hyphens, apostrophes, or periods.", False, False),
         ("middle_initial", "Middle Initial/Name (Optional, press Enter to skip): ",
-         lambda x: len(x) == 0 or (len(x.strip()) > 0 and all(c.isalpha() or c in " -'." for c in x)),
+         validate_middle_name,
          "Middle initial/name must contain only letters, spaces, hyphens, apostrophes, or periods.", False, True),
         ("suffix", "Suffix (Optional, e.g., Jr., Sr., III - press Enter to skip): ",
-         lambda x: len(x) == 0 or (len(x) <= 10 and all(c.isalpha() or c in " .," for c in x)),
+         validate_suffix,
          "Suffix must not contain numbers (e.g., Jr., Sr., III) or be empty.", False, True),
-        ("sex", "Sex (M/F): ", lambda x: x.upper() in ["M", "F"],
+        ("sex", "Sex (M/F): ", validate_sex,
          "Invalid sex. Must be M or F.", False, False),
         ("nationality", "Nationality [Default: Filipino]: ", lambda x: True,
          "", False, True),
@@ -777,6 +4038,9 @@ def enroll_student():
     try:
         # Generate student number
         student_number = generate_student_number()
+        if student_number is None:
+            input("\nPress Enter to return to main menu...")
+            return
         print(f"Student Number: {student_number}")
         print()
 
@@ -914,14 +4178,7 @@ def enroll_student():
                 continue
 
             # Automatically calculate age from birthdate
-            today = datetime.now()
-            age = today.year - birthdate.year
-            
-            # Adjust for birthday this year
-            if today.month < birthdate.month or (
-                today.month == birthdate.month and today.day < birthdate.day
-            ):
-                age -= 1
+            age = calculate_age(birthdate)
 
             # Validate calculated age
             if age < 1 or age > 150:
@@ -977,7 +4234,7 @@ def enroll_student():
 
             emergency_number = get_field_input(
                 "Emergency Contact Number (Philippines: 63XXXXXXXXXX or 09XXXXXXXXX): ",
-                lambda x: validate_phone_philippines(x) or (x.isdigit() and len(x) >= 7),
+                validate_emergency_number,
                 "Invalid emergency number. Must be Philippine format (63+ or 09+) or at least 7 digits.",
                 data.get("emergency_number", ""), True, False
             )
@@ -1045,10 +4302,18 @@ def enroll_student():
                 print_info(f"Postal Code automatically assigned: {postal}")
                 data["postal"] = postal
             else:
-                print_warning(f"Postal code not found for {city}. Please enter manually.")
+                provinces = sorted({entry[3] for entry in postal_candidates(city)})
+                if len(provinces) > 1:
+                    print_warning(f"{city} is in several provinces ({', '.join(provinces)}); "
+                                  f"go back to correct the Province or enter the postal code manually.")
+                else:
+                    print_warning(f"Postal code not found for {city}. Please enter manually.")
+                    suggestions = suggest_places(city[:4], province) or suggest_places(city[:4])
+                    if suggestions:
+                        print_info(f"Places starting with '{city[:4]}': {'; '.join(suggestions)}")
                 postal = get_field_input(
                     "Postal Code (4 digits for Philippines): ",
-                    lambda x: x.isdigit() and len(x) == 4,
+                    validate_postal_code,
                     "Invalid postal code. Must be 4 digits.",
                     data.get("postal", ""), False, False
                 )
@@ -1193,8 +4458,8 @@ def enroll_student():
         print()
         
         total_units = len(subjects_enrolled) * 3
-        year_level_num = year.replace("st Year", "").replace("nd Year", "").replace("rd Year", "").replace("th Year", "")
-        section = assign_section(year_level_num)
+        year_level_num = year_level_number(year)
+        section = reserve_seat(year_level_num, student_number)
         room = ROOM_ASSIGNMENTS.get(section, "Room Not Assigned")
 
         # Prepare student data with separate name fields
@@ -1228,6 +4493,8 @@ def enroll_student():
             print()
             print_success("Enrollment successful!")
             print()
+        else:
+            release_seat(student_number)
 
     except KeyboardInterrupt:
         print_error("\nEnrollment cancelled by user.")
@@ -1237,80 +4504,439 @@ def enroll_student():
         input("\nPress Enter to return to main menu...")
 
 
+# ==================== BULK ENROLLMENT ====================
+
+def normalize_field_name(name):
+    """Normalize an input column name for matching (case, spaces, underscores, slashes)."""
+    return " ".join(str(name).replace("_", " ").replace("/", " ").split()).lower()
+
+
+# Bulk input column names -> STUDENT_HEADER column
+BULK_FIELD_ALIASES = {normalize_field_name(name): name for name in STUDENT_HEADER}
+BULK_FIELD_ALIASES.update({
+    "city": "City/Municipality", "postal": "Postal Code", "phone": "Phone Number",
+    "year": "Year Level", "sem": "Semester", "middle name": "Middle Initial",
+})
+
+
+# (column, validator, error message) checks shared with the interactive enrollment form
+BULK_NAME_RULES = [
+    ("Last Name", validate_name, "Last name must contain only letters, spaces, hyphens, apostrophes, or periods."),
+    ("First Name", validate_name, "First name must contain only letters, spaces, hyphens, apostrophes, or periods."),
+    ("Middle Initial", validate_middle_name,
+     "Middle initial/name must contain only letters, spaces, hyphens, apostrophes, or periods."),
+    ("Suffix", validate_suffix, "Suffix must not contain numbers (e.g., Jr., Sr., III) or be empty."),
+    ("Sex", validate_sex, "Invalid sex. Must be M or F."),
+]
+BULK_NUMBER_RULES = [
+    ("Phone Number", validate_phone,
+     "Invalid phone number! Must start with 63 (12 digits) or 09 (11 digits) for Philippines."),
+    ("Emergency Number", validate_emergency_number,
+     "Invalid emergency number. Must be Philippine format (63+ or 09+) or at least 7 digits."),
+]
+
+
+def read_bulk_records(path):
+    """Stream (line number, record) pairs from a CSV or JSONL intake file."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        if path.lower().endswith((".jsonl", ".json", ".ndjson")):
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    yield line_number, {"_error": "Line is not a JSON object."}
+                    continue
+                yield line_number, {BULK_FIELD_ALIASES.get(normalize_field_name(key), key): value
+                                    for key, value in record.items()}
+        else:
+            reader = csv.reader(file)
+            columns = [BULK_FIELD_ALIASES.get(normalize_field_name(name), name) for name in next(reader, [])]
+            for values in reader:
+                if any(value.strip() for value in values):
+                    yield reader.line_num, dict(zip(columns, values))
+
+
+def match_choice(value, choices):
+    """Match "2", "2nd" or "2nd Year" against choices such as ["1st Year", "2nd Year"]."""
+    value = str(value).strip().lower()
+    for choice in choices:
+        if value and (value == choice.lower() or choice.lower().startswith(value)):
+            return choice
+    return None
+
+
+def parse_subject_selection(value, available_subjects):
+    """Resolve subject codes (a list, or separated by ; or ,) against the offered subjects."""
+    if isinstance(value, str):
+        # The stored form's catalog names may contain commas themselves
+        value = split_subject_list(value.replace(";", ","), dict(available_subjects))
+    by_code = {code.upper(): (code, name) for code, name in available_subjects}
+    selected = []
+    unknown = []
+    for item in value or []:
+        # Accept "FOP" as well as the stored "FOP (Fundamentals of Programming)" form
+        code = str(item).strip().split(" (")[0].upper()
+        if not code:
+            continue
+        if code not in by_code:
+            unknown.append(code)
+        elif by_code[code] not in selected:
+            selected.append(by_code[code])
+    return selected, unknown
+
+
+def validate_enrollment_record(record):
+    """Apply the enrollment form's validation to one bulk record; return (student, errors)."""
+    if "_error" in record:
+        return None, [record["_error"]]
+
+    fields = {key: "" if value is None else str(value).strip() for key, value in record.items()}
+    text = lambda field: fields.get(field, "")
+
+    errors = []
+    student = {}
+    for field, validator, message in BULK_NAME_RULES:
+        if not validator(text(field)):
+            errors.append(message)
+        student[field] = text(field)
+    student["Sex"] = student["Sex"].upper()
+    if student["Middle Initial"]:
+        student["Middle Initial"] = " ".join(word.capitalize() for word in student["Middle Initial"].split())
+    student["Nationality"] = text("Nationality") or "Filipino"
+    student["Full Name"] = format_name(student["Last Name"], student["First Name"],
+                                       student["Middle Initial"], student["Suffix"])
+
+    try:
+        birthdate = parse_date(text("Birthdate"))
+        age = calculate_age(birthdate)
+        if birthdate > date.today():
+            errors.append("Birthdate cannot be in the future.")
+        elif age < 1 or age > 150:
+            errors.append(f"Invalid birthdate. Calculated age ({age}) is out of valid range (1-150).")
+        student["Birthdate"] = text("Birthdate")
+        student["Age"] = age
+    except ValueError:
+        errors.append("Invalid date format. Please use YYYY-MM-DD.")
+
+    for field, validator, message in BULK_NUMBER_RULES:
+        number = text(field).replace("-", "").replace(" ", "").replace("+", "")
+        if not validator(number):
+            errors.append(message)
+        student[field] = number
+    for field in ("Emergency Contact", "Street", "Barangay", "City/Municipality", "Province"):
+        student[field] = text(field)
+    if not student["City/Municipality"]:
+        errors.append("City/Municipality is required.")
+    if not student["Province"]:
+        errors.append("Province is required.")
+
+    student["Postal Code"] = text("Postal Code") or get_postal_code(student["City/Municipality"], student["Province"])
+    if not validate_postal_code(student["Postal Code"]):
+        errors.append(f"Postal code not found for {student['City/Municipality']}. Provide a 4-digit Postal Code.")
+
+    course = text("Course").upper()
+    year = sem = None
+    if course not in SUBJECTS:
+        errors.append(f"Invalid course. Please choose from: {', '.join(SUBJECTS.keys())}")
+    else:
+        year = match_choice(text("Year Level"), SUBJECTS[course].keys())
+        if year is None:
+            errors.append(f"Invalid year level. Please choose from: {', '.join(SUBJECTS[course].keys())}")
+        else:
+            sem = match_choice(text("Semester"), SUBJECTS[course][year].keys())
+            if sem is None:
+                errors.append(f"Invalid semester. Please choose from: {', '.join(SUBJECTS[course][year].keys())}")
+    student["Course"] = course
+    student["Year Level"] = year or ""
+    student["Semester"] = sem or ""
+
+    if sem:
+        subjects, unknown = parse_subject_selection(record.get("Subjects"), SUBJECTS[course][year][sem])
+        if unknown:
+            errors.append(f"Subjects not offered for {course} {year} {sem}: {', '.join(unknown)}")
+        elif not subjects:
+            errors.append("No subjects were enrolled. Please enroll at least one subject.")
+        student["Subjects"] = ", ".join(f"{code} ({name})" for code, name in subjects)
+        student["Total Units"] = len(subjects) * 3
+
+    return student, errors
+
+
+def place_students(students, counts=None):
+    """Give validated students numbers and sections; return (rows, overflow).
+
+    counts (section_occupancy() by default) gets the new seats added. The caller holds
+    OCCUPANCY_LOCK_FILE until the rows are saved, so other stations' seat picks see them.
+    """
+    if not students:
+        return [], 0
+    numbers = allocate_student_numbers(len(students))
+    rows = []
+    overflow = 0
+    counts = section_occupancy() if counts is None else counts
+    for student_number, student in zip(numbers, students):
+        year_level_num = year_level_number(student["Year Level"])
+        section = choose_section(year_level_num, counts)
+        if section is None:
+            overflow += 1
+            section = f"{year_level_num}D"
+        room = ROOM_ASSIGNMENTS.get(section, "Room Not Assigned")
+        counts[(section, room)] = counts.get((section, room), 0) + 1
+        row = dict(student, **{"Student Number": student_number, "Section": section,
+                               "Room": room, "Archived": "No"})
+        rows.append([row.get(field, "") for field in STUDENT_HEADER])
+    return rows, overflow
+
+
+def commit_enrollment_batch(students):
+    """Number, section and save a batch of validated students with one write; return the rows."""
+    if REMOTE_SERVER:
+        reply = remote_request("POST", "/students", {"students": students})
+        return [[row.get(field, "") for field in STUDENT_HEADER] for row in reply["students"]], reply["overflow"]
+    # Holding the occupancy lock through the save keeps other stations' seat picks consistent
+    with file_lock(OCCUPANCY_LOCK_FILE):
+        rows, overflow = place_students(students)
+        append_students(rows)
+    replicate_to_departments()
+    return rows, overflow
+
+
+def bulk_enroll(path, error_report=None, batch_size=BULK_BATCH_SIZE):
+    """Enroll every valid student in a CSV or JSONL file; rejected rows go to an error report."""
+    error_report = error_report or f"{os.path.splitext(path)[0]}_errors.csv"
+    started = time.perf_counter()
+    imported = 0
+    rejected = 0
+    overflow = 0
+    batch = []
+
+    with open(error_report, "w", newline="", encoding="utf-8") as report_file:
+        report = csv.DictWriter(report_file, fieldnames=["Line", "Reason"] + STUDENT_HEADER,
+                                extrasaction="ignore")
+        report.writeheader()
+        for line_number, record in read_bulk_records(path):
+            student, errors = validate_enrollment_record(record)
+            if errors:
+                rejected += 1
+                report.writerow(dict(record, Line=line_number, Reason="; ".join(errors)))
+                continue
+            batch.append(student)
+            if len(batch) >= batch_size:
+                rows, batch_overflow = commit_enrollment_batch(batch)
+                imported += len(rows)
+                overflow += batch_overflow
+                batch = []
+        if batch:
+            rows, batch_overflow = commit_enrollment_batch(batch)
+            imported += len(rows)
+            overflow += batch_overflow
+
+    elapsed = time.perf_counter() - started
+    print_success(f"Imported {imported} students in {elapsed:.2f}s ({imported / elapsed if elapsed else 0:.0f} rows/s).")
+    if overflow:
+        print_warning(f"{overflow} students were placed in a full D section (may exceed capacity).")
+    if rejected:
+        print_warning(f"{rejected} rows were rejected. See '{error_report}' for the reasons.")
+    return {"imported": imported, "rejected": rejected, "overflow": overflow,
+            "seconds": elapsed, "error_report": error_report}
+
+
 # ==================== VIEW FUNCTIONS ====================
 
+def student_filter_matches(row, filters):
+    """Return True if an active student row has every filtered value (Course, Year Level, Section)."""
+    if (row.values[ARCHIVED_COLUMN] or "No").upper() == "YES":
+        return False
+    return all(row.get(name) == value for name, value in filters.items())
+
+
+def iter_students(filters=None, start=0):
+    """Lazily yield the active students matching filters, skipping the first start of them."""
+    filters = filters or {}
+    if REMOTE_SERVER:
+        return remote_students(filters, start)
+    if STORAGE_BACKEND == "sqlite":
+        # Filtered columns are indexed, and skipped rows are never read into Python
+        clauses = ["UPPER(archived) != 'YES'"] + [f"{column_name(name)} = ?" for name in filters]
+        return db_iter_rows(" AND ".join(clauses), list(filters.values()), start)
+    if roster_loaded():
+        # Answered from the posting lists of the roster already in memory
+        return islice(iter(query_students(filters)), start, None)
+    return islice((row for row in iter_roster_rows() if student_filter_matches(row, filters)), start, None)
+
+
+def new_student_pager(filters=None):
+    """Return the state of a paged walk over the students matching filters."""
+    return {"filters": filters or {}, "rows": None, "position": 0, "pages": {}, "total": None}
+
+
+def read_student_page(pager, page):
+    """Return the display fields of the students on a page (empty past the end).
+
+    Rows are read forward from where the last page stopped; only moving back to a page
+    not seen yet starts the read over. Visited pages are kept, so going back is free.
+    """
+    if page in pager["pages"]:
+        return pager["pages"][page]
+    start = page * VIEW_PAGE_SIZE
+    if pager["rows"] is None or start < pager["position"]:
+        pager["rows"] = iter_students(pager["filters"], start)
+    else:
+        # Skip the pages jumped over without keeping their rows
+        skipped = sum(1 for _ in islice(pager["rows"], start - pager["position"]))
+        if skipped < start - pager["position"]:
+            pager["total"] = pager["position"] + skipped
+            return []
+
+    students = [
+        (row.get("Student Number", "N/A"),
+         row.get("Full Name", "N/A"),
+         row.get("Course", "N/A"), row.get("Year Level", "N/A"),
+         row.get("Section", "N/A"), row.get("Room", "N/A"))
+        for row in islice(pager["rows"], VIEW_PAGE_SIZE)
+    ]
+    pager["position"] = start + len(students)
+    if len(students) < VIEW_PAGE_SIZE:
+        pager["total"] = pager["position"]
+    if students:
+        pager["pages"][page] = students
+    return students
+
+
+def render_student_page(pager, page, students, message=""):
+    """Build the text of one page of the master list."""
+    # Define column widths
+    col_no = 5
+    col_student = 15
+    col_name = 35
+    col_course = 8
+    col_year = 15
+    col_section = 10
+    col_room = 12
+
+    lines = ["", "=" * 80, "STUDENT MASTER LIST".center(80), "=" * 80, ""]
+    if pager["filters"]:
+        lines.append("Filter: " + ", ".join(f"{name} = {value}" for name, value in pager["filters"].items()))
+        lines.append("")
+
+    header = (f"{'No.':<{col_no}} | "
+              f"{'Student Number':<{col_student}} | "
+              f"{'Full Name':<{col_name}} | "
+              f"{'Course':<{col_course}} | "
+              f"{'Year Level':<{col_year}} | "
+              f"{'Section':<{col_section}} | "
+              f"{'Room':<{col_room}}")
+    lines.append(header)
+    lines.append("-" * len(header))
+
+    for number, (student_num, name, course, year, section, room) in enumerate(students, page * VIEW_PAGE_SIZE + 1):
+        # Truncate long names
+        if len(name) > col_name:
+            name = name[:col_name-3] + "..."
+        lines.append(f"{str(number):<{col_no}} | "
+                     f"{student_num:<{col_student}} | "
+                     f"{name:<{col_name}} | "
+                     f"{course:<{col_course}} | "
+                     f"{year:<{col_year}} | "
+                     f"{section:<{col_section}} | "
+                     f"{room:<{col_room}}")
+    if not students:
+        lines.append("No students match this view.")
+
+    lines.append("")
+    if pager["total"] is None:
+        lines.append(f"Page {page + 1}")
+    else:
+        pages = max(1, -(-pager["total"] // VIEW_PAGE_SIZE))
+        lines.append(f"Page {page + 1} of {pages}   Total Active Students: {pager['total']}")
+    if message:
+        lines.append(message)
+    lines.append("")
+    return "\n".join(lines)
+
+
+def prompt_student_filters():
+    """Ask for optional course, year level and section filters; return (filters, ignored entries)."""
+    filters = {}
+    ignored = []
+    prompts = [
+        ("Course", f"Course ({', '.join(SUBJECTS)}, blank for all): ", list(SUBJECTS)),
+        ("Year Level", "Year Level (1-4, blank for all): ", ["1st Year", "2nd Year", "3rd Year", "4th Year"]),
+        ("Section", "Section (e.g. 1A, blank for all): ", list(ROOM_ASSIGNMENTS)),
+    ]
+    for name, prompt, choices in prompts:
+        print_prompt(prompt)
+        value = input().strip()
+        if not value:
+            continue
+        # Filter on the stored spelling so the database can use its indexes
+        match = value.upper() if name == "Section" and value.upper() in choices else match_choice(value, choices)
+        if match:
+            filters[name] = match
+        else:
+            ignored.append(f"{name} '{value}'")
+    return filters, ignored
+
+
 def view_students():
-    """Display all enrolled students."""
+    """Display enrolled students a page at a time."""
     clear_screen()
     print_header("STUDENT MASTER LIST")
     print()
 
     try:
-        if not os.path.exists(MAIN_FILE):
+        if not roster_exists():
             print_error("No students enrolled yet.")
             input("\nPress Enter to continue...")
             return
 
-        with open(MAIN_FILE, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            students = list(reader)
+        pager = new_student_pager()
+        page = 0
+        message = ""
+        while True:
+            students = read_student_page(pager, page)
+            if not students and page > 0:
+                # Moved past the end: show the last page instead
+                page = max(0, -(-pager["total"] // VIEW_PAGE_SIZE) - 1)
+                message = "That is the last page."
+                continue
 
-            if not students:
-                print_error("No students found in the database.")
-                input("\nPress Enter to continue...")
+            # Each page is written to the terminal in one call
+            clear_screen()
+            sys.stdout.write(render_student_page(pager, page, students, message) + "\n")
+            sys.stdout.flush()
+            message = ""
+
+            print_prompt("[N]ext  [P]revious  [J]ump to page  [F]ilter  [Q]uit: ")
+            choice = input().strip().upper()
+            if choice in ("", "N"):
+                page += 1
+            elif choice == "P":
+                if page == 0:
+                    message = "Already at the first page."
+                else:
+                    page -= 1
+            elif choice == "J":
+                print_prompt("Page number: ")
+                target = input().strip()
+                if target.isdigit() and int(target) > 0:
+                    page = int(target) - 1
+                else:
+                    message = "Please enter a page number."
+            elif choice == "F":
+                filters, ignored = prompt_student_filters()
+                pager = new_student_pager(filters)
+                page = 0
+                if ignored:
+                    message = f"Not recognized, so not filtered: {', '.join(ignored)}."
+            elif choice == "Q" or check_back_command(choice):
                 return
-
-            # Define column widths
-            col_no = 5
-            col_student = 15
-            col_name = 35
-            col_course = 8
-            col_year = 15
-            col_section = 10
-            col_room = 12
-            
-            # Print header
-            header = (f"{'No.':<{col_no}} | "
-                     f"{'Student Number':<{col_student}} | "
-                     f"{'Full Name':<{col_name}} | "
-                     f"{'Course':<{col_course}} | "
-                     f"{'Year Level':<{col_year}} | "
-                     f"{'Section':<{col_section}} | "
-                     f"{'Room':<{col_room}}")
-            print(header)
-            print_separator("-", length=len(header))
-
-            active_count = 0
-            for student in students:
-                # Skip archived students
-                if student.get('Archived', 'No').upper() == 'YES':
-                    continue
-                
-                active_count += 1
-                # Handle both old format (Name) and new format (Full Name)
-                name = student.get('Full Name', student.get('Name', 'N/A'))
-                student_num = student.get('Student Number', 'N/A')
-                course = student.get('Course', 'N/A')
-                year = student.get('Year Level', 'N/A')
-                section = student.get('Section', 'N/A')
-                room = student.get('Room', 'N/A')
-                
-                # Truncate long names
-                if len(name) > col_name:
-                    name = name[:col_name-3] + "..."
-                
-                # Print row with proper alignment
-                row = (f"{str(active_count):<{col_no}} | "
-                      f"{student_num:<{col_student}} | "
-                      f"{name:<{col_name}} | "
-                      f"{course:<{col_course}} | "
-                      f"{year:<{col_year}} | "
-                      f"{section:<{col_section}} | "
-                      f"{room:<{col_room}}")
-                print(row)
-
-            print()
-            print(f"Total Active Students: {active_count}")
+            else:
+                message = "Invalid choice."
 
     except Exception as e:
         print_error(f"Error viewing students: {str(e)}")
@@ -1324,318 +4950,395 @@ def view_student_details():
     print_header("STUDENT DETAILED INFORMATION")
 
     try:
-        if not os.path.exists(MAIN_FILE):
+        if not roster_exists():
             print_error("No students enrolled yet.")
             input("\nPress Enter to continue...")
             return
 
-        print_prompt("Enter Student Number: ")
-        student_number = input().strip()
+        student_number, student, _ = prompt_student("Enter Student Number or Name: ")
+        if student is not None:
+            print()
+            
+            full_name = student.get('Full Name', 'N/A')
+            last_name = student.get('Last Name', '')
+            first_name = student.get('First Name', '')
+            middle_initial = student.get('Middle Initial', '')
+            suffix = student.get('Suffix', '')
+            
+            print("STUDENT NUMBER")
+            print_separator("-")
+            print(f"  {student.get('Student Number', 'N/A')}")
+            print()
+            
+            print("PERSONAL INFORMATION")
+            print_separator("-")
+            if last_name or first_name:
+                print(f"  Last Name: {last_name}")
+                print(f"  First Name: {first_name}")
+                if middle_initial:
+                    print(f"  Middle Initial: {middle_initial}")
+                if suffix:
+                    print(f"  Suffix: {suffix}")
+            print(f"  Full Name: {full_name}")
+            print(f"  Age: {student.get('Age', 'N/A')}")
+            print(f"  Birthdate: {student.get('Birthdate', 'N/A')}")
+            print(f"  Sex: {student.get('Sex', 'N/A')}")
+            print()
+            
+            print("CONTACT INFORMATION")
+            print_separator("-")
+            print(f"  Phone Number: {student.get('Phone Number', 'N/A')}")
+            print(f"  Emergency Contact: {student.get('Emergency Contact', 'N/A')}")
+            print(f"  Emergency Number: {student.get('Emergency Number', 'N/A')}")
+            print()
+            
+            print("ADDRESS")
+            print_separator("-")
+            barangay = student.get('Barangay', '')
+            address_parts = [student.get('Street', 'N/A')]
+            if barangay:
+                address_parts.append(f"Brgy. {barangay}")
+            city = student.get('City/Municipality', '') or 'N/A'
+            province = student.get('Province', '') or 'N/A'
+            postal_code = student.get('Postal Code', '') or 'N/A'
+            address_parts.extend([city, province, postal_code])
+            address = ", ".join(address_parts)
+            print(f"  Address: {address}")
+            print()
+            
+            print("ACADEMIC INFORMATION")
+            print_separator("-")
+            print(f"  Nationality: {student.get('Nationality', 'N/A')}")
+            print(f"  Course: {student.get('Course', 'N/A')}")
+            print(f"  Year Level: {student.get('Year Level', 'N/A')}")
+            print(f"  Semester: {student.get('Semester', 'N/A')}")
+            print(f"  Section: {student.get('Section', 'N/A')}")
+            print(f"  Room: {student.get('Room', 'N/A')}")
+            print(f"  Total Units: {student.get('Total Units', 'N/A')}")
+            print()
+            
+            print("SUBJECTS ENROLLED")
+            print_separator("-")
+            subjects = student_subjects(student)
+            if subjects:
+                for idx, (code, name) in enumerate(subjects, 1):
+                    print(f"  {idx}. {code} ({name})" if name else f"  {idx}. {code}")
+            else:
+                print("  No subjects enrolled.")
+            print()
 
-        with open(MAIN_FILE, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            found = False
+    except Exception as e:
+        print_error(f"Error viewing student details: {str(e)}")
+    
+    input("\nPress Enter to continue...")
 
-            for student in reader:
-                if student.get("Student Number", "").upper() == student_number.upper():
-                    found = True
-                    print()
-                    
-                    # Handle both old and new format
-                    full_name = student.get('Full Name', student.get('Name', 'N/A'))
-                    last_name = student.get('Last Name', 'N/A')
-                    first_name = student.get('First Name', 'N/A')
-                    middle_initial = student.get('Middle Initial', '')
-                    suffix = student.get('Suffix', '')
-                    
-                    print("STUDENT NUMBER")
-                    print_separator("-")
-                    print(f"  {student.get('Student Number', 'N/A')}")
-                    print()
-                    
-                    print("PERSONAL INFORMATION")
-                    print_separator("-")
-                    if last_name != 'N/A':
-                        print(f"  Last Name: {last_name}")
-                        print(f"  First Name: {first_name}")
-                        if middle_initial:
-                            print(f"  Middle Initial: {middle_initial}")
-                        if suffix:
-                            print(f"  Suffix: {suffix}")
-                    print(f"  Full Name: {full_name}")
-                    print(f"  Age: {student.get('Age', 'N/A')}")
-                    print(f"  Birthdate: {student.get('Birthdate', 'N/A')}")
-                    print(f"  Sex: {student.get('Sex', 'N/A')}")
-                    print()
-                    
-                    print("CONTACT INFORMATION")
-                    print_separator("-")
-                    print(f"  Phone Number: {student.get('Phone Number', 'N/A')}")
-                    print(f"  Emergency Contact: {student.get('Emergency Contact', 'N/A')}")
-                    print(f"  Emergency Number: {student.get('Emergency Number', 'N/A')}")
-                    print()
-                    
-                    print("ADDRESS")
-                    print_separator("-")
-                    barangay = student.get('Barangay', '')
-                    address_parts = [student.get('Street', 'N/A')]
-                    if barangay:
-                        address_parts.append(f"Brgy. {barangay}")
-                    city = student.get('City/Municipality', '') or 'N/A'
-                    province = student.get('Province', '') or 'N/A'
-                    postal_code = student.get('Postal Code', '') or 'N/A'
-                    address_parts.extend([city, province, postal_code])
-                    address = ", ".join(address_parts)
-                    print(f"  Address: {address}")
-                    print()
-                    
-                    print("ACADEMIC INFORMATION")
-                    print_separator("-")
-                    print(f"  Nationality: {student.get('Nationality', 'N/A')}")
-                    print(f"  Course: {student.get('Course', 'N/A')}")
-                    print(f"  Year Level: {student.get('Year Level', 'N/A')}")
-                    print(f"  Semester: {student.get('Semester', 'N/A')}")
-                    print(f"  Section: {student.get('Section', 'N/A')}")
-                    print(f"  Room: {student.get('Room', 'N/A')}")
-                    print(f"  Total Units: {student.get('Total Units', 'N/A')}")
-                    print()
-                    
-                    print("SUBJECTS ENROLLED")
-                    print_separator("-")
-                    subjects = student.get('Subjects', 'N/A')
-                    if subjects and subjects != 'N/A':
-                        subject_list = [s.strip() for s in subjects.split(',')]
-                        for idx, subject in enumerate(subject_list, 1):
-                            print(f"  {idx}. {subject}")
-                    else:
-                        print("  No subjects enrolled.")
-                    print()
-                    break
 
-            if not found:
-                print_error(f"Student number {student_number} not found.")
+def view_statistics():
+    """Show headcounts of active students and their unit loads."""
+    clear_screen()
+    print_header("ENROLLMENT STATISTICS")
 
+    try:
+        if not roster_exists():
+            print_error("No students enrolled yet.")
+        else:
+            for line in format_statistics(enrollment_statistics()):
+                print(line)
     except Exception as e:
-        print_error(f"Error viewing student details: {str(e)}")
-    
+        print_error(f"Error viewing statistics: {str(e)}")
+
     input("\nPress Enter to continue...")
 
 
 # ==================== REPORT GENERATION ====================
 
-def generate_class_lists():
+# Class-list columns, in sort order: section, room, then student number
+CLASS_LIST_FIELDS = ["Section", "Room", "Student Number", "Full Name", "Course",
+                     "Year Level", "Semester", "Subjects Enrolled", "Total Units"]
+CLASS_LIST_REPORT_FIELDS = [
+    "No.", "Student Number", "Full Name", "Course",
+    "Year Level", "Section", "Room", "Total Units", "Subject Code", "Subject Name"
+]
+
+
+def class_list_entries(rows=None):
+    """Yield the class-list fields of every active student as tuples in CLASS_LIST_FIELDS order.
+
+    rows defaults to the roster streamed from disk.
+    """
+    if REMOTE_SERVER and rows is None:
+        for section in remote_request("GET", "/class-lists")["sections"]:
+            for student in section["students"]:
+                yield tuple(student[field] for field in CLASS_LIST_FIELDS)
+        return
+    for row in iter_roster_rows() if rows is None else rows:
+        values = row.values
+        # Skip archived students
+        if (values[ARCHIVED_COLUMN] or "No").upper() == "YES":
+            continue
+        yield (
+            str(values[SECTION_COLUMN]),
+            str(values[ROOM_COLUMN]),
+            str(values[STUDENT_NUMBER_COLUMN]),
+            str(values[FULL_NAME_COLUMN]),
+            str(values[COURSE_COLUMN]),
+            str(values[YEAR_LEVEL_COLUMN]),
+            str(values[SEMESTER_COLUMN]),
+            str(values[SUBJECTS_COLUMN]),
+            str(values[TOTAL_UNITS_COLUMN]),
+        )
+
+
+def spill_sorted_run(entries, directory):
+    """Sort entries and write them to a temporary run file; return its path."""
+    entries.sort()
+    handle, path = tempfile.mkstemp(prefix="run_", suffix=".csv", dir=directory)
+    with os.fdopen(handle, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(entries)
+    return path
+
+
+def read_sorted_run(path):
+    """Yield the entries of a run file written by spill_sorted_run."""
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        for values in csv.reader(file):
+            yield tuple(values)
+
+
+def sort_entries(entries, max_rows, directory):
+    """Sort entries holding at most max_rows in memory; return an iterator over them.
+
+    Beyond max_rows, sorted runs are spilled to files in directory and merged.
+    """
+    buffer = []
+    runs = []
+    for entry in entries:
+        buffer.append(entry)
+        if len(buffer) >= max_rows:
+            runs.append(spill_sorted_run(buffer, directory))
+            buffer = []
+    buffer.sort()
+    if runs:
+        return heapq.merge(buffer, *(read_sorted_run(path) for path in runs))
+    return iter(buffer)
+
+
+@contextmanager
+def sorted_class_list(max_rows=CLASS_LIST_SORT_BUFFER):
+    """Sort active students by section, room and student number; yield (counts, entries).
+
+    At most max_rows students are held in memory. Beyond that, sorted runs are
+    spilled to temporary files and merged (an external merge sort). counts maps
+    (section, room) to its number of students and is complete before the first entry.
+    A roster already in memory is streamed a section at a time from its posting lists
+    instead, so only one section is sorted at once.
+    """
+    max_rows = max(1, max_rows)
+    counts = {}
+    with tempfile.TemporaryDirectory(prefix="class_lists_") as spill_dir:
+        if roster_loaded():
+            roster = load_roster()
+            sections = sorted(roster["postings"]["Section"], key=str)
+            for section in sections:
+                for row in query_students({"Section": section}, roster=roster):
+                    key = (str(section), str(row.values[ROOM_COLUMN]))
+                    counts[key] = counts.get(key, 0) + 1
+            yield counts, (entry for section in sections
+                           for entry in sort_entries(class_list_entries(query_students({"Section": section},
+                                                                                       roster=roster)),
+                                                     max_rows, spill_dir))
+            return
+
+        def counted(entries):
+            for entry in entries:
+                counts[entry[:2]] = counts.get(entry[:2], 0) + 1
+                yield entry
+        yield counts, sort_entries(counted(class_list_entries()), max_rows, spill_dir)
+
+
+def write_class_list(filename, section, room, count, students, preview=True):
+    """Write one section's class list CSV from its sorted students, optionally echoing a preview table."""
+    # Define column widths for display
+    col_no = 5
+    col_student = 15
+    col_name = 30
+    col_course = 8
+    col_year = 15
+    col_units = 12
+
+    if preview:
+        print()
+        print(f"CLASS LIST - Section {section} - Room {room}")
+        print_separator("-")
+        header = (f"{'No.':<{col_no}} | "
+                  f"{'Student Number':<{col_student}} | "
+                  f"{'Full Name':<{col_name}} | "
+                  f"{'Course':<{col_course}} | "
+                  f"{'Year Level':<{col_year}} | "
+                  f"{'Total Units':<{col_units}}")
+        print(header)
+        print_separator("-", length=len(header))
+
+    with open(filename, "w", newline="", encoding="utf-8") as outfile:
+        # Write formal header information
+        outfile.write("CLASS LIST REPORT\n")
+        outfile.write("=" * 80 + "\n")
+        outfile.write(f"Section: {section}\n")
+        outfile.write(f"Room: {room}\n")
+        outfile.write(f"Academic Year: {datetime.now().year}\n")
+        outfile.write(f"Total Students: {count}\n")
+        outfile.write("=" * 80 + "\n\n")
+
+        writer = csv.writer(outfile)
+        writer.writerow(CLASS_LIST_REPORT_FIELDS)
+
+        for idx, entry in enumerate(students, 1):
+            section, room, student_num, full_name, course, year_level, semester, subjects_str, total_units = entry
+            student_info = [str(idx), student_num, full_name, course, year_level, section, room, total_units]
+
+            if preview:
+                # Truncate long names
+                shown_name = full_name if len(full_name) <= col_name else full_name[:col_name-3] + "..."
+                print(f"{str(idx):<{col_no}} | "
+                      f"{student_num:<{col_student}} | "
+                      f"{shown_name:<{col_name}} | "
+                      f"{course:<{col_course}} | "
+                      f"{year_level:<{col_year}} | "
+                      f"{total_units:<{col_units}}")
+
+            subjects = subject_entries(subjects_str, course, year_level, semester)
+            if subjects:
+                # One row per subject; only the first carries the student's details
+                for subj_idx, (subject_code, subject_name) in enumerate(subjects):
+                    info = student_info if subj_idx == 0 else [""] * len(student_info)
+                    writer.writerow(info + [subject_code, subject_name])
+            else:
+                writer.writerow(student_info + ["N/A", "No subjects enrolled"])
+
+        # Write footer
+        outfile.write("\n" + "=" * 80 + "\n")
+        outfile.write(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        outfile.write("=" * 80 + "\n")
+
+    if preview:
+        print()
+
+
+def write_class_lists(reports_dir=CLASS_LIST_DIR, preview=True, max_rows=CLASS_LIST_SORT_BUFFER):
+    """Write a class list CSV per section/room in one streaming pass; return how many were written."""
+    os.makedirs(reports_dir, exist_ok=True)
+    written = 0
+    with sorted_class_list(max_rows) as (counts, entries):
+        if not counts:
+            return 0
+
+        print_info("Generating class list reports...")
+        print_separator("-")
+        for (section, room), students in groupby(entries, key=lambda entry: entry[:2]):
+            clean_room = room.replace('/', '-').replace(' ', '_')
+            filename = f"{reports_dir}/{section}_{clean_room}_ClassList.csv"
+            count = counts[(section, room)]
+            print_info(f"Generating: Section {section} - Room {room} ({count} students)")
+            with span("report_write", report="class_list"):
+                write_class_list(filename, section, room, count, students, preview)
+            written += 1
+    return written
+
+
+def generate_class_lists(preview=True, max_rows=CLASS_LIST_SORT_BUFFER):
     """Generate class list reports per section/room."""
     clear_screen()
     print_header("GENERATE CLASS LISTS")
 
     try:
-        if not os.path.exists(MAIN_FILE):
+        if not roster_exists():
             print_error("No students enrolled to generate class lists.")
             input("\nPress Enter to continue...")
             return
 
-        # Read all students and group by (Section, Room)
-        students_by_section = {}
-
-        with open(MAIN_FILE, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Skip archived students
-                if row.get("Archived", "No").upper() == "YES":
-                    continue
-                    
-                section = row.get("Section", "")
-                room = row.get("Room", "Room Not Assigned")
-
-                key = (section, room)
-                if key not in students_by_section:
-                    students_by_section[key] = []
-
-                # Handle both old and new format
-                full_name = row.get("Full Name", row.get("Name", ""))
-
-                class_list_data = {
-                    "Student Number": row.get("Student Number", ""),
-                    "Full Name": full_name,
-                    "Course": row.get("Course", ""),
-                    "Year Level": row.get("Year Level", ""),
-                    "Section": section,
-                    "Room": room,
-                    "Subjects Enrolled": row.get("Subjects", ""),
-                    "Total Units": row.get("Total Units", "")
-                }
-                students_by_section[key].append(class_list_data)
-
-        # Create Reports folder
-        reports_dir = "Class_Lists_Reports"
-        os.makedirs(reports_dir, exist_ok=True)
-
-        if not students_by_section:
+        if write_class_lists(CLASS_LIST_DIR, preview, max_rows):
+            print_separator("-")
+            print_success(f"All class list reports generated successfully in '{CLASS_LIST_DIR}' folder.")
+        else:
             print_error("No data found to generate reports.")
-            input("\nPress Enter to continue...")
-            return
 
-        print_info("Generating class list reports...")
-        print_separator("-")
+    except Exception as e:
+        print_error(f"Error generating class lists: {str(e)}")
+    
+    input("\nPress Enter to continue...")
 
-        # Generate CSV for each Section/Room
-        for (section, room), students in students_by_section.items():
-            clean_room = room.replace('/', '-').replace(' ', '_')
-            filename = f"{reports_dir}/{section}_{clean_room}_ClassList.csv"
 
-            print_info(f"Generating: Section {section} - Room {room} ({len(students)} students)")
+SUBJECT_LIST_REPORT_FIELDS = ["No.", "Student Number", "Full Name", "Section", "Room"]
+
+
+def write_subject_list(filename, offering, students):
+    """Write one subject offering's list of students to a CSV file."""
+    course, year_level, semester, code = offering
+    name = offered_subjects(course, year_level, semester).get(code, "")
+    with open(filename, "w", newline="", encoding="utf-8") as outfile:
+        # Write formal header information
+        outfile.write("SUBJECT LIST REPORT\n")
+        outfile.write("=" * 80 + "\n")
+        outfile.write(f"Subject: {code} ({name})\n" if name else f"Subject: {code}\n")
+        outfile.write(f"Course: {course}\n")
+        outfile.write(f"Year Level: {year_level}\n")
+        outfile.write(f"Semester: {semester}\n")
+        outfile.write(f"Academic Year: {datetime.now().year}\n")
+        outfile.write(f"Total Students: {len(students)}\n")
+        outfile.write("=" * 80 + "\n\n")
+
+        writer = csv.writer(outfile)
+        writer.writerow(SUBJECT_LIST_REPORT_FIELDS)
+        for idx, student in enumerate(students, 1):
+            writer.writerow([idx, student.get("Student Number", ""), student.get("Full Name", ""),
+                             student.get("Section", ""), student.get("Room", "")])
+
+        # Write footer
+        outfile.write("\n" + "=" * 80 + "\n")
+        outfile.write(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        outfile.write("=" * 80 + "\n")
+
+
+def write_subject_lists(reports_dir=SUBJECT_LIST_DIR, subject=None):
+    """Write a list per subject offering in one pass over the subject index; return how many were written."""
+    os.makedirs(reports_dir, exist_ok=True)
+    written = 0
+    for offering, entries in groupby(iter_offering_students(subject), key=lambda entry: entry[0]):
+        students = [row for _, row in entries]
+        clean_name = "_".join(str(part) for part in offering).replace('/', '-').replace(' ', '_')
+        if not written:
+            print_info("Generating subject list reports...")
+            print_separator("-")
+        print_info(f"Generating: {' '.join(str(part) for part in offering[:3])} - {offering[3]} "
+                   f"({len(students)} students)")
+        with span("report_write", report="subject_list"):
+            write_subject_list(f"{reports_dir}/{clean_name}_SubjectList.csv", offering, students)
+        written += 1
+    return written
 
-            if students:
-                # Sort students by student number for formal presentation
-                students_sorted = sorted(students, key=lambda x: x.get("Student Number", ""))
-                
-                # Display formatted table preview
-                print()
-                print(f"CLASS LIST - Section {section} - Room {room}")
-                print_separator("-")
-                
-                # Define column widths for display
-                col_no = 5
-                col_student = 15
-                col_name = 30
-                col_course = 8
-                col_year = 15
-                col_units = 12
-                
-                # Print header
-                header = (f"{'No.':<{col_no}} | "
-                         f"{'Student Number':<{col_student}} | "
-                         f"{'Full Name':<{col_name}} | "
-                         f"{'Course':<{col_course}} | "
-                         f"{'Year Level':<{col_year}} | "
-                         f"{'Total Units':<{col_units}}")
-                print(header)
-                print_separator("-", length=len(header))
-                
-                # Print student rows
-                for idx, student in enumerate(students_sorted, 1):
-                    student_num = student.get("Student Number", "")
-                    full_name = student.get("Full Name", "")
-                    course = student.get("Course", "")
-                    year_level = student.get("Year Level", "")
-                    total_units = student.get("Total Units", "")
-                    
-                    # Truncate long names
-                    if len(full_name) > col_name:
-                        full_name = full_name[:col_name-3] + "..."
-                    
-                    row = (f"{str(idx):<{col_no}} | "
-                          f"{student_num:<{col_student}} | "
-                          f"{full_name:<{col_name}} | "
-                          f"{course:<{col_course}} | "
-                          f"{year_level:<{col_year}} | "
-                          f"{total_units:<{col_units}}")
-                    print(row)
-                
-                print()
-                
-                # Create formal CSV with proper headers and formatting
-                with open(filename, "w", newline="", encoding="utf-8") as outfile:
-                    # Write formal header information
-                    outfile.write("CLASS LIST REPORT\n")
-                    outfile.write("=" * 80 + "\n")
-                    outfile.write(f"Section: {section}\n")
-                    outfile.write(f"Room: {room}\n")
-                    outfile.write(f"Academic Year: {datetime.now().year}\n")
-                    outfile.write(f"Total Students: {len(students_sorted)}\n")
-                    outfile.write("=" * 80 + "\n\n")
-                    
-                    # Write CSV data with formal headers
-                    fieldnames = [
-                        "No.", "Student Number", "Full Name", "Course", 
-                        "Year Level", "Section", "Room", "Total Units", "Subject Code", "Subject Name"
-                    ]
-                    
-                    writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    # Write student data with numbering and formatted subjects
-                    for idx, student in enumerate(students_sorted, 1):
-                        subjects_str = student.get("Subjects Enrolled", "")
-                        student_num = student.get("Student Number", "")
-                        full_name = student.get("Full Name", "")
-                        course = student.get("Course", "")
-                        year_level = student.get("Year Level", "")
-                        section = student.get("Section", "")
-                        room = student.get("Room", "")
-                        total_units = student.get("Total Units", "")
-                        
-                        if subjects_str and subjects_str != 'N/A':
-                            # Parse subjects from comma-separated string
-                            subject_list = [s.strip() for s in subjects_str.split(',')]
-                            
-                            # Write one row per subject
-                            for subj_idx, subject in enumerate(subject_list):
-                                # Parse subject code and name
-                                if ' (' in subject and ')' in subject:
-                                    code_end = subject.find(' (')
-                                    subject_code = subject[:code_end]
-                                    subject_name = subject[code_end+2:-1] if subject.endswith(')') else subject[code_end+2:]
-                                else:
-                                    subject_code = subject
-                                    subject_name = ""
-                                
-                                # Write row - only include student info in first subject row
-                                if subj_idx == 0:
-                                    row = {
-                                        "No.": str(idx),
-                                        "Student Number": student_num,
-                                        "Full Name": full_name,
-                                        "Course": course,
-                                        "Year Level": year_level,
-                                        "Section": section,
-                                        "Room": room,
-                                        "Total Units": total_units,
-                                        "Subject Code": subject_code,
-                                        "Subject Name": subject_name
-                                    }
-                                else:
-                                    # Subsequent subjects - leave student info blank
-                                    row = {
-                                        "No.": "",
-                                        "Student Number": "",
-                                        "Full Name": "",
-                                        "Course": "",
-                                        "Year Level": "",
-                                        "Section": "",
-                                        "Room": "",
-                                        "Total Units": "",
-                                        "Subject Code": subject_code,
-                                        "Subject Name": subject_name
-                                    }
-                                writer.writerow(row)
-                        else:
-                            # No subjects enrolled
-                            row = {
-                                "No.": str(idx),
-                                "Student Number": student_num,
-                                "Full Name": full_name,
-                                "Course": course,
-                                "Year Level": year_level,
-                                "Section": section,
-                                "Room": room,
-                                "Total Units": total_units,
-                                "Subject Code": "N/A",
-                                "Subject Name": "No subjects enrolled"
-                            }
-                            writer.writerow(row)
-                    
-                    # Write footer
-                    outfile.write("\n" + "=" * 80 + "\n")
-                    outfile.write(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    outfile.write("=" * 80 + "\n")
 
-        print_separator("-")
-        print_success(f"All class list reports generated successfully in '{reports_dir}' folder.")
+def generate_subject_lists():
+    """Generate one student list per subject offering."""
+    clear_screen()
+    print_header("GENERATE SUBJECT LISTS")
+
+    try:
+        if not roster_exists():
+            print_error("No students enrolled to generate subject lists.")
+            input("\nPress Enter to continue...")
+            return
+
+        print_prompt("Subject code (blank for all subjects): ")
+        subject = input().strip().upper() or None
+        if write_subject_lists(SUBJECT_LIST_DIR, subject):
+            print_separator("-")
+            print_success(f"Subject list reports generated successfully in '{SUBJECT_LIST_DIR}' folder.")
+        else:
+            print_error("No enrolled students found for that subject." if subject else "No data found to generate reports.")
 
     except Exception as e:
-        print_error(f"Error generating class lists: {str(e)}")
-    
+        print_error(f"Error generating subject lists: {str(e)}")
+
     input("\nPress Enter to continue...")
 
 
@@ -1651,30 +5354,14 @@ def edit_student():
     print()
 
     try:
-        if not os.path.exists(MAIN_FILE):
+        if not roster_exists():
             print_error("No students enrolled yet.")
             input("\nPress Enter to continue...")
             return
 
-        print_prompt("Enter Student Number to edit: ")
-        student_number = input().strip()
-
-        # Read all students
-        students = []
-        student_to_edit = None
-        
-        with open(MAIN_FILE, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row.get("Student Number", "").upper() == student_number.upper():
-                    student_to_edit = row
-                    students.append(row)
-                else:
-                    students.append(row)
-
+        # The version stamp is checked on save so a concurrent edit is not silently overwritten
+        student_number, student_to_edit, version = prompt_student("Enter Student Number or Name to edit: ")
         if not student_to_edit:
-            print_error(f"Student number {student_number} not found.")
             input("\nPress Enter to continue...")
             return
 
@@ -1683,7 +5370,7 @@ def edit_student():
         print_separator("-")
         print()
         print_info(f"Student Number: {student_to_edit.get('Student Number', 'N/A')}")
-        print_info(f"Full Name: {student_to_edit.get('Full Name', student_to_edit.get('Name', 'N/A'))}")
+        print_info(f"Full Name: {student_to_edit.get('Full Name', 'N/A')}")
         print()
         print("EDIT FIELDS")
         print("(Press Enter to keep current value)")
@@ -1766,24 +5453,23 @@ def edit_student():
         if new_barangay:
             updated_student["Barangay"] = barangay
 
-        # Write back
-        with open(MAIN_FILE, "w", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in students:
-                if row.get("Student Number", "") == student_number:
-                    writer.writerow(updated_student)
-                else:
-                    writer.writerow(row)
+        # Record only the changed fields
+        changes = {field: value for field, value in updated_student.items()
+                   if student_to_edit.get(field) != value}
+        if changes:
+            append_journal([{"op": "patch", "student": student_to_edit.get("Student Number", ""),
+                             "fields": changes}], {student_number: version})
 
-        # Copy to Registrar and Librarian
-        shutil.copy(MAIN_FILE, REGISTRAR_FILE)
-        shutil.copy(MAIN_FILE, LIBRARIAN_FILE)
+            # Copy to Registrar and Librarian
+            replicate_to_departments()
 
         print()
         print_success("Student information updated successfully!")
         input("\nPress Enter to continue...")
 
+    except StaleRecordError as e:
+        print_error(str(e))
+        input("\nPress Enter to continue...")
     except Exception as e:
         print_error(f"Error editing student: {str(e)}")
         input("\nPress Enter to continue...")
@@ -1797,64 +5483,509 @@ def archive_student():
     print_header("ARCHIVE STUDENT")
 
     try:
-        if not os.path.exists(MAIN_FILE):
+        if not roster_exists():
             print_error("No students enrolled yet.")
             input("\nPress Enter to continue...")
             return
 
-        print_prompt("Enter Student Number: ")
-        student_number = input().strip()
-
-        # Read all students
-        students = []
-        student_found = False
-        current_archive_status = "No"
-        
-        with open(MAIN_FILE, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row.get("Student Number", "").upper() == student_number.upper():
-                    student_found = True
-                    current_archive_status = row.get("Archived", "No")
-                    # Toggle archive status
-                    row["Archived"] = "Yes" if current_archive_status.upper() != "YES" else "No"
-                    students.append(row)
-                else:
-                    students.append(row)
-
-        if not student_found:
-            print_error(f"Student number {student_number} not found.")
+        student_number, student, version = prompt_student("Enter Student Number or Name: ")
+        if student is None:
             input("\nPress Enter to continue...")
             return
 
-        # Write back
-        with open(MAIN_FILE, "w", newline="", encoding="utf-8") as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(students)
+        # Toggle archive status, refusing if another station changed the record first
+        current_archive_status = student.get("Archived") or "No"
+        append_journal([{"op": "archive", "student": student.get("Student Number", ""),
+                         "value": "Yes" if current_archive_status.upper() != "YES" else "No"}],
+                       {student_number: version})
 
         # Copy to Registrar and Librarian
-        shutil.copy(MAIN_FILE, REGISTRAR_FILE)
-        shutil.copy(MAIN_FILE, LIBRARIAN_FILE)
+        replicate_to_departments()
 
         action = "archived" if current_archive_status.upper() != "YES" else "unarchived"
         print()
         print_success(f"Student {student_number} has been {action} successfully!")
         input("\nPress Enter to continue...")
 
+    except StaleRecordError as e:
+        print_error(str(e))
+        input("\nPress Enter to continue...")
     except Exception as e:
         print_error(f"Error archiving student: {str(e)}")
         input("\nPress Enter to continue...")
 
 
+# ==================== HTTP SERVICE ====================
+
+# `python system.py serve` answers JSON requests over HTTP from a roster held in memory,
+# so stations stop rereading students.csv for every action. Requests are parsed on one
+# asyncio event loop, and reads are answered there straight from the warm roster cache.
+# Writes queue for a single writer task. Each time it wakes it commits everything queued
+# while the previous commit ran as one group (one students.csv append and one journal
+# write, or one SQLite transaction, then one replication). The commit, and every other
+# write (seat holds, student number blocks), runs on one writer thread, so the loop keeps
+# taking requests through the fsyncs and the roster files still have a single writer.
+# The writer thread brings the cache up to date before it reads it, and reads on the
+# loop hold _roster_lock, so neither sees the cache half replayed.
+
+SERVICE_FILTERS = {column_name(name): name for name in INDEXED_COLUMNS[1:]}
+NAME_FIELDS = ("Last Name", "First Name", "Middle Initial", "Suffix")
+# Fields a PATCH may change, each checked as the enrollment form checks it. Full Name is
+# derived from the name parts; the rest are set at enrollment or by their own routes
+# (sections and rooms by /rebalance, Archived by /archive)
+PATCH_FIELDS = NAME_FIELDS + ("Phone Number", "Emergency Contact", "Emergency Number", "Street", "Barangay")
+
+_service = {"queue": None, "executor": None, "commits": 0, "writes": 0, "largest_batch": 0}
+
+
+def commit_service_writes(writes):
+    """Commit a group of queued writes; return each one's (rows enrolled, overflow) or StaleRecordError.
+
+    A write is a dict with any of "students" (validated students to number and seat),
+    "rows" (complete new rows), "entries" (journal entries) and "expected" (version stamps).
+    """
+    with span("group_commit"):
+        with file_lock(OCCUPANCY_LOCK_FILE):
+            counts = section_occupancy()
+            placed = [place_students(write.get("students", []), counts) for write in writes]
+            groups = [(write.get("rows", []) + rows, write.get("entries", []), write.get("expected"))
+                      for write, (rows, _) in zip(writes, placed)]
+            errors = commit_writes(groups)
+        replicate_to_departments()
+    _service["commits"] += 1
+    _service["writes"] += len(writes)
+    _service["largest_batch"] = max(_service["largest_batch"], len(writes))
+    count_metric("enrollment_group_commits_total")
+    count_metric("enrollment_group_commit_writes_total", len(writes))
+    return [error or (group[0], overflow) for error, group, (_, overflow) in zip(errors, groups, placed)]
+
+
+async def service_writer(queue):
+    """Commit queued writes in groups, resolving each request's future with its result."""
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < SERVICE_MAX_BATCH and not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            results = await run_on_writer(commit_service_writes, [write for write, _ in batch])
+        except Exception as e:
+            print_error(f"Group commit failed: {str(e)}")
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def run_on_writer(function, *args):
+    """Run a blocking write on the writer thread, after the writes handed to it before; return its result."""
+    return await asyncio.get_running_loop().run_in_executor(_service["executor"], function, *args)
+
+
+async def queue_write(write):
+    """Hand a write to the writer task and wait until it is committed; return its result."""
+    future = asyncio.get_running_loop().create_future()
+    _service["queue"].put_nowait((write, future))
+    result = await future
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def expected_versions(student_number, payload):
+    """Return the version check requested for a write, or None."""
+    version = payload.get("expected_version")
+    return {student_number: tuple(version)} if version else None
+
+
+def existing_student(student_number):
+    """Return a student row, or raise ServiceError 404."""
+    with _roster_lock:
+        student = find_student(student_number)
+    if student is None:
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"Student number {student_number} not found.")
+    return student
+
+
+def student_reply(student_number):
+    """Return a student and its version stamp as a reply."""
+    with _roster_lock:
+        student, version = find_record(student_number)
+        if student is None:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"Student number {student_number} not found.")
+        return {"student": dict(student), "version": version}
+
+
+def service_health(query, payload):
+    """GET /health: roster size and group-commit counts."""
+    return HTTPStatus.OK, {"status": "ok", "backend": STORAGE_BACKEND, "durability": DURABILITY,
+                           "roster": roster_exists(),
+                           "students": len(load_roster()["index"]), "commits": _service["commits"],
+                           "writes": _service["writes"], "largest_batch": _service["largest_batch"]}
+
+
+def service_metrics(query, payload):
+    """GET /metrics: the counters and histograms as Prometheus text."""
+    return HTTPStatus.OK, prometheus_metrics()
+
+
+def service_list_students(query, payload):
+    """GET /students?course=&year_level=&section=&offset=&limit=, or ?q=name to search by name."""
+    limit = max(1, min(int(query.get("limit") or SERVICE_PAGE_SIZE), SERVICE_MAX_BATCH))
+    if "q" in query:
+        return HTTPStatus.OK, {"matches": [{"score": score, "student": dict(row)}
+                                           for score, row in search_students(query["q"], limit)]}
+    offset = max(0, int(query.get("offset") or 0))
+    filters = {SERVICE_FILTERS[name]: value for name, value in query.items() if name in SERVICE_FILTERS}
+    plan = {}
+    students = [dict(row) for row in query_students(filters, plan=plan)[offset:offset + limit]]
+    reply = {"students": students, "offset": offset,
+             "next_offset": offset + limit if len(students) == limit else None}
+    if "explain" in query:
+        reply["plan"] = plan
+    return HTTPStatus.OK, reply
+
+
+async def service_enroll(query, payload):
+    """POST /students: enroll {"students": [records]}, numbering and seating them.
+
+    A thin client that already holds numbers and seats sends {"rows": [rows]} instead.
+    """
+    if "rows" in payload:
+        rows = [[row.get(field, "") for field in STUDENT_HEADER] if isinstance(row, dict) else row
+                for row in payload["rows"]]
+        if not rows or any(not isinstance(row, list) or len(row) != len(STUDENT_HEADER) for row in rows):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"Each row needs the {len(STUDENT_HEADER)} student columns.")
+        write = {"rows": rows}
+    else:
+        records = payload.get("students")
+        if not isinstance(records, list) or not records:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'Expected {"students": [...]} or {"rows": [...]}.')
+        students = []
+        rejected = []
+        for position, record in enumerate(records):
+            student, errors = (validate_enrollment_record(record) if isinstance(record, dict)
+                               else (None, ["Expected a JSON object."]))
+            if errors:
+                rejected.append({"index": position, "errors": errors})
+            students.append(student)
+        if rejected:
+            return HTTPStatus.BAD_REQUEST, {"error": "Some students failed validation.", "rejected": rejected}
+        write = {"students": students}
+    rows, overflow = await queue_write(write)
+    return HTTPStatus.CREATED, {"students": [dict(zip(STUDENT_HEADER, row)) for row in rows], "overflow": overflow}
+
+
+def service_get_student(query, payload, student_number):
+    """GET /students/<number>: a student and its version stamp."""
+    return HTTPStatus.OK, student_reply(student_number)
+
+
+def check_patch_fields(changes):
+    """Normalize and validate changed PATCH_FIELDS as the enrollment form does; return (fields, errors)."""
+    rules = {field: (validator, message) for field, validator, message in BULK_NAME_RULES + BULK_NUMBER_RULES}
+    numbers = {field for field, _, _ in BULK_NUMBER_RULES}
+    fields = {}
+    errors = []
+    for field, value in changes.items():
+        value = "" if value is None else str(value).strip()
+        if field in numbers:
+            value = value.replace("-", "").replace(" ", "").replace("+", "")
+        elif field == "Middle Initial":
+            value = " ".join(word.capitalize() for word in value.split())
+        if field in rules and not rules[field][0](value):
+            errors.append(rules[field][1])
+        fields[field] = value
+    return fields, errors
+
+
+async def service_edit_student(query, payload, student_number):
+    """PATCH /students/<number>: change {"fields": {...}}, optionally checking "expected_version".
+
+    Only PATCH_FIELDS may change. Other fields may be sent (a whole row, say) as long as
+    they keep their current values; Full Name is always formatted from the name parts.
+    """
+    fields = payload.get("fields")
+    if not isinstance(fields, dict) or not fields:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, 'Expected {"fields": {...}}.')
+    unknown = sorted(set(fields) - set(STUDENT_HEADER))
+    if unknown:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"Unknown fields: {', '.join(unknown)}")
+    if normalize_student_number(fields.get("Student Number", student_number)) != normalize_student_number(student_number):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "The student number cannot be changed.")
+    student = dict(existing_student(student_number))
+    text = lambda value: "" if value is None else str(value).strip()
+    changes = {name: value for name, value in fields.items()
+               if name not in ("Student Number", "Full Name") and text(value) != text(student.get(name))}
+    fixed = sorted(set(changes) - set(PATCH_FIELDS))
+    if fixed:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"These fields cannot be changed: {', '.join(fixed)}")
+    changes, errors = check_patch_fields(changes)
+    if errors:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, " ".join(errors))
+    if any(name in changes for name in NAME_FIELDS):
+        names = dict(student, **changes)
+        changes["Full Name"] = format_name(*(names.get(name, "") for name in NAME_FIELDS))
+    if changes:
+        await queue_write({"entries": [{"op": "patch", "student": student_number, "fields": changes}],
+                           "expected": expected_versions(student_number, payload)})
+    return HTTPStatus.OK, student_reply(student_number)
+
+
+async def service_archive_student(query, payload, student_number):
+    """POST /students/<number>/archive: set {"archived": true|false}, optionally checking "expected_version"."""
+    archived = payload.get("archived", True)
+    if not isinstance(archived, bool):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, '"archived" must be true or false.')
+    existing_student(student_number)
+    await queue_write({"entries": [{"op": "archive", "student": student_number, "value": "Yes" if archived else "No"}],
+                       "expected": expected_versions(student_number, payload)})
+    return HTTPStatus.OK, student_reply(student_number)
+
+
+async def service_student_numbers(query, payload):
+    """POST /student-numbers: hand out {"count": n} student numbers."""
+    count = int(payload.get("count", 1))
+    if not 1 <= count <= SERVICE_MAX_BATCH:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"count must be between 1 and {SERVICE_MAX_BATCH}.")
+    numbers = await run_on_writer(allocate_student_numbers, count, payload.get("year"))
+    return HTTPStatus.CREATED, {"student_numbers": numbers}
+
+
+def hold_seat(year_level, student_number):
+    """Reserve a seat on the writer thread; return (section, whether the year level is full)."""
+    # Writes happen on this thread only, so the check sees the counts reserve_seat will use
+    overflow = choose_section(year_level, section_occupancy()) is None
+    return reserve_seat(year_level, student_number), overflow
+
+
+async def service_reserve_seat(query, payload):
+    """POST /seats: hold a seat for {"year_level": "1", "student_number": ...} being enrolled."""
+    year_level = str(payload.get("year_level", ""))
+    student_number = str(payload.get("student_number", "")).strip()
+    if f"{year_level}A" not in ROOM_ASSIGNMENTS or not student_number:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, 'Expected {"year_level": "1"-"4", "student_number": ...}.')
+    section, overflow = await run_on_writer(hold_seat, year_level, student_number)
+    return HTTPStatus.CREATED, {"section": section, "room": ROOM_ASSIGNMENTS.get(section, "Room Not Assigned"),
+                                "overflow": overflow}
+
+
+async def service_release_seat(query, payload, student_number):
+    """DELETE /seats/<number>: give back a seat held for an enrollment that was not saved."""
+    await run_on_writer(release_seat, student_number)
+    return HTTPStatus.OK, {"released": student_number}
+
+
+def service_class_lists(query, payload):
+    """GET /class-lists: active students by section and room, in student number order."""
+    sections = []
+    with sorted_class_list() as (counts, entries):
+        for (section, room), group in groupby(entries, key=lambda entry: entry[:2]):
+            students = [dict(zip(CLASS_LIST_FIELDS, entry)) for entry in group]
+            sections.append({"section": section, "room": room, "count": len(students), "students": students})
+    return HTTPStatus.OK, {"sections": sections}
+
+
+def service_subject_lists(query, payload):
+    """GET /subject-lists?subject=CODE: active students per subject offering."""
+    offerings = []
+    for (course, year_level, semester, code), entries in groupby(iter_offering_students(query.get("subject", "").upper()),
+                                                                 key=lambda entry: entry[0]):
+        offerings.append({"course": course, "year_level": year_level, "semester": semester, "subject": code,
+                          "students": [dict(row) for _, row in entries]})
+    return HTTPStatus.OK, {"offerings": offerings}
+
+
+async def service_rebalance(query, payload):
+    """POST /rebalance: plan {"year_level": "1"} section moves, committing them too if "apply" is true."""
+    apply = payload.get("apply", False)
+    if not isinstance(apply, bool):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, '"apply" must be true or false.')
+    try:
+        # Planned on the writer thread between seat picks; the group commit checks the plan's stamps
+        plan = await run_on_writer(rebalance_sections, payload.get("year_level", ""))
+    except ValueError as e:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, str(e))
+    if apply and plan["moves"]:
+        entries, expected = rebalance_writes(plan)
+        await queue_write({"entries": entries, "expected": expected})
+    return HTTPStatus.OK, plan
+
+
+def service_statistics(query, payload):
+    """GET /statistics: headcounts of active students and their unit loads."""
+    return HTTPStatus.OK, enrollment_statistics()
+
+
+# (method, path with None for the student number, handler)
+SERVICE_ROUTES = [
+    ("GET", ("health",), service_health),
+    ("GET", ("metrics",), service_metrics),
+    ("GET", ("students",), service_list_students),
+    ("POST", ("students",), service_enroll),
+    ("GET", ("students", None), service_get_student),
+    ("PATCH", ("students", None), service_edit_student),
+    ("POST", ("students", None, "archive"), service_archive_student),
+    ("POST", ("student-numbers",), service_student_numbers),
+    ("POST", ("seats",), service_reserve_seat),
+    ("DELETE", ("seats", None), service_release_seat),
+    ("GET", ("class-lists",), service_class_lists),
+    ("GET", ("subject-lists",), service_subject_lists),
+    ("GET", ("statistics",), service_statistics),
+    ("POST", ("rebalance",), service_rebalance),
+]
+
+
+def route_request(method, parts):
+    """Return (handler, path parameters, route name) for a request, or raise ServiceError."""
+    allowed = False
+    for route_method, pattern, handler in SERVICE_ROUTES:
+        if len(pattern) != len(parts) or any(segment not in (None, part) for segment, part in zip(pattern, parts)):
+            continue
+        if route_method == method:
+            name = "/" + "/".join(segment or "{number}" for segment in pattern)
+            return handler, [part for segment, part in zip(pattern, parts) if segment is None], f"{method} {name}"
+        allowed = True
+    if allowed:
+        raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported here.")
+    raise ServiceError(HTTPStatus.NOT_FOUND, "No such resource.")
+
+
+async def handle_request(method, target, body):
+    """Answer one request; return (status, reply)."""
+    url = urlsplit(target)
+    parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    try:
+        handler, parameters, name = route_request(method, parts)
+        payload = json.loads(body) if body else {}
+        if not isinstance(payload, dict):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "Expected a JSON object.")
+        with span("http_request", route=name):
+            if inspect.iscoroutinefunction(handler):
+                return await handler(query, payload, *parameters)
+            # Reads keep the writer thread from replaying into the cache while they use it
+            with _roster_lock:
+                return handler(query, payload, *parameters)
+    except ServiceError as e:
+        return e.status, {"error": str(e)}
+    except StaleRecordError as e:
+        return HTTPStatus.CONFLICT, {"error": str(e)}
+    except (ValueError, TypeError, KeyError) as e:
+        return HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {str(e)}"}
+    except Exception as e:
+        print_error(f"{method} {target} failed: {str(e)}")
+        return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+
+def http_response(status, reply, keep_alive):
+    """Encode a reply (JSON, or text for /metrics) as an HTTP/1.1 response."""
+    if isinstance(reply, str):
+        body, content_type = reply.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, content_type = json.dumps(reply, ensure_ascii=False).encode("utf-8"), "application/json"
+    status = HTTPStatus(status)
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def handle_connection(reader, writer):
+    """Serve the requests of one kept-alive HTTP/1.1 connection until the client closes it."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                writer.write(http_response(HTTPStatus.BAD_REQUEST, {"error": "Malformed request."}, False))
+                break
+            if length > SERVICE_MAX_BODY:
+                writer.write(http_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                           {"error": f"Requests are limited to {SERVICE_MAX_BODY} bytes."}, False))
+                break
+            body = await reader.readexactly(length) if length else b""
+            status, reply = await handle_request(method.upper(), target, body)
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            writer.write(http_response(status, reply, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        # A dropped connection, or a line past the stream limit
+        pass
+    finally:
+        writer.close()
+
+
+async def run_service(host=SERVICE_HOST, port=SERVICE_PORT):
+    """Serve the enrollment API until interrupted or terminated."""
+    # Warm the roster and the name search index before taking requests
+    name_index(load_roster())
+    _service["queue"] = asyncio.Queue()
+    _service["executor"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enrollment-writer")
+    writer_task = asyncio.create_task(service_writer(_service["queue"]))
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+        except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    server = await asyncio.start_server(handle_connection, host, port)
+    address = server.sockets[0].getsockname()
+    print_success(f"Enrollment service listening on http://{address[0]}:{address[1]}")
+    sys.stdout.flush()
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        writer_task.cancel()
+        # Let a commit already on the writer thread finish before the roster is compacted
+        _service["executor"].shutdown(wait=True)
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT):
+    """Run the enrollment service in the foreground; return the exit status."""
+    if REMOTE_SERVER:
+        print_error("ENROLLMENT_SERVER is set; unset it to run the service itself.")
+        return 1
+    try:
+        asyncio.run(run_service(host, port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print_error(f"Could not start the enrollment service: {str(e)}")
+        return 1
+    compact_roster()
+    print_info("Enrollment service stopped.")
+    return 0
+
+
 # ==================== MAIN MENU ====================
 
+# Menu choice -> action name used in the metrics
+MENU_ACTIONS = {"1": "enroll", "2": "view_list", "3": "view_details", "4": "edit",
+                "5": "class_lists", "6": "subject_lists", "7": "statistics", "8": "exit"}
+
+
 def main_menu():
     """Main menu loop."""
     while True:
         clear_screen()
         print_header("ENROLLMENT SYSTEM")
+        if REMOTE_SERVER:
+            print_info(f"Connected to the enrollment service at {REMOTE_SERVER}")
+            print()
         
         print("  Please select an option:")
         print()
@@ -1863,39 +5994,254 @@ def main_menu():
         print("  3. View Student Details")
         print("  4. Edit Student Information")
         print("  5. Generate Class List Reports")
-        print("  6. Exit")
+        print("  6. Generate Subject List Reports")
+        print("  7. View Enrollment Statistics")
+        print("  8. Exit")
         print()
         print_separator("-")
 
-        print_prompt("Enter your choice (1-6): ")
+        print_prompt("Enter your choice (1-8): ")
         choice = input().strip()
 
-        if choice == "1":
-            enroll_student()
-        elif choice == "2":
-            view_students()
-        elif choice == "3":
-            view_student_details()
-        elif choice == "4":
-            edit_student()
-        elif choice == "5":
-            generate_class_lists()
-        elif choice == "6":
-            clear_screen()
-            print_header("EXITING SYSTEM")
-            print_info("Thank you for using the Enrollment System!")
+        with span("menu_action", action=MENU_ACTIONS.get(choice, "invalid")):
+            if choice == "1":
+                enroll_student()
+            elif choice == "2":
+                view_students()
+            elif choice == "3":
+                view_student_details()
+            elif choice == "4":
+                edit_student()
+            elif choice == "5":
+                generate_class_lists()
+            elif choice == "6":
+                generate_subject_lists()
+            elif choice == "7":
+                view_statistics()
+            elif choice == "8":
+                # Fold pending journal entries into students.csv before leaving
+                compact_roster()
+                clear_screen()
+                print_header("EXITING SYSTEM")
+                print_info("Thank you for using the Enrollment System!")
+                print()
+                print_separator("-")
+                break
+            else:
+                print_error("Invalid choice. Please enter a number between 1-8.")
+                input("\nPress Enter to continue...")
+
+
+# ==================== COMMAND LINE ====================
+
+def run_command(args):
+    """Run a non-interactive command, e.g. `python system.py import intake.csv`."""
+    parser = argparse.ArgumentParser(prog="system.py", description="Enrollment System commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="enroll students in bulk from a CSV or JSONL file")
+    import_parser.add_argument("file", help="intake file (.csv, or .jsonl with one student per line)")
+    import_parser.add_argument("--errors", help="rejected-row report (default: <file>_errors.csv)")
+    import_parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE,
+                               help="students saved per write")
+
+    lists_parser = commands.add_parser("class-lists", help="write a class list CSV per section and room")
+    lists_parser.add_argument("--output", default=CLASS_LIST_DIR, help="report folder")
+    lists_parser.add_argument("--no-preview", action="store_true", help="skip the on-screen tables")
+    lists_parser.add_argument("--max-rows", type=int, default=CLASS_LIST_SORT_BUFFER,
+                              help="students sorted in memory before spilling to temporary files")
+
+    subject_parser = commands.add_parser("subject-lists", help="write a student list per subject offering")
+    subject_parser.add_argument("--output", default=SUBJECT_LIST_DIR, help="report folder")
+    subject_parser.add_argument("--subject", help="only this subject code, e.g. DSA")
+
+    search_parser = commands.add_parser("search", help="find students by name, allowing partial names and typos")
+    search_parser.add_argument("name", nargs="+", help="name or part of a name, e.g. Dela Cr")
+    search_parser.add_argument("--limit", type=int, default=SEARCH_RESULT_LIMIT, help="matches to list")
+
+    query_parser = commands.add_parser("query", help="list the students matching column filters, "
+                                                     "e.g. --course BSCS --year-level 2 --section 2A")
+    for name in INDEXED_COLUMNS[1:]:
+        query_parser.add_argument(f"--{name.lower().replace(' ', '-')}", dest=column_name(name), metavar="VALUE")
+    query_parser.add_argument("--archived", choices=["no", "yes", "any"], default="no",
+                              help="active students (no), archived ones (yes) or both (any)")
+    query_parser.add_argument("--limit", type=int, default=50, help="students listed")
+    query_parser.add_argument("--explain", action="store_true", help="show the indexes used and the rows touched")
+
+    stats_parser = commands.add_parser("stats", help="headcounts of active students by course, year level, section, "
+                                                     "sex, place and nationality, and their unit loads")
+    stats_parser.add_argument("--limit", type=int, default=STATISTICS_TOP_VALUES, help="values listed per column")
+    stats_parser.add_argument("--json", action="store_true", help="print every count as JSON")
+
+    rebalance_parser = commands.add_parser("rebalance", help="even out the sections of a year level with as few "
+                                                             "moves as possible (a dry run unless --apply)")
+    rebalance_parser.add_argument("year_level", help="year level, e.g. 1 or \"1st Year\"")
+    rebalance_parser.add_argument("--apply", action="store_true", help="commit the moves in one batch")
+    rebalance_parser.add_argument("--limit", type=int, default=50, help="moves listed")
+
+    drift_parser = commands.add_parser("drift", help="compare the department copies with the roster row by row")
+    drift_parser.add_argument("--copy", choices=list(REPLICA_TARGETS), help="check only this copy (default: all)")
+    drift_parser.add_argument("--limit", type=int, default=20, help="student numbers listed per kind of difference")
+
+    replica_parser = commands.add_parser("replica-export", help="write a department copy with its pending changes "
+                                                                "applied to one CSV file")
+    replica_parser.add_argument("copy", choices=list(REPLICA_TARGETS), help="department copy to export")
+    replica_parser.add_argument("output", help="CSV file to write")
+
+    serve_parser = commands.add_parser("serve", help="run the enrollment service over HTTP (JSON)")
+    serve_parser.add_argument("--host", default=SERVICE_HOST, help="address to listen on")
+    serve_parser.add_argument("--port", type=int, default=SERVICE_PORT, help="port to listen on (0 picks a free one)")
+
+    migrate_parser = commands.add_parser("migrate", help="upgrade roster CSV files from older layouts to the current one")
+    migrate_parser.add_argument("files", nargs="*", default=[MAIN_FILE],
+                                help=f"files to upgrade in place, keeping a .bak copy (default: {MAIN_FILE})")
+    migrate_parser.add_argument("--output", help="write the upgraded rows of a single file here instead")
+
+    db_import_parser = commands.add_parser("db-import", help=f"copy the CSV roster into {DATABASE_FILE}")
+    db_import_parser.add_argument("--csv", default=MAIN_FILE, help="roster CSV to import")
+    db_import_parser.add_argument("--replace", action="store_true", help="overwrite students already in the database")
+
+    db_export_parser = commands.add_parser("db-export", help=f"write the students in {DATABASE_FILE} to a CSV file")
+    db_export_parser.add_argument("--csv", default=MAIN_FILE, help="CSV file to write")
+
+    options = parser.parse_args(args)
+    with span("command", command=options.command):
+        return run_parsed_command(options)
+
+
+def run_parsed_command(options):
+    """Carry out a parsed command; return the exit status."""
+    if options.command == "import":
+        bulk_enroll(options.file, options.errors, options.batch_size)
+    elif options.command == "class-lists":
+        if not write_class_lists(options.output, not options.no_preview, options.max_rows):
+            print_error("No data found to generate reports.")
+            return 1
+        print_success(f"Class list reports written to '{options.output}'.")
+    elif options.command == "subject-lists":
+        if not write_subject_lists(options.output, options.subject and options.subject.upper()):
+            print_error("No data found to generate reports.")
+            return 1
+        print_success(f"Subject list reports written to '{options.output}'.")
+    elif options.command == "search":
+        matches = search_students(" ".join(options.name), options.limit)
+        if not matches:
+            print_error("No students match that name.")
+            return 1
+        for score, row in matches:
+            print(f"{row.get('Student Number', ''):<14} {row.get('Full Name', ''):<35} "
+                  f"{row.get('Course', '')} {row.get('Section', '')}  ({score:.2f})")
+    elif options.command == "query":
+        filters = {name: getattr(options, column_name(name)) for name in INDEXED_COLUMNS[1:]
+                   if getattr(options, column_name(name))}
+        if "Year Level" in filters:
+            filters["Year Level"] = LEGACY_YEAR_LEVELS.get(filters["Year Level"], filters["Year Level"])
+        if options.archived != "any":
+            filters["Archived"] = options.archived.capitalize()
+        plan = {}
+        matches = query_students(filters, include_archived=True, plan=plan)
+        for row in matches[:options.limit]:
+            print(f"{row.get('Student Number', ''):<14} {row.get('Full Name', ''):<35} {row.get('Course', ''):<9} "
+                  f"{row.get('Year Level', ''):<9} {row.get('Semester', ''):<13} {row.get('Section', ''):<4} "
+                  f"{row.get('Room', '')}")
+        if len(matches) > options.limit:
+            print_info(f"... and {len(matches) - options.limit} more.")
+        if options.explain:
             print()
-            print_separator("-")
-            break
+            for line in format_query_plan(plan):
+                print(line)
+        if not matches:
+            print_error("No students match these filters.")
+            return 1
+    elif options.command == "stats":
+        if not roster_exists():
+            print_error("No students enrolled yet.")
+            return 1
+        statistics = enrollment_statistics()
+        if options.json:
+            print(json.dumps(statistics, indent=2, ensure_ascii=False))
         else:
-            print_error("Invalid choice. Please enter a number between 1-6.")
-            input("\nPress Enter to continue...")
+            for line in format_statistics(statistics, options.limit):
+                print(line)
+    elif options.command == "rebalance":
+        try:
+            plan = rebalance_sections(options.year_level, options.apply)
+        except (ValueError, StaleRecordError, ServiceError) as e:
+            print_error(str(e))
+            return 1
+        for line in format_rebalance_plan(plan, options.limit):
+            print(line)
+        if not plan["moves"]:
+            print_info("The sections are already balanced.")
+        elif options.apply:
+            print_success(f"Moved {len(plan['moves'])} students.")
+        else:
+            print_info("Dry run: nothing was changed. Add --apply to make these moves.")
+    elif options.command == "drift":
+        if REMOTE_SERVER:
+            print_error("The department copies are kept by the service; check them on its station.")
+            return 1
+        drifted = False
+        for name, path in REPLICA_TARGETS.items():
+            if options.copy and name != options.copy:
+                continue
+            drift = check_replica_drift(path)
+            if not any(drift.values()):
+                print_success(f"{name} copy matches the roster.")
+                continue
+            drifted = True
+            print_warning(f"{name} copy: {len(drift['missing'])} missing, {len(drift['extra'])} extra, "
+                          f"{len(drift['changed'])} changed")
+            for kind, keys in drift.items():
+                if keys:
+                    more = f" ... and {len(keys) - options.limit} more" if len(keys) > options.limit else ""
+                    print(f"  {kind}: {', '.join(keys[:options.limit])}{more}")
+        if drifted:
+            return 1
+    elif options.command == "replica-export":
+        path = REPLICA_TARGETS[options.copy]
+        if not os.path.exists(path):
+            print_error(f"'{path}' not found.")
+            return 1
+        count = export_replica(path, options.output)
+        print_success(f"Wrote {count} students from the {options.copy} copy to '{options.output}'.")
+    elif options.command == "serve":
+        return serve(options.host, options.port)
+    elif options.command == "migrate":
+        if options.output and len(options.files) > 1:
+            print_error("--output takes a single file.")
+            return 1
+        for path in options.files:
+            if not os.path.exists(path):
+                print_error(f"'{path}' not found.")
+                return 1
+            if not options.output and file_header(path)[:len(STUDENT_HEADER)] == STUDENT_HEADER:
+                print_info(f"'{path}' is already in the current layout (schema {SCHEMA_VERSION}).")
+                continue
+            counts = migrate_roster(path, options.output)
+            layouts = ", ".join(f"{count} {'unrecognized' if schema is None else f'schema {schema}'}"
+                                for schema, count in counts.items())
+            print_success(f"Upgraded '{path}' to schema {SCHEMA_VERSION} ({layouts or 'no rows'}).")
+    elif options.command == "db-import":
+        try:
+            count = import_csv_to_database(options.csv, options.replace)
+        except ValueError as e:
+            print_error(str(e))
+            return 1
+        print_success(f"Imported {count} students from '{options.csv}' into '{DATABASE_FILE}'.")
+        print_info("Set ENROLLMENT_BACKEND=sqlite to use the database.")
+    elif options.command == "db-export":
+        count = export_database_to_csv(options.csv)
+        print_success(f"Exported {count} students from '{DATABASE_FILE}' to '{options.csv}'.")
+    return 0
 
 
 # ==================== PROGRAM ENTRY POINT ====================
 
 if __name__ == "__main__":
     try:
+        if len(sys.argv) > 1:
+            sys.exit(run_command(sys.argv[1:]))
         main_menu()
     except KeyboardInterrupt:
         print_error("\n\nProgram interrupted by user. Exiting...")